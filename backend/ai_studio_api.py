@@ -11,20 +11,32 @@ from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime
 
 # Knowledge Graph imports
-from neo4j_manager import Neo4jManager
+from neo4j_manager import AsyncNeo4jManager, close_async_driver, ENTITY_NAME_INDEX, fulltext_search
 from nl_to_cypher import NLToCypherTranslator
+from gazetteer import EntityGazetteer, keep_gazetteer_fresh
+from query_guard import QueryGuard, QueryRejected
 from compliance_engine import ComplianceEngine
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Share one pooled async Neo4j driver for the lifetime of the app"""
+    refresher = asyncio.create_task(keep_gazetteer_fresh(gazetteer, neo4j_manager))
+    yield
+    refresher.cancel()
+    await close_async_driver()
+
 app = FastAPI(
     title="Knowledge Graph AI Studio API",
     description="AI Studio optimized endpoints for Knowledge Graph Platform",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS for AI Studio
@@ -37,8 +49,10 @@ app.add_middleware(
 )
 
 # Initialize components
-neo4j_manager = Neo4jManager()
-nl_translator = NLToCypherTranslator()
+neo4j_manager = AsyncNeo4jManager()
+gazetteer = EntityGazetteer()
+nl_translator = NLToCypherTranslator(gazetteer=gazetteer)
+query_guard = QueryGuard(neo4j_manager)
 compliance_engine = ComplianceEngine()
 
 # Pydantic models for AI Studio
@@ -99,7 +113,7 @@ async def health_check():
     """Detailed health check"""
     try:
         # Test Neo4j connection
-        graph_stats = neo4j_manager.get_graph_statistics()
+        graph_stats = await neo4j_manager.get_graph_statistics()
         
         # Test compliance engine
         compliance_rules = len(compliance_engine.rules)
@@ -126,8 +140,9 @@ async def ai_query(request: AIQueryRequest, background_tasks: BackgroundTasks):
         # 1. Translate natural language to Cypher
         cypher_query, params = nl_translator.translate(request.query)
         
-        # 2. Execute graph query
-        results = await neo4j_manager.execute_query(cypher_query, params)
+        # 2. Execute graph query, capped and planned by the cost guard
+        cypher_query, _ = await query_guard.prepare(cypher_query, params)
+        results = await neo4j_manager.execute_read(cypher_query, params, timeout=query_guard.timeout)
         
         # 3. Generate natural language answer
         answer = generate_ai_answer(request.query, results)
@@ -159,6 +174,8 @@ async def ai_query(request: AIQueryRequest, background_tasks: BackgroundTasks):
             timestamp=datetime.now()
         )
         
+    except QueryRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"AI Query failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Query processing failed: {str(e)}")
@@ -240,7 +257,7 @@ async def ai_compliance_check(request: ComplianceCheckRequest):
 async def get_graph_statistics():
     """Get graph statistics for AI Studio"""
     try:
-        stats = neo4j_manager.get_graph_statistics()
+        stats = await neo4j_manager.get_graph_statistics()
         
         # Calculate additional AI-relevant metrics
         total_entities = sum([
@@ -333,27 +350,35 @@ def extract_entities_from_text(text: str) -> List[str]:
     return list(set(companies + locations + products))
 
 async def match_entities_in_graph(entities: List[str], entity_types: List[str]) -> List[Dict[str, Any]]:
-    """Match extracted entities against graph"""
+    """Match extracted entities against graph through the entity name full-text index"""
     matched_entities = []
+    query = f"""
+    CALL db.index.fulltext.queryNodes('{ENTITY_NAME_INDEX}', $search) YIELD node, score
+    WHERE node.generation = $generation
+    UNWIND [label IN labels(node) WHERE label IN $entity_types] as entity_type
+    WITH entity_type, node, score
+    ORDER BY score DESC
+    WITH entity_type, collect({{node: node, score: score}})[..5] as hits
+    UNWIND hits as hit
+    RETURN entity_type, coalesce(hit.node.name, hit.node.code) as name,
+           properties(hit.node) as properties, hit.score as score
+    ORDER BY score DESC
+    """
     
     for entity in entities:
-        for entity_type in entity_types:
-            query = f"""
-            MATCH (e:{entity_type})
-            WHERE e.name CONTAINS $entity_name
-            RETURN e.name as name, labels(e) as types, properties(e) as properties
-            LIMIT 5
-            """
-            
-            results = await neo4j_manager.execute_query(query, {"entity_name": entity})
-            
-            for result in results:
-                matched_entities.append({
-                    "name": result["name"],
-                    "type": entity_type,
-                    "properties": result["properties"],
-                    "match_score": calculate_match_score(entity, result["name"])
-                })
+        search = fulltext_search(entity)
+        if not search:
+            continue
+        results = await neo4j_manager.execute_query(query, {"search": search, "entity_types": entity_types})
+        
+        for result in results:
+            matched_entities.append({
+                "name": result["name"],
+                "type": result["entity_type"],
+                "properties": result["properties"],
+                "match_score": calculate_match_score(entity, result["name"]),
+                "search_score": result["score"]
+            })
     
     return matched_entities
 
@@ -386,7 +411,7 @@ async def find_entity_relationships(entities: List[Dict[str, Any]]) -> List[Dict
         for entity2 in entities[i+1:]:
             query = """
             MATCH (e1)-[r]->(e2)
-            WHERE e1.name = $name1 AND e2.name = $name2
+            WHERE e1.name = $name1 AND e2.name = $name2 AND e1.generation = $generation
             RETURN type(r) as relationship_type, properties(r) as rel_properties
             """
             
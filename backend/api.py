@@ -1,22 +1,45 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import time
 import asyncio
-from typing import Dict, Any, List
+import base64
+import hashlib
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
 from loguru import logger
 import json
+from contextlib import asynccontextmanager
 
-from schemas import QueryRequest, QueryResponse, CDCNotification, SyncStatus
-from neo4j_manager import Neo4jManager
+from schemas import (
+    QueryRequest, QueryResponse, BatchQueryRequest, BatchQueryAnswer, BatchQueryResponse,
+    CDCNotification, SyncStatus
+)
+from neo4j_manager import AsyncNeo4jManager, close_driver, close_async_driver
+from database_manager import PostgreSQLManager, close_pool
 from nl_to_cypher import NLToCypherTranslator
 from knowledge_graph_sync import KnowledgeGraphSync
+from query_cache import QueryResultCache, normalize_cypher
+from query_guard import QueryGuard, QueryPlan, QueryRejected, has_stable_order
+from gazetteer import EntityGazetteer, keep_gazetteer_fresh
+from risk_profiles import RISK_PROFILES_QUERY, RISK_LEVELS
 from config import settings
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Share pooled Neo4j and PostgreSQL connections for the lifetime of the app"""
+    refresher = asyncio.create_task(keep_gazetteer_fresh(gazetteer, neo4j_manager))
+    yield
+    refresher.cancel()
+    await close_async_driver()
+    close_driver()
+    close_pool()
+
+
 app = FastAPI(
     title="Logistics Knowledge Graph API",
     description="GraphRAG API for logistics and trade knowledge graph",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -28,14 +51,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global instances
-neo4j_manager = Neo4jManager()
-translator = NLToCypherTranslator()
+# Global instances; request handlers await Neo4j, sync work runs in threads
+neo4j_manager = AsyncNeo4jManager()
+gazetteer = EntityGazetteer()
+translator = NLToCypherTranslator(gazetteer=gazetteer)
 sync = KnowledgeGraphSync()
+query_cache = QueryResultCache()
+query_guard = QueryGuard(neo4j_manager)
 
 # Background task tracking
 active_syncs: Dict[str, Dict[str, Any]] = {}
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Wraps a translated query to read one page; one extra row tells whether another page follows.
+# Pages are offsets: each re-runs the query, so only queries ending in ORDER BY are paged
+PAGE_QUERY_TEMPLATE = """
+CALL {{
+{query}
+}}
+RETURN *
+SKIP $page_offset LIMIT $page_limit
+"""
+
 
 @app.get("/")
 async def root():
@@ -45,9 +83,12 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "query": "/query",
+            "batch_query": "/query/batch",
             "health": "/health",
             "stats": "/stats",
-            "sync": "/sync"
+            "risk_profiles": "/risk/profiles",
+            "sync": "/sync",
+            "incremental_sync": "/sync/incremental"
         }
     }
 
@@ -181,7 +222,7 @@ async def health_check():
     """Health check endpoint"""
     try:
         # Test Neo4j connection
-        stats = neo4j_manager.get_graph_statistics()
+        stats = await neo4j_manager.get_graph_statistics()
         return {
             "status": "healthy",
             "neo4j_connected": True,
@@ -193,9 +234,11 @@ async def health_check():
 
 
 @app.post("/query", response_model=QueryResponse)
-async def query_graph(request: QueryRequest):
+async def query_graph(request: QueryRequest, accept: Optional[str] = Header(None)):
     """
-    GraphRAG endpoint for natural language queries
+    GraphRAG endpoint for natural language queries.
+    Send `Accept: application/x-ndjson` to stream rows as they are read,
+    or page_size/cursor to read large results a page at a time.
     
     Examples:
     - "Has this shipper ever sent this product to Poti?"
@@ -213,30 +256,55 @@ async def query_graph(request: QueryRequest):
         logger.info(f"Generated Cypher: {cypher_query}")
         logger.info(f"Parameters: {params}")
         
-        # Execute query
-        results = neo4j_manager.execute_query(cypher_query, params)
+        graph_version = await neo4j_manager.get_graph_version()
+        
+        if accept and NDJSON_MEDIA_TYPE in accept:
+            # Streamed rows are not held in memory, so only the plan is checked, not capped
+            await query_guard.check(cypher_query, params)
+            return StreamingResponse(
+                _stream_query_rows(request.question, cypher_query, params, start_time),
+                media_type=NDJSON_MEDIA_TYPE
+            )
+        
+        page = _requested_page(request, cypher_query, params, graph_version)
+        run_query, run_params = cypher_query, params
+        if page is not None:
+            offset, page_size = page
+            run_query = PAGE_QUERY_TEMPLATE.format(query=cypher_query)
+            run_params = {**params, "page_offset": offset, "page_limit": page_size + 1}
+        
+        run_query, plan = await query_guard.prepare(run_query, run_params)
+        results, cached = await _read_cached(run_query, run_params, graph_version)
+        
+        next_cursor = None
+        if page is not None and len(results) > page_size:
+            results = results[:page_size]
+            next_cursor = _encode_cursor(offset + page_size, cypher_query, params, graph_version)
         execution_time = (time.time() - start_time) * 1000
         
         # Format answer
         answer = translator.format_answer(request.question, results, cypher_query)
         
-        # Calculate confidence based on result completeness
-        confidence = 1.0 if results else 0.5
-        if "count" in cypher_query.lower() and results:
-            confidence = 0.9
-        
         response = QueryResponse(
             question=request.question,
             answer=answer,
             cypher_query=cypher_query,
             results=results,
             execution_time_ms=round(execution_time, 2),
-            confidence=confidence
+            confidence=_answer_confidence(cypher_query, results),
+            cached=cached,
+            next_cursor=next_cursor,
+            estimated_rows=plan.estimated_rows,
+            estimated_rows_first_seen=plan.first_seen_estimate
         )
         
-        logger.info(f"Query completed in {execution_time:.2f}ms")
+        logger.info(f"Query completed in {execution_time:.2f}ms" + (" (cached)" if cached else ""))
         return response
         
+    except HTTPException:
+        raise
+    except QueryRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Query failed: {e}")
         execution_time = (time.time() - start_time) * 1000
@@ -247,24 +315,224 @@ async def query_graph(request: QueryRequest):
         )
 
 
+@app.post("/query/batch", response_model=BatchQueryResponse)
+async def query_graph_batch(request: BatchQueryRequest):
+    """
+    Answer many questions in one request: every question is translated,
+    identical Cypher is run once, and distinct queries run concurrently
+    (at most QUERY_BATCH_CONCURRENCY at a time). A failing question does
+    not fail the batch; its answer carries the error instead.
+    """
+    start_time = time.time()
+    if len(request.questions) > settings.query_batch_max_questions:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.query_batch_max_questions} questions per batch"
+        )
+    
+    # Translate everything first and group questions by the query they need
+    translations: List[Optional[Tuple[str, Dict[str, Any], float]]] = []
+    errors: Dict[int, str] = {}
+    distinct: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+    for index, question in enumerate(request.questions):
+        translate_start = time.time()
+        try:
+            cypher_query, params = translator.translate(question)
+        except Exception as e:
+            logger.error(f"Batch translation failed for {question!r}: {e}")
+            translations.append(None)
+            errors[index] = f"Query translation failed: {str(e)}"
+            continue
+        translations.append((cypher_query, params, (time.time() - translate_start) * 1000))
+        distinct.setdefault(QueryResultCache.make_key(cypher_query, params), (cypher_query, params))
+    
+    graph_version = await neo4j_manager.get_graph_version()
+    semaphore = asyncio.Semaphore(settings.query_batch_concurrency)
+    
+    async def run(cypher_query: str, params: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], bool, float, QueryPlan]:
+        async with semaphore:
+            query_start = time.time()
+            cypher_query, plan = await query_guard.prepare(cypher_query, params)
+            results, cached = await _read_cached(cypher_query, params, graph_version)
+            return results, cached, (time.time() - query_start) * 1000, plan
+    
+    keys = list(distinct)
+    outcomes = dict(zip(keys, await asyncio.gather(
+        *(run(*distinct[key]) for key in keys), return_exceptions=True
+    )))
+    
+    answers = []
+    for index, question in enumerate(request.questions):
+        translation = translations[index]
+        if translation is None:
+            answers.append(BatchQueryAnswer(question=question, answer="", error=errors[index]))
+            continue
+        
+        cypher_query, params, translation_ms = translation
+        outcome = outcomes[QueryResultCache.make_key(cypher_query, params)]
+        if isinstance(outcome, Exception):
+            logger.error(f"Batch query failed for {question!r}: {outcome}")
+            answers.append(BatchQueryAnswer(
+                question=question, answer="", cypher_query=cypher_query,
+                translation_time_ms=round(translation_ms, 2),
+                error=f"Query processing failed: {str(outcome)}"
+            ))
+            continue
+        
+        results, cached, query_ms, plan = outcome
+        answers.append(BatchQueryAnswer(
+            question=question,
+            answer=translator.format_answer(question, results, cypher_query),
+            cypher_query=cypher_query,
+            results=results,
+            execution_time_ms=round(query_ms, 2),
+            translation_time_ms=round(translation_ms, 2),
+            confidence=_answer_confidence(cypher_query, results),
+            cached=cached,
+            estimated_rows=plan.estimated_rows,
+            estimated_rows_first_seen=plan.first_seen_estimate
+        ))
+    
+    execution_time = (time.time() - start_time) * 1000
+    logger.info(
+        f"Batch of {len(request.questions)} questions ran {len(distinct)} distinct queries "
+        f"in {execution_time:.2f}ms"
+    )
+    return BatchQueryResponse(
+        answers=answers,
+        distinct_queries=len(distinct),
+        execution_time_ms=round(execution_time, 2)
+    )
+
+
+async def _read_cached(cypher_query: str, params: Dict[str, Any],
+                       graph_version: Tuple[int, int]) -> Tuple[List[Dict[str, Any]], bool]:
+    """Results of a read query, served from the cache while the graph is unchanged"""
+    results = query_cache.get(cypher_query, params, graph_version)
+    if results is not None:
+        return results, True
+    results = await neo4j_manager.execute_read(cypher_query, params, timeout=query_guard.timeout)
+    query_cache.put(cypher_query, params, graph_version, results)
+    return results, False
+
+
+def _answer_confidence(cypher_query: str, results: List[Dict[str, Any]]) -> float:
+    """Confidence based on result completeness"""
+    confidence = 1.0 if results else 0.5
+    if "count" in cypher_query.lower() and results:
+        confidence = 0.9
+    return confidence
+
+
+def _query_digest(cypher_query: str, params: Dict[str, Any]) -> str:
+    """Short fingerprint of a translated query, so a cursor is only used for the query it came from"""
+    return hashlib.sha1(QueryResultCache.make_key(cypher_query, params).encode()).hexdigest()[:16]
+
+
+def _encode_cursor(offset: int, cypher_query: str, params: Dict[str, Any], graph_version: Tuple[int, int]) -> str:
+    """Opaque cursor: next offset, the generation it was read from and the query fingerprint"""
+    payload = f"{offset}:{graph_version[0]}:{_query_digest(cypher_query, params)}"
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _requested_page(request: QueryRequest, cypher_query: str, params: Dict[str, Any],
+                    graph_version: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+    """
+    (offset, page size) asked for by the request, or None to return every row.
+    The cursor carries an offset, so pages are only consistent for a query with a final ORDER BY.
+    """
+    if request.page_size is None and request.cursor is None:
+        return None
+    if not has_stable_order(cypher_query):
+        raise HTTPException(
+            status_code=400,
+            detail="This question's results have no fixed order and cannot be paged; "
+                   "ask without page_size or stream them with Accept: application/x-ndjson"
+        )
+    page_size = min(request.page_size or settings.query_default_page_size, settings.query_max_page_size)
+    # The page LIMIT is a parameter, which QueryGuard.cap leaves alone, so the row cap is applied here
+    if query_guard.max_rows > 0:
+        page_size = min(page_size, query_guard.max_rows)
+    if request.cursor is None:
+        return 0, page_size
+    
+    try:
+        offset, generation, digest = base64.urlsafe_b64decode(request.cursor.encode()).decode().split(":")
+        offset, generation = int(offset), int(generation)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if digest != _query_digest(cypher_query, params):
+        raise HTTPException(status_code=400, detail="Cursor belongs to a different question")
+    # Pages of one result must come from one generation; a rebuild replaced it
+    if generation != graph_version[0]:
+        raise HTTPException(status_code=409, detail="The graph was rebuilt since this cursor was issued; start again")
+    return offset, page_size
+
+
+def _ndjson(data: Dict[str, Any]) -> bytes:
+    return (json.dumps(data, default=str) + "\n").encode()
+
+
+async def _stream_query_rows(question: str, cypher_query: str, params: Dict[str, Any],
+                             start_time: float) -> AsyncIterator[bytes]:
+    """
+    NDJSON body of a streamed /query: a "query" line, one "row" line per record
+    as it comes off the Bolt cursor, then an "end" line (or an "error" line).
+    Rows are never held in memory together, so streamed results are not cached.
+    """
+    yield _ndjson({"type": "query", "question": question, "cypher_query": normalize_cypher(cypher_query)})
+    rows = 0
+    try:
+        async for record in neo4j_manager.stream_read(cypher_query, params, timeout=query_guard.timeout):
+            rows += 1
+            yield _ndjson({"type": "row", "data": record})
+    except Exception as e:
+        logger.error(f"Streaming query failed after {rows} rows: {e}")
+        yield _ndjson({"type": "error", "detail": f"Query processing failed: {str(e)}", "rows": rows})
+        return
+    
+    execution_time = (time.time() - start_time) * 1000
+    logger.info(f"Streamed {rows} rows in {execution_time:.2f}ms")
+    yield _ndjson({"type": "end", "rows": rows, "execution_time_ms": round(execution_time, 2)})
+
+
 @app.get("/stats")
 async def get_graph_statistics():
     """Get current graph statistics"""
     try:
-        stats = neo4j_manager.get_graph_statistics()
+        stats = await neo4j_manager.get_graph_statistics()
         return {
             "status": "success",
             "statistics": stats,
             "summary": {
                 "total_nodes": sum(stats[k] for k in stats if k != "relationships"),
                 "total_relationships": sum(stats.get("relationships", {}).values())
-            }
+            },
+            "query_cache": query_cache.stats(),
+            "gazetteer": gazetteer.stats(),
+            "translation_memo": translator.memo.stats(),
+            "query_guard": query_guard.stats()
         }
     except Exception as e:
         logger.error(f"Stats retrieval failed: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to retrieve statistics: {str(e)}")
 
 
+@app.get("/risk/profiles")
+async def get_risk_profiles(risk_level: Optional[str] = None, limit: int = Query(50, ge=1, le=1000)):
+    """Shippers' precomputed risk profiles, those touching embargoed countries and shipping most first"""
+    if risk_level is not None and risk_level not in RISK_LEVELS:
+        raise HTTPException(status_code=400, detail=f"risk_level must be one of {', '.join(RISK_LEVELS)}")
+    try:
+        params = {"risk_levels": [risk_level] if risk_level else RISK_LEVELS, "limit": limit}
+        graph_version = await neo4j_manager.get_graph_version()
+        profiles, cached = await _read_cached(RISK_PROFILES_QUERY, params, graph_version)
+        return {"status": "success", "profiles": profiles, "cached": cached}
+    except Exception as e:
+        logger.error(f"Risk profile retrieval failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve risk profiles: {str(e)}")
+
+
 @app.post("/sync/document/{document_id}")
 async def sync_document(document_id: int, background_tasks: BackgroundTasks):
     """Trigger sync for specific document"""
@@ -293,6 +561,14 @@ async def sync_document(document_id: int, background_tasks: BackgroundTasks):
 async def sync_all_documents(background_tasks: BackgroundTasks):
     """Trigger full sync of all documents"""
     try:
+        # One rebuild at a time, whether started here, by another replica or by the CLI
+        queued = any(
+            task["type"] == "full_sync" and task["status"] in ("pending", "running")
+            for task in active_syncs.values()
+        )
+        if queued or await asyncio.to_thread(sync.pg_manager.is_rebuild_running):
+            raise HTTPException(status_code=409, detail="A full graph rebuild is already running")
+        
         task_id = f"sync_all_{int(time.time())}"
         active_syncs[task_id] = {"status": "pending", "type": "full_sync"}
         
@@ -303,18 +579,51 @@ async def sync_all_documents(background_tasks: BackgroundTasks):
             "task_id": task_id,
             "status": "pending"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Full sync trigger failed: {e}")
         raise HTTPException(status_code=500, detail=f"Full sync trigger failed: {str(e)}")
 
 
+@app.post("/sync/incremental")
+async def sync_incremental(background_tasks: BackgroundTasks):
+    """Trigger sync of rows changed since the last successful sync"""
+    try:
+        task_id = f"sync_incremental_{int(time.time())}"
+        active_syncs[task_id] = {"status": "pending", "type": "incremental_sync"}
+        
+        background_tasks.add_task(_sync_incremental_background, task_id)
+        
+        return {
+            "message": "Incremental sync started",
+            "task_id": task_id,
+            "status": "pending"
+        }
+    except Exception as e:
+        logger.error(f"Incremental sync trigger failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Incremental sync trigger failed: {str(e)}")
+
+
 @app.get("/sync/status/{task_id}")
 async def get_sync_status(task_id: str):
-    """Get status of a sync task"""
-    if task_id not in active_syncs:
-        raise HTTPException(status_code=404, detail="Task not found")
+    """Get status of a sync task, with checkpointed progress for full syncs"""
+    task = active_syncs.get(task_id)
+    if task is not None and task.get("type") != "full_sync":
+        return task
     
-    return active_syncs[task_id]
+    # Full sync runs are persisted, so their progress survives API restarts
+    run_id = task.get("run_id", task_id) if task else task_id
+    progress = await asyncio.to_thread(sync.get_sync_progress, run_id)
+    if progress is None and task is not None and task["status"] == "running":
+        # The task resumed an earlier run, which is the latest one
+        progress = await asyncio.to_thread(sync.get_sync_progress)
+    
+    if task is None:
+        if progress is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+        return {"status": progress["status"], "type": "full_sync", "progress": progress}
+    return {**task, "progress": progress}
 
 
 @app.post("/cdc/notification")
@@ -396,7 +705,7 @@ async def _sync_document_background(task_id: str, document_id: int):
         active_syncs[task_id]["status"] = "running"
         active_syncs[task_id]["started_at"] = time.time()
         
-        sync.sync_single_document(document_id)
+        await asyncio.to_thread(sync.sync_single_document, document_id)
         
         active_syncs[task_id]["status"] = "completed"
         active_syncs[task_id]["completed_at"] = time.time()
@@ -416,7 +725,17 @@ async def _sync_all_background(task_id: str):
         active_syncs[task_id]["status"] = "running"
         active_syncs[task_id]["started_at"] = time.time()
         
-        sync.sync_all_data()
+        def report_partitions(partitions: Dict[int, Dict[str, Any]]):
+            active_syncs[task_id]["partitions"] = {
+                index: dict(progress) for index, progress in partitions.items()
+            }
+        
+        # A run interrupted earlier is resumed under its own run id
+        result = await asyncio.to_thread(
+            sync.sync_all_data, progress_callback=report_partitions, run_id=task_id
+        )
+        active_syncs[task_id]["result"] = result
+        active_syncs[task_id]["run_id"] = result["run_id"]
         
         active_syncs[task_id]["status"] = "completed"
         active_syncs[task_id]["completed_at"] = time.time()
@@ -430,6 +749,26 @@ async def _sync_all_background(task_id: str):
         active_syncs[task_id]["completed_at"] = time.time()
 
 
+async def _sync_incremental_background(task_id: str):
+    """Background task to sync rows changed since the last sync"""
+    try:
+        active_syncs[task_id]["status"] = "running"
+        active_syncs[task_id]["started_at"] = time.time()
+        
+        active_syncs[task_id]["synced"] = await asyncio.to_thread(sync.sync_incremental)
+        
+        active_syncs[task_id]["status"] = "completed"
+        active_syncs[task_id]["completed_at"] = time.time()
+        
+        logger.info("Background incremental sync completed")
+        
+    except Exception as e:
+        logger.error(f"Background incremental sync failed: {e}")
+        active_syncs[task_id]["status"] = "failed"
+        active_syncs[task_id]["error"] = str(e)
+        active_syncs[task_id]["completed_at"] = time.time()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -11,11 +11,15 @@ from rich.panel import Panel
 from loguru import logger
 import sys
 import os
+from datetime import timedelta
 
 # Add the backend directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from knowledge_graph_sync import KnowledgeGraphSync
+from knowledge_graph_sync import KnowledgeGraphSync, INCREMENTAL_SYNC
+from graph_export import GraphImportExporter
+from neo4j_manager import close_driver
+from database_manager import close_pool
 from config import settings
 
 app = typer.Typer(help="Logistics Knowledge Graph Sync CLI")
@@ -50,13 +54,15 @@ def init():
 @app.command()
 def sync(
     all: bool = typer.Option(False, "--all", "-a", help="Sync all data"),
+    incremental: bool = typer.Option(False, "--incremental", "-i", help="Sync rows changed since the last sync"),
+    restart: bool = typer.Option(False, "--restart", help="With --all, discard an interrupted run instead of resuming it"),
     document_id: int = typer.Option(None, "--document", "-d", help="Sync specific document ID")
 ):
     """Sync data from PostgreSQL to Neo4j"""
     setup_logging()
     
-    if not all and not document_id:
-        console.print("❌ Please specify either --all or --document <id>", style="bold red")
+    if not all and not incremental and not document_id:
+        console.print("❌ Please specify either --all, --incremental or --document <id>", style="bold red")
         raise typer.Exit(1)
     
     try:
@@ -64,8 +70,19 @@ def sync(
         
         if all:
             console.print(Panel("Syncing All Data", style="bold blue"))
-            sync.sync_all_data()
-            console.print("✅ All data synced successfully!", style="bold green")
+            result = sync.sync_all_data(wait_for_gc=True, resume=not restart)
+            console.print(
+                f"✅ All data synced successfully! Active graph generation: {result['generation']}",
+                style="bold green"
+            )
+        elif incremental:
+            console.print(Panel("Syncing Changes Since Last Sync", style="bold blue"))
+            synced = sync.sync_incremental()
+            console.print(
+                f"✅ Incremental sync completed: {synced['customers']} customers, "
+                f"{synced['documents']} documents, {synced['deleted']} deletes",
+                style="bold green"
+            )
         else:
             console.print(Panel(f"Syncing Document {document_id}", style="bold blue"))
             sync.sync_single_document(document_id)
@@ -76,6 +93,52 @@ def sync(
         raise typer.Exit(1)
 
 
+@app.command()
+def risk_profiles():
+    """Recompute every shipper's risk profile in the active graph"""
+    setup_logging()
+    console.print(Panel("Refreshing Risk Profiles", style="bold blue"))
+    
+    try:
+        sync = KnowledgeGraphSync()
+        profiled = sync.risk_profiles.refresh_all()
+        console.print(f"✅ Refreshed {profiled} risk profiles", style="bold green")
+    except Exception as e:
+        console.print(f"❌ Error refreshing risk profiles: {e}", style="bold red")
+        raise typer.Exit(1)
+
+
+@app.command()
+def export_import(
+    output: str = typer.Option("graph_import", "--output", "-o", help="Directory to write the CSV files to"),
+    generation: int = typer.Option(1, "--generation", help="Graph generation to stamp on every node"),
+    set_watermark: bool = typer.Option(True, "--set-watermark/--no-set-watermark",
+                                       help="Start incremental sync from the export's snapshot")
+):
+    """Export PostgreSQL to CSVs for an offline neo4j-admin bulk import"""
+    setup_logging()
+    console.print(Panel("Exporting Graph for neo4j-admin import", style="bold blue"))
+
+    try:
+        sync = KnowledgeGraphSync()
+        exporter = GraphImportExporter(sync.pg_manager, sync.field_mappings, os.path.abspath(output), generation)
+        result = exporter.export()
+
+        if set_watermark:
+            sync.pg_manager.save_sync_state(INCREMENTAL_SYNC, result["watermark"], completed=True)
+
+        console.print(f"✅ Exported {len(result['files'])} files to {output}", style="bold green")
+        console.print("\nStop Neo4j, then load the files with:\n", style="bold")
+        console.print(exporter.import_command(), markup=False)
+        console.print(
+            "\nStart Neo4j and run `cli.py init` to create the constraints and `cli.py risk-profiles`"
+            + (", then `cli.py sync --incremental` picks up changes made since the export." if set_watermark else "."),
+        )
+    except Exception as e:
+        console.print(f"❌ Error exporting graph: {e}", style="bold red")
+        raise typer.Exit(1)
+
+
 @app.command()
 def status():
     """Show sync status and graph statistics"""
@@ -108,6 +171,30 @@ def status():
         console.print(neo4j_table)
         console.print()
         
+        # Latest full sync run
+        progress = sync.get_sync_progress()
+        if progress:
+            run_table = Table(title=f"Full Sync Run {progress['run_id']}", show_header=True, header_style="bold magenta")
+            run_table.add_column("Metric", style="cyan")
+            run_table.add_column("Value", justify="right", style="green")
+            
+            run_table.add_row("Status", progress["status"])
+            run_table.add_row("Generation", str(progress["generation"]))
+            run_table.add_row(
+                "Documents",
+                f"{progress['documents_done']}/{progress['documents_total']} ({progress['percent']}%)"
+            )
+            run_table.add_row("Remaining", str(progress["documents_remaining"]))
+            if progress["rows_per_second"]:
+                run_table.add_row("Rows/s", str(progress["rows_per_second"]))
+            if progress["eta_seconds"] is not None:
+                run_table.add_row("ETA", str(timedelta(seconds=progress["eta_seconds"])))
+            if progress["error"]:
+                run_table.add_row("Error", progress["error"])
+            
+            console.print(run_table)
+            console.print()
+        
         # Relationship Statistics
         if "relationships" in status_data["neo4j"] and status_data["neo4j"]["relationships"]:
             rel_table = Table(title="Relationship Statistics", show_header=True, header_style="bold magenta")
@@ -167,4 +254,8 @@ def test_connection():
 
 
 if __name__ == "__main__":
-    app()
+    try:
+        app()
+    finally:
+        close_driver()
+        close_pool()
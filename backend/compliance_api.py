@@ -5,6 +5,7 @@ REST API for compliance checking and monitoring
 """
 
 import asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Query
@@ -13,7 +14,7 @@ from pydantic import BaseModel, Field
 import logging
 
 from compliance_engine import ComplianceEngine, ComplianceReport, ComplianceStatus, ComplianceSeverity
-from neo4j_manager import Neo4jManager
+from neo4j_manager import close_async_driver
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -74,11 +75,18 @@ class ComplianceAlertResponse(BaseModel):
     status: str
     created_at: datetime
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Share one pooled async Neo4j driver for the lifetime of the app"""
+    yield
+    await close_async_driver()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Compliance Engine API",
     description="Automated compliance checking for trade documents",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Global compliance engine instance
@@ -99,8 +107,7 @@ async def health_check():
     """Health check endpoint"""
     try:
         # Test Neo4j connection
-        neo4j_manager = Neo4jManager()
-        stats = neo4j_manager.get_graph_statistics()
+        stats = await compliance_engine.neo4j_manager.get_graph_statistics()
         
         return {
             "status": "healthy",
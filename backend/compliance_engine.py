@@ -17,7 +17,7 @@ import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from neo4j_manager import Neo4jManager
+from neo4j_manager import AsyncNeo4jManager, close_async_driver
 from psycopg2.extras import RealDictCursor
 import psycopg2
 
@@ -79,7 +79,7 @@ class ComplianceEngine:
     """Main compliance engine using knowledge graph"""
     
     def __init__(self):
-        self.neo4j_manager = Neo4jManager()
+        self.neo4j_manager = AsyncNeo4jManager()
         self.rules = self.load_compliance_rules()
         self.iban_validator = IBANValidator()
         self.id_validator = IDValidator()
@@ -236,7 +236,7 @@ class ComplianceEngine:
         try:
             # Get document details
             doc_query = """
-            MATCH (d:Document {id: $document_id})
+            MATCH (d:Document {id: $document_id, generation: $generation})
             OPTIONAL MATCH (d)-[r]->(entity)
             RETURN d, 
                    type(r) as relationship_type,
@@ -791,5 +791,12 @@ async def main():
     else:
         parser.print_help()
 
+async def run_main():
+    """Run the CLI and close the async Neo4j driver before the loop ends"""
+    try:
+        await main()
+    finally:
+        await close_async_driver()
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(run_main())
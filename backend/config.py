@@ -11,10 +11,61 @@ class Settings(BaseSettings):
     postgres_user: str = Field(default="postgres", description="PostgreSQL username")
     postgres_password: str = Field(default="password", description="PostgreSQL password")
     
+    postgres_pool_min_size: int = Field(default=1, description="Connections kept open in the PostgreSQL pool")
+    postgres_pool_max_size: int = Field(default=10, description="Maximum connections in the PostgreSQL pool")
+    postgres_pool_reserved: int = Field(default=2, description="Pool connections a full sync leaves free for API requests")
+    postgres_stream_itersize: int = Field(default=2000, description="Rows fetched per round trip by streaming cursors")
+    
     # Neo4j Configuration - Read from environment variables
     neo4j_uri: str = Field(default="bolt://localhost:7687", description="Neo4j connection URI")
     neo4j_user: str = Field(default="neo4j", description="Neo4j username")
     neo4j_password: str = Field(default="password", description="Neo4j password")
+    neo4j_max_connection_pool_size: int = Field(default=50, description="Maximum Bolt connections kept in the driver pool")
+    neo4j_connection_acquisition_timeout: float = Field(default=60.0, description="Seconds to wait for a pooled Neo4j connection")
+    neo4j_keep_alive: bool = Field(default=True, description="Enable TCP keep-alive on pooled Neo4j connections")
+    neo4j_max_connection_lifetime: float = Field(default=3600.0, description="Seconds after which pooled Neo4j connections are recycled")
+    neo4j_max_transaction_retry_time: float = Field(default=30.0, description="Seconds managed transactions keep retrying transient errors")
+    neo4j_stream_fetch_size: int = Field(default=1000, description="Records pulled per Bolt round trip when streaming query results")
+    
+    # Graph sync
+    sync_batch_size: int = Field(default=1000, description="Rows per UNWIND batch when writing to Neo4j")
+    sync_incremental_page_size: int = Field(default=5000, description="Changed rows read per page during incremental sync")
+    sync_watermark_overlap_seconds: float = Field(default=30.0, description="How far before the saved watermark incremental sync re-reads, for writes committed after a later-stamped row was synced; at least the longest write transaction")
+    sync_workers: int = Field(default=4, description="Document partitions synced concurrently during a full sync; each holds up to 2 pooled PostgreSQL connections, so POSTGRES_POOL_MAX_SIZE must be at least twice this plus POSTGRES_POOL_RESERVED")
+    graph_state_refresh_seconds: float = Field(default=2.0, description="How long readers cache the active graph generation")
+    graph_gc_chunk_size: int = Field(default=10000, description="Nodes deleted per transaction when garbage-collecting an old generation")
+    graph_gc_delay_seconds: float = Field(default=60.0, description="How long a replaced generation is kept after activation, for readers that still cache it or are mid-query; at least GRAPH_STATE_REFRESH_SECONDS plus QUERY_TIMEOUT_SECONDS is used")
+    risk_profile_batch_size: int = Field(default=200, description="LegalEntity risk profiles recomputed per write transaction")
+    
+    # /query results
+    query_cache_max_entries: int = Field(default=1024, description="Distinct (cypher, params) results kept by the /query cache; 0 disables it")
+    query_cache_ttl_seconds: float = Field(default=300.0, description="Seconds a cached /query result is served before it is re-read")
+    query_default_page_size: int = Field(default=100, description="Rows per /query page when a cursor is given without a page size")
+    query_max_page_size: int = Field(default=1000, description="Largest page size a /query request may ask for")
+    query_batch_max_questions: int = Field(default=50, description="Most questions accepted by one /query/batch request")
+    query_batch_concurrency: int = Field(default=8, description="Distinct queries of a /query/batch request run at once")
+    query_max_rows: int = Field(default=5000, description="LIMIT added to /query reads that have none or a larger one; 0 disables it")
+    query_timeout_seconds: float = Field(default=30.0, description="Transaction timeout of /query reads; Neo4j terminates longer ones")
+    query_plan_cache_size: int = Field(default=512, description="Query shapes whose EXPLAIN plan the cost guard keeps")
+    translation_memo_size: int = Field(default=2048, description="Question shapes whose translation is memoized; 0 disables the memo")
+    gazetteer_refresh_seconds: float = Field(default=5.0, description="How often the entity gazetteer checks the graph for new names")
+    
+    # Real-time sync
+    cdc_source: str = Field(default="outbox", description="CDC source for real-time sync: 'outbox' (trigger-written table) or 'logical_replication'")
+    cdc_replication_slot: str = Field(default="knowledge_graph_sync", description="Logical replication slot (test_decoding) read when CDC_SOURCE=logical_replication")
+    cdc_replication_feedback_seconds: float = Field(default=10.0, description="Interval between confirmed-LSN status updates sent to the replication slot")
+    cdc_debounce_seconds: float = Field(default=0.5, description="Quiet period after a document's last change notification before it is synced")
+    cdc_max_latency_seconds: float = Field(default=5.0, description="Longest a continuously changing document waits before it is synced anyway")
+    cdc_max_batch_documents: int = Field(default=500, description="Documents synced together in one bulk graph write")
+    cdc_sync_workers: int = Field(default=4, description="Threads running CDC graph writes off the event loop")
+    cdc_queue_size: int = Field(default=100, description="Sync batches waiting for a worker before new changes are held back in the debounce buffer")
+    cdc_max_concurrent_per_customer: int = Field(default=2, description="CDC sync batches of a single customer running at once")
+    cdc_outbox_batch_size: int = Field(default=500, description="Outbox events claimed per query")
+    cdc_outbox_poll_seconds: float = Field(default=5.0, description="Outbox poll interval when no wake-up notification arrives")
+    cdc_outbox_lease_seconds: float = Field(default=300.0, description="How long claimed outbox events stay reserved before another consumer may take them")
+    cdc_outbox_retry_seconds: float = Field(default=30.0, description="Delay before outbox events of a failed sync are retried")
+    cdc_outbox_max_attempts: int = Field(default=10, description="Failed syncs after which an outbox event is dead-lettered (claimed_until = 'infinity'); 0 retries forever")
+    cdc_metrics_log_seconds: float = Field(default=60.0, description="Interval between CDC queue depth and lag log lines")
     
     # Logging
     log_level: str = Field(default="INFO", description="Logging level")
@@ -1,42 +1,181 @@
+import threading
+import uuid
+import asyncpg
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
 from psycopg2.extras import RealDictCursor
-from typing import List, Dict, Any, Optional
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 from contextlib import contextmanager
 from loguru import logger
 from config import settings
 
 
+# Watermark streams tracked by incremental sync: stream name -> source table
+WATERMARK_STREAMS = {
+    "customers": "customers",
+    "documents": "documents",
+    "fields": "document_field_best_values",
+    "deletes": "graph_sync_deletes"
+}
+
+# Columns read from document_field_best_values, all covered by its document_id index
+BEST_VALUE_COLUMNS = "id, document_id, field_name, target_graph_label, best_value"
+
+# Session advisory lock held by the one process running a full graph rebuild
+REBUILD_LOCK_KEY = 7410021
+
+_pool: Optional[ThreadedConnectionPool] = None
+_pool_slots: Optional[threading.BoundedSemaphore] = None
+_pool_lock = threading.Lock()
+_async_pool: Optional[asyncpg.Pool] = None
+
+
+def connection_kwargs() -> Dict[str, Any]:
+    """Connection arguments for TCP or Cloud SQL Unix socket connections"""
+    return {
+        "host": settings.postgres_host,
+        "port": settings.postgres_port,
+        "database": settings.postgres_db,
+        "user": settings.postgres_user,
+        "password": settings.postgres_password
+    }
+
+
+def get_pool() -> ThreadedConnectionPool:
+    """Return the process-wide thread-safe psycopg2 pool, creating it on first use"""
+    global _pool, _pool_slots
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(
+                    settings.postgres_pool_min_size,
+                    settings.postgres_pool_max_size,
+                    **connection_kwargs()
+                )
+                # psycopg2 raises when the pool is exhausted; callers wait for a slot instead
+                _pool_slots = threading.BoundedSemaphore(settings.postgres_pool_max_size)
+                logger.info(f"Created PostgreSQL pool (max {settings.postgres_pool_max_size} connections)")
+    return _pool
+
+
+def close_pool() -> None:
+    """Close every connection in the psycopg2 pool"""
+    global _pool, _pool_slots
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            _pool_slots = None
+            logger.info("PostgreSQL pool closed")
+
+
+async def get_async_pool() -> asyncpg.Pool:
+    """Return the process-wide asyncpg pool for async code paths"""
+    global _async_pool
+    if _async_pool is None:
+        _async_pool = await asyncpg.create_pool(
+            min_size=settings.postgres_pool_min_size,
+            max_size=settings.postgres_pool_max_size,
+            **connection_kwargs()
+        )
+        logger.info(f"Created asyncpg pool (max {settings.postgres_pool_max_size} connections)")
+    return _async_pool
+
+
+async def close_async_pool() -> None:
+    """Close the asyncpg pool"""
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
+        logger.info("asyncpg pool closed")
+
+
+class RebuildInProgress(Exception):
+    """Another process is running a full graph rebuild"""
+
+
+class RebuildLock:
+    """
+    The rebuild advisory lock, held on a dedicated connection outside the pool.
+    PostgreSQL releases it when that connection ends, so a crashed rebuild
+    never blocks the next one.
+    """
+    
+    def __init__(self):
+        self._conn = None
+    
+    def __enter__(self):
+        self._conn = psycopg2.connect(keepalives=1, keepalives_idle=30, **connection_kwargs())
+        self._conn.autocommit = True
+        with self._conn.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", (REBUILD_LOCK_KEY,))
+            acquired = cursor.fetchone()[0]
+        if not acquired:
+            self._conn.close()
+            raise RebuildInProgress("A full graph rebuild is already running")
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Closing the session releases the lock
+        self._conn.close()
+    
+    def check(self) -> None:
+        """Raise unless the lock's connection, and with it the lock, is still alive"""
+        with self._conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+
 class PostgreSQLManager:
+    # Elapsed time is measured by the database so it matches resumed_at's clock
+    _SYNC_RUN_COLUMNS = """
+    SELECT *, EXTRACT(EPOCH FROM (LOCALTIMESTAMP - resumed_at)) as seconds_since_resume
+    FROM graph_sync_runs
+    """
+    
     def __init__(self):
         self.dsn = settings.postgres_dsn
     
     @contextmanager
     def get_connection(self):
-        """Context manager for database connections"""
+        """Context manager for connections borrowed from the shared pool"""
+        pool = get_pool()
+        slots = _pool_slots
+        slots.acquire()
         conn = None
         try:
-            # Check if using Cloud SQL Unix socket
-            if settings.postgres_host.startswith("/cloudsql/"):
-                # For Cloud SQL Unix socket, we need to connect differently
-                conn = psycopg2.connect(
-                    host=settings.postgres_host,
-                    port=settings.postgres_port,
-                    database=settings.postgres_db,
-                    user=settings.postgres_user,
-                    password=settings.postgres_password
-                )
-            else:
-                # Regular TCP connection
-                conn = psycopg2.connect(self.dsn)
+            conn = pool.getconn()
             yield conn
         except Exception as e:
-            if conn:
-                conn.rollback()
             logger.error(f"Database connection error: {e}")
             raise
         finally:
             if conn:
-                conn.close()
+                # Never hand a connection with an open transaction back to the pool
+                if not conn.closed:
+                    conn.rollback()
+                pool.putconn(conn, close=bool(conn.closed))
+            slots.release()
+    
+    def stream_query(self, query: str, params: Optional[tuple] = None,
+                     itersize: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yield rows from a named server-side cursor, fetching itersize rows at a time"""
+        with self.get_connection() as conn:
+            cursor_name = f"stream_{uuid.uuid4().hex}"
+            with conn.cursor(name=cursor_name, cursor_factory=RealDictCursor) as cursor:
+                cursor.itersize = itersize or settings.postgres_stream_itersize
+                cursor.execute(query, params)
+                for row in cursor:
+                    yield dict(row)
+    
+    @contextmanager
+    def snapshot_cursor(self):
+        """Cursor in a read-only REPEATABLE READ transaction, so several reads see one consistent snapshot"""
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+                yield cursor
     
     def execute_query(self, query: str, params: Optional[tuple] = None) -> List[Dict[str, Any]]:
         """Execute a query and return results as list of dictionaries"""
@@ -79,6 +218,44 @@ class PostgreSQLManager:
         
         return self.execute_query(query, params)
     
+    def iter_documents_with_fields(self, id_range: Optional[Tuple[int, int]] = None,
+                                   itersize: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream documents with customer names and their best-value fields in document
+        id order, optionally for an id range, through a single cursor and connection
+        """
+        query = f"""
+        SELECT d.*, c.name as customer_name,
+               COALESCE(
+                   (SELECT json_agg(f ORDER BY f.field_name)
+                    FROM (
+                        SELECT {BEST_VALUE_COLUMNS} FROM document_field_best_values
+                        WHERE document_id = d.id
+                    ) f),
+                   '[]'::json
+               ) as fields
+        FROM documents d 
+        JOIN customers c ON d.customer_id = c.id
+        """
+        params = None
+        
+        if id_range:
+            query += " WHERE d.id BETWEEN %s AND %s"
+            params = id_range
+        
+        query += " ORDER BY d.id"
+        
+        return self.stream_query(query, params, itersize=itersize)
+    
+    def iter_distinct_field_values(self, field_names: List[str],
+                                   itersize: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Stream each distinct non-empty (field_name, best_value) pair of the given fields"""
+        query = """
+        SELECT DISTINCT field_name, best_value FROM document_field_best_values
+        WHERE field_name = ANY(%s) AND best_value IS NOT NULL AND best_value <> ''
+        """
+        return self.stream_query(query, (list(field_names),), itersize=itersize)
+    
     def get_customers(self) -> List[Dict[str, Any]]:
         """Get all customers"""
         query = "SELECT * FROM customers ORDER BY name"
@@ -101,7 +278,329 @@ class PostgreSQLManager:
         
         return self.execute_query(query, params)
     
+    def get_row_counts(self) -> Dict[str, int]:
+        """Count the rows the graph is built from"""
+        query = """
+        SELECT
+            (SELECT count(*) FROM customers) as customers,
+            (SELECT count(*) FROM documents d JOIN customers c ON d.customer_id = c.id) as documents,
+            (SELECT count(*) FROM document_fields) as document_fields
+        """
+        return self.execute_query(query)[0]
+    
+    def iter_documents(self, id_range: Optional[Tuple[int, int]] = None,
+                       itersize: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Stream documents with customer names in document id order, optionally for an id range"""
+        query = """
+        SELECT d.*, c.name as customer_name 
+        FROM documents d 
+        JOIN customers c ON d.customer_id = c.id
+        """
+        params = None
+        
+        if id_range:
+            query += " WHERE d.id BETWEEN %s AND %s"
+            params = id_range
+        
+        query += " ORDER BY d.id"
+        
+        return self.stream_query(query, params, itersize=itersize)
+    
+    def get_document_id_partitions(self, partitions: int) -> List[Dict[str, int]]:
+        """Split document ids into contiguous ranges holding roughly equal row counts"""
+        query = """
+        SELECT min(id) as low, max(id) as high, count(*) as documents
+        FROM (SELECT id, ntile(%s) OVER (ORDER BY id) as part FROM documents) t
+        GROUP BY part
+        ORDER BY part
+        """
+        return self.execute_query(query, (partitions,))
+    
+    def get_document(self, document_id: int) -> Optional[Dict[str, Any]]:
+        """Get a single document with its customer name by primary key"""
+        query = """
+        SELECT d.*, c.name as customer_name 
+        FROM documents d 
+        JOIN customers c ON d.customer_id = c.id
+        WHERE d.id = %s
+        """
+        results = self.execute_query(query, (document_id,))
+        return results[0] if results else None
+    
+    def get_document_with_fields(self, document_id: int) -> Optional[Dict[str, Any]]:
+        """Get a document and its best-value fields in one round trip"""
+        query = f"""
+        SELECT d.*, c.name as customer_name,
+               COALESCE(
+                   (SELECT json_agg(f ORDER BY f.field_name)
+                    FROM (
+                        SELECT {BEST_VALUE_COLUMNS} FROM document_field_best_values
+                        WHERE document_id = d.id
+                    ) f),
+                   '[]'::json
+               ) as fields
+        FROM documents d 
+        JOIN customers c ON d.customer_id = c.id
+        WHERE d.id = %s
+        """
+        results = self.execute_query(query, (document_id,))
+        return results[0] if results else None
+    
     def get_field_definitions(self) -> List[Dict[str, Any]]:
         """Get all field definitions"""
         query = "SELECT * FROM field_definitions ORDER BY name"
         return self.execute_query(query)
+
+    def get_customers_by_ids(self, customer_ids: List[int]) -> List[Dict[str, Any]]:
+        """Get customers for a set of customer ids"""
+        if not customer_ids:
+            return []
+        query = "SELECT * FROM customers WHERE id = ANY(%s) ORDER BY id"
+        return self.execute_query(query, (list(customer_ids),))
+    
+    def get_documents_by_ids(self, document_ids: List[int]) -> List[Dict[str, Any]]:
+        """Get documents with customer names for a set of document ids"""
+        if not document_ids:
+            return []
+        query = """
+        SELECT d.*, c.name as customer_name 
+        FROM documents d 
+        JOIN customers c ON d.customer_id = c.id
+        WHERE d.id = ANY(%s)
+        ORDER BY d.id
+        """
+        return self.execute_query(query, (list(document_ids),))
+    
+    def get_document_fields_for_documents(self, document_ids: List[int]) -> List[Dict[str, Any]]:
+        """Get document fields with best values for a set of document ids"""
+        if not document_ids:
+            return []
+        query = f"""
+        SELECT {BEST_VALUE_COLUMNS} FROM document_field_best_values
+        WHERE document_id = ANY(%s)
+        ORDER BY document_id, field_name
+        """
+        return self.execute_query(query, (list(document_ids),))
+    
+    def get_customers_changed_since(self, updated_at: Optional[datetime], last_id: int,
+                                    limit: int) -> List[Dict[str, Any]]:
+        """Get customers changed after the (updated_at, id) watermark"""
+        query = """
+        SELECT * FROM customers
+        WHERE (updated_at, id) > (%s, %s)
+        ORDER BY updated_at, id
+        LIMIT %s
+        """
+        return self.execute_query(query, (updated_at or datetime.min, last_id, limit))
+    
+    def get_documents_changed_since(self, updated_at: Optional[datetime], last_id: int,
+                                    limit: int) -> List[Dict[str, Any]]:
+        """Get documents changed after the (updated_at, id) watermark"""
+        query = """
+        SELECT d.*, c.name as customer_name 
+        FROM documents d 
+        JOIN customers c ON d.customer_id = c.id
+        WHERE (d.updated_at, d.id) > (%s, %s)
+        ORDER BY d.updated_at, d.id
+        LIMIT %s
+        """
+        return self.execute_query(query, (updated_at or datetime.min, last_id, limit))
+    
+    def get_document_fields_changed_since(self, updated_at: Optional[datetime], last_id: int,
+                                          limit: int) -> List[Dict[str, Any]]:
+        """Get (id, document_id, updated_at) of document fields whose best value changed after the watermark"""
+        query = """
+        SELECT id, document_id, updated_at FROM document_field_best_values
+        WHERE (updated_at, id) > (%s, %s)
+        ORDER BY updated_at, id
+        LIMIT %s
+        """
+        return self.execute_query(query, (updated_at or datetime.min, last_id, limit))
+    
+    def get_deletes_since(self, updated_at: Optional[datetime], last_id: int,
+                          limit: int) -> List[Dict[str, Any]]:
+        """Get customer and document tombstones recorded after the (updated_at, id) watermark"""
+        query = """
+        SELECT id, entity, entity_id, updated_at FROM graph_sync_deletes
+        WHERE (updated_at, id) > (%s, %s)
+        ORDER BY updated_at, id
+        LIMIT %s
+        """
+        return self.execute_query(query, (updated_at or datetime.min, last_id, limit))
+    
+    def prune_sync_deletes(self, before: datetime) -> int:
+        """
+        Drop tombstones recorded before a timestamp incremental sync has read past,
+        keeping those an unfinished rebuild still has to catch up on
+        """
+        query = """
+        DELETE FROM graph_sync_deletes
+        WHERE updated_at < LEAST(%s, (
+            SELECT min(s.deletes_updated_at)
+            FROM graph_sync_runs r
+            JOIN graph_sync_state s ON s.sync_name = 'run:' || r.run_id
+            WHERE r.status IN ('running', 'interrupted')
+        ))
+        """
+        return self.execute_update(query, (before,))
+    
+    def get_current_watermark(self, cursor=None) -> Dict[str, Any]:
+        """Get the newest (updated_at, id) of every watermark stream, optionally inside a snapshot cursor"""
+        watermark = {}
+        for stream, table in WATERMARK_STREAMS.items():
+            query = f"SELECT updated_at, id FROM {table} ORDER BY updated_at DESC NULLS LAST, id DESC LIMIT 1"
+            if cursor is not None:
+                cursor.execute(query)
+                row = cursor.fetchone()
+                rows = [{"updated_at": row[0], "id": row[1]}] if row else []
+            else:
+                rows = self.execute_query(query)
+            watermark[f"{stream}_updated_at"] = rows[0]["updated_at"] if rows else None
+            watermark[f"{stream}_last_id"] = rows[0]["id"] if rows else 0
+        return watermark
+    
+    def get_sync_state(self, sync_name: str) -> Optional[Dict[str, Any]]:
+        """Get the persisted watermark of a sync stream"""
+        rows = self.execute_query(
+            "SELECT * FROM graph_sync_state WHERE sync_name = %s", (sync_name,)
+        )
+        return rows[0] if rows else None
+    
+    def save_sync_state(self, sync_name: str, watermark: Dict[str, Any],
+                        completed: bool = False) -> None:
+        """Persist the watermark of a sync stream"""
+        query = """
+        INSERT INTO graph_sync_state (
+            sync_name, customers_updated_at, customers_last_id,
+            documents_updated_at, documents_last_id,
+            fields_updated_at, fields_last_id,
+            deletes_updated_at, deletes_last_id, last_sync_at
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, CASE WHEN %s THEN CURRENT_TIMESTAMP END)
+        ON CONFLICT (sync_name) DO UPDATE SET
+            customers_updated_at = EXCLUDED.customers_updated_at,
+            customers_last_id = EXCLUDED.customers_last_id,
+            documents_updated_at = EXCLUDED.documents_updated_at,
+            documents_last_id = EXCLUDED.documents_last_id,
+            fields_updated_at = EXCLUDED.fields_updated_at,
+            fields_last_id = EXCLUDED.fields_last_id,
+            deletes_updated_at = EXCLUDED.deletes_updated_at,
+            deletes_last_id = EXCLUDED.deletes_last_id,
+            last_sync_at = COALESCE(EXCLUDED.last_sync_at, graph_sync_state.last_sync_at),
+            updated_at = CURRENT_TIMESTAMP
+        """
+        params = (
+            sync_name,
+            watermark.get("customers_updated_at"), watermark.get("customers_last_id", 0),
+            watermark.get("documents_updated_at"), watermark.get("documents_last_id", 0),
+            watermark.get("fields_updated_at"), watermark.get("fields_last_id", 0),
+            watermark.get("deletes_updated_at"), watermark.get("deletes_last_id", 0),
+            completed
+        )
+        self.execute_update(query, params)
+
+    def create_sync_run(self, run_id: str, generation: int, expected_counts: Dict[str, int],
+                        partitions: List[Dict[str, int]]) -> None:
+        """Record a new full rebuild run and one checkpoint row per partition"""
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO graph_sync_runs (run_id, generation, expected_customers, expected_documents)
+                    VALUES (%s, %s, %s, %s)
+                    """,
+                    (run_id, generation, expected_counts['customers'], expected_counts['documents'])
+                )
+                for index, partition in enumerate(partitions):
+                    cursor.execute(
+                        """
+                        INSERT INTO graph_sync_checkpoints (run_id, partition_index, low_id, high_id, total_documents)
+                        VALUES (%s, %s, %s, %s, %s)
+                        """,
+                        (run_id, index, partition['low'], partition['high'], partition['documents'])
+                    )
+                conn.commit()
+    
+    def rebuild_lock(self) -> RebuildLock:
+        """Lock to hold for a whole rebuild; entering it raises RebuildInProgress if another process holds it"""
+        return RebuildLock()
+    
+    def is_rebuild_running(self) -> bool:
+        """Whether any process holds the rebuild lock on this database"""
+        query = """
+        SELECT EXISTS (
+            SELECT 1 FROM pg_locks
+            WHERE locktype = 'advisory' AND granted
+              AND database = (SELECT oid FROM pg_database WHERE datname = current_database())
+              AND classid = 0 AND objid = %s AND objsubid = 1
+        ) as running
+        """
+        return self.execute_query(query, (REBUILD_LOCK_KEY,))[0]['running']
+    
+    def get_sync_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Get a full rebuild run"""
+        query = f"{self._SYNC_RUN_COLUMNS} WHERE run_id = %s"
+        rows = self.execute_query(query, (run_id,))
+        return rows[0] if rows else None
+    
+    def get_latest_sync_run(self, unfinished_only: bool = False) -> Optional[Dict[str, Any]]:
+        """Get the most recently started full rebuild run, optionally only one that can be resumed"""
+        query = self._SYNC_RUN_COLUMNS
+        if unfinished_only:
+            query += " WHERE status IN ('running', 'interrupted')"
+        query += " ORDER BY started_at DESC LIMIT 1"
+        rows = self.execute_query(query)
+        return rows[0] if rows else None
+    
+    def resume_sync_run(self, run_id: str) -> None:
+        """Mark a run as running again and remember how far it had got"""
+        query = """
+        UPDATE graph_sync_runs SET
+            status = 'running',
+            error_message = NULL,
+            resumed_at = CURRENT_TIMESTAMP,
+            documents_at_resume = (
+                SELECT COALESCE(sum(documents_done), 0) FROM graph_sync_checkpoints WHERE run_id = %s
+            ),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE run_id = %s
+        """
+        self.execute_update(query, (run_id, run_id))
+    
+    def mark_sync_run_entities_synced(self, run_id: str) -> None:
+        """Record that a run's shared entity nodes have been written"""
+        self.execute_update(
+            "UPDATE graph_sync_runs SET entities_synced = TRUE, updated_at = CURRENT_TIMESTAMP WHERE run_id = %s",
+            (run_id,)
+        )
+    
+    def finish_sync_run(self, run_id: str, status: str, error_message: Optional[str] = None) -> None:
+        """Close a run as completed, interrupted (resumable) or failed"""
+        query = """
+        UPDATE graph_sync_runs SET
+            status = %s,
+            error_message = %s,
+            completed_at = CASE WHEN %s IN ('completed', 'failed') THEN CURRENT_TIMESTAMP END,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE run_id = %s
+        """
+        self.execute_update(query, (status, error_message, status, run_id))
+    
+    def get_sync_checkpoints(self, run_id: str) -> List[Dict[str, Any]]:
+        """Get the partition checkpoints of a run"""
+        return self.execute_query(
+            "SELECT * FROM graph_sync_checkpoints WHERE run_id = %s ORDER BY partition_index",
+            (run_id,)
+        )
+    
+    def save_sync_checkpoint(self, run_id: str, partition_index: int, last_document_id: Optional[int],
+                             documents_done: int, status: str) -> None:
+        """Persist the last committed document of a partition"""
+        query = """
+        UPDATE graph_sync_checkpoints SET
+            last_document_id = %s,
+            documents_done = %s,
+            status = %s,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE run_id = %s AND partition_index = %s
+        """
+        self.execute_update(query, (last_document_id, documents_done, status, run_id, partition_index))
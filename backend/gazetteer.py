@@ -0,0 +1,159 @@
+import asyncio
+import re
+import time
+from typing import Dict, Any, List, Optional, Tuple
+from loguru import logger
+from graph_writer import ENTITY_KEYS
+from neo4j_manager import AsyncNeo4jManager
+from schemas import EntityMention
+from config import settings
+
+
+TOKEN = re.compile(r"\w+")
+
+# Trie key holding the (label, name) pairs of the names that end at a node
+TERMINAL = ""
+
+# Incremental refreshes re-read this much before the newest updated_at seen, for
+# writes whose transaction committed after a later-stamped one was read
+REFRESH_OVERLAP_MS = 30000
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens; names and questions are matched on these"""
+    return TOKEN.findall(text.lower())
+
+
+class EntityGazetteer:
+    """
+    In-memory index of every LegalEntity, Product, Location and HSCode key in
+    the active graph generation, as a trie over word tokens. find_mentions
+    walks a question's tokens once and returns each longest known name with
+    its exact graph key, so queries can use index-backed equality lookups.
+    Loaded in full when the generation changes, otherwise topped up with the
+    entities whose updated_at moved since the last refresh.
+    """
+
+    def __init__(self):
+        self._trie: Dict[str, Any] = {}
+        self.generation: Optional[int] = None
+        self.version: Optional[int] = None
+        self.names = 0
+        self._updated_since: Dict[str, Optional[int]] = {}
+        self._refreshed_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def add(self, label: str, name: str, trie: Optional[Dict[str, Any]] = None) -> bool:
+        """Index one entity key; False if it was already known"""
+        tokens = tokenize(name)
+        if not tokens:
+            return False
+        node = self._trie if trie is None else trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        entries = node.setdefault(TERMINAL, [])
+        if (label, name) in entries:
+            return False
+        entries.append((label, name))
+        return True
+
+    def find_mentions(self, question: str) -> List[EntityMention]:
+        """Longest known entity names in the question, left to right, without overlaps"""
+        lowered = question.lower()
+        tokens = TOKEN.findall(lowered)
+        # Character offsets are only needed once something matches
+        offsets = None
+        mentions = []
+        i = 0
+        while i < len(tokens):
+            node = self._trie
+            longest: Optional[Tuple[int, List[Tuple[str, str]]]] = None
+            j = i
+            while j < len(tokens):
+                node = node.get(tokens[j])
+                if node is None:
+                    break
+                j += 1
+                if TERMINAL in node:
+                    longest = (j, node[TERMINAL])
+            if longest is None:
+                i += 1
+                continue
+            end, entries = longest
+            if offsets is None:
+                offsets = [match.span() for match in TOKEN.finditer(lowered)]
+            start_char, end_char = offsets[i][0], offsets[end - 1][1]
+            for label, name in entries:
+                mentions.append(EntityMention(label=label, name=name, start=start_char, end=end_char))
+            i = end
+        return mentions
+
+    async def refresh(self, neo4j_manager: AsyncNeo4jManager, force: bool = False) -> None:
+        """Reload on a generation change, otherwise add entities updated since the last refresh"""
+        async with self._lock:
+            generation, version = await neo4j_manager.get_graph_version()
+            if not force and (generation, version) == (self.generation, self.version):
+                return
+
+            start = time.monotonic()
+            if force or generation != self.generation:
+                trie: Dict[str, Any] = {}
+                names = 0
+                updated_since = {}
+                for label in ENTITY_KEYS:
+                    added, updated_since[label] = await self._load_label(neo4j_manager, label, generation, None, trie)
+                    names += added
+                # Swap in whole, so questions never see a half-loaded generation
+                self._trie, self.names, self._updated_since = trie, names, updated_since
+                logger.info(f"Loaded {names} entity names of generation {generation} in {time.monotonic() - start:.2f}s")
+            else:
+                added = 0
+                for label in ENTITY_KEYS:
+                    count, since = await self._load_label(
+                        neo4j_manager, label, generation, self._updated_since.get(label), self._trie
+                    )
+                    added += count
+                    self._updated_since[label] = since or self._updated_since.get(label)
+                self.names += added
+                if added:
+                    logger.info(f"Added {added} entity names to the gazetteer")
+
+            self.generation, self.version = generation, version
+            self._refreshed_at = time.time()
+
+    async def _load_label(self, neo4j_manager: AsyncNeo4jManager, label: str, generation: int,
+                          since: Optional[int], trie: Dict[str, Any]) -> Tuple[int, Optional[int]]:
+        """Index a label's keys updated after since, in epoch millis (all when None); returns (added, newest)"""
+        key = ENTITY_KEYS[label]
+        query = f"""
+        MATCH (n:{label} {{generation: $generation}})
+        WHERE $since IS NULL OR n.updated_at > datetime({{epochMillis: $since}})
+        RETURN n.{key} as key, n.updated_at.epochMillis as updated_at
+        """
+        added = 0
+        newest = since
+        params = {"generation": generation, "since": None if since is None else since - REFRESH_OVERLAP_MS}
+        async for record in neo4j_manager.stream_read(query, params):
+            if record["key"] is not None and self.add(label, str(record["key"]), trie):
+                added += 1
+            if record["updated_at"] is not None and (newest is None or record["updated_at"] > newest):
+                newest = record["updated_at"]
+        return added, newest
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "names": self.names,
+            "generation": self.generation,
+            "version": self.version,
+            "refreshed_at": self._refreshed_at or None
+        }
+
+
+async def keep_gazetteer_fresh(gazetteer: EntityGazetteer, neo4j_manager: AsyncNeo4jManager) -> None:
+    """Refresh the gazetteer every GAZETTEER_REFRESH_SECONDS until cancelled"""
+    while True:
+        try:
+            await gazetteer.refresh(neo4j_manager)
+        except Exception as e:
+            logger.error(f"Gazetteer refresh failed: {e}")
+        await asyncio.sleep(settings.gazetteer_refresh_seconds)
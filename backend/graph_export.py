@@ -0,0 +1,147 @@
+import os
+import time
+from typing import Dict, Any, List, Tuple
+from loguru import logger
+from database_manager import PostgreSQLManager
+from graph_writer import ENTITY_KEYS, RELATIONSHIP_ENDPOINTS
+
+
+# Node CSV file per label
+NODE_FILES = {
+    'Customer': 'customers.csv',
+    'Document': 'documents.csv',
+    'LegalEntity': 'legal_entities.csv',
+    'HSCode': 'hs_codes.csv',
+    'Product': 'products.csv',
+    'Location': 'locations.csv',
+    'GraphGeneration': 'graph_generation.csv'
+}
+
+NON_EMPTY_VALUE = "best_value IS NOT NULL AND best_value <> ''"
+
+# Documents that get a node; relationships from anything else would reference a missing id
+EXPORTED_DOCUMENTS = "SELECT d.id FROM documents d JOIN customers c ON d.customer_id = c.id"
+
+
+class GraphImportExporter:
+    """
+    Streams PostgreSQL into node and relationship CSVs for `neo4j-admin database import`.
+    Every COPY runs in one snapshot and deduplicates in PostgreSQL. Nodes carry the same
+    key properties and generation that the sync MERGEs on, so incremental sync can take
+    over from the snapshot's watermark once the import is loaded.
+    """
+
+    def __init__(self, pg_manager: PostgreSQLManager, field_mappings: Dict[str, Dict[str, Any]],
+                 output_dir: str, generation: int = 1):
+        self.pg_manager = pg_manager
+        self.field_mappings = field_mappings
+        self.output_dir = output_dir
+        self.generation = generation
+        # One timestamp for every node, in the format neo4j-admin reads as a datetime
+        self.timestamp = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        self.files: List[Tuple[str, str, str]] = []
+
+    def export(self) -> Dict[str, Any]:
+        """Write every CSV and return the snapshot watermark and the file list"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.files = []
+
+        with self.pg_manager.snapshot_cursor() as cursor:
+            watermark = self.pg_manager.get_current_watermark(cursor)
+            self._export_nodes(cursor)
+            self._export_relationships(cursor)
+
+        logger.info(f"Exported {len(self.files)} CSV files to {self.output_dir}")
+        return {"watermark": watermark, "files": self.files}
+
+    def _export_nodes(self, cursor) -> None:
+        common = f"{self.generation}, '{self.timestamp}'"
+
+        self._copy(cursor, "nodes", "Customer",
+                   ":ID(Customer),id:int,name,email,generation:int,updated_at:datetime",
+                   f"SELECT id, id, name, email, {common} FROM customers ORDER BY id")
+
+        self._copy(cursor, "nodes", "Document",
+                   ":ID(Document),id:int,document_number,document_type,customer_id:int,created_at:localdatetime,"
+                   "generation:int,updated_at:datetime",
+                   f"""
+                   SELECT d.id, d.id, COALESCE(d.document_number, 'DOC-' || d.id), d.document_type, d.customer_id,
+                          to_char(d.created_at, 'YYYY-MM-DD"T"HH24:MI:SS.US'), {common}
+                   FROM documents d JOIN customers c ON d.customer_id = c.id
+                   ORDER BY d.id
+                   """)
+
+        for label, key in ENTITY_KEYS.items():
+            fields = self._fields_for_label(label)
+            self._copy(cursor, "nodes", label,
+                       f":ID({label}),{key},generation:int,updated_at:datetime",
+                       f"""
+                       SELECT value, value, {common}
+                       FROM (
+                           SELECT DISTINCT best_value as value FROM document_field_best_values
+                           WHERE field_name IN ({self._literals(fields)}) AND {NON_EMPTY_VALUE}
+                       ) t
+                       ORDER BY value
+                       """)
+
+        # Point readers at the imported generation
+        self._copy(cursor, "nodes", "GraphGeneration",
+                   "name,generation:int,last_allocated:int,activated_at:datetime",
+                   f"SELECT 'active', {self.generation}, {self.generation}, '{self.timestamp}'")
+
+    def _export_relationships(self, cursor) -> None:
+        self._copy(cursor, "relationships", "PROCESSED",
+                   ":START_ID(Customer),:END_ID(Document)",
+                   "SELECT d.customer_id, d.id FROM documents d JOIN customers c ON d.customer_id = c.id ORDER BY d.id")
+
+        for rel_type, (start_label, _, end_label, _) in RELATIONSHIP_ENDPOINTS.items():
+            fields = [name for name, mapping in self.field_mappings.items() if mapping['relationship'] == rel_type]
+            if not fields:
+                continue
+            self._copy(cursor, "relationships", rel_type,
+                       f":START_ID({start_label}),:END_ID({end_label})",
+                       f"""
+                       SELECT DISTINCT document_id, best_value FROM document_field_best_values
+                       WHERE field_name IN ({self._literals(fields)}) AND {NON_EMPTY_VALUE}
+                         AND document_id IN ({EXPORTED_DOCUMENTS})
+                       ORDER BY document_id, best_value
+                       """)
+
+        # Same pairing as the sync: a document's Product is classified by its HS_Code
+        self._copy(cursor, "relationships", "CLASSIFIED_AS",
+                   ":START_ID(Product),:END_ID(HSCode)",
+                   f"""
+                   SELECT DISTINCT p.best_value, h.best_value
+                   FROM document_field_best_values p
+                   JOIN document_field_best_values h ON h.document_id = p.document_id AND h.field_name = 'HS_Code'
+                   WHERE p.field_name = 'Product'
+                     AND p.best_value IS NOT NULL AND p.best_value <> ''
+                     AND h.best_value IS NOT NULL AND h.best_value <> ''
+                     AND p.document_id IN ({EXPORTED_DOCUMENTS})
+                   ORDER BY 1, 2
+                   """)
+
+    def _fields_for_label(self, label: str) -> List[str]:
+        return [name for name, mapping in self.field_mappings.items() if mapping['node_type'] == label]
+
+    @staticmethod
+    def _literals(values: List[str]) -> str:
+        """SQL string literals for field names; they come from the code's field mappings"""
+        return ", ".join("'" + value.replace("'", "''") + "'" for value in values) or "NULL"
+
+    def _copy(self, cursor, kind: str, name: str, header: str, query: str) -> None:
+        """Write a header line, then stream the query's rows straight into the CSV with COPY"""
+        filename = NODE_FILES[name] if kind == "nodes" else f"{name.lower()}.csv"
+        path = os.path.join(self.output_dir, filename)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(header + "\n")
+            cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv)", f)
+        self.files.append((kind, name, path))
+        logger.info(f"Exported {name} {kind} to {path}")
+
+    def import_command(self, database: str = "neo4j") -> str:
+        """neo4j-admin command that loads the exported files into an empty database"""
+        args = [f"neo4j-admin database import full {database} --overwrite-destination"]
+        for kind, name, path in self.files:
+            args.append(f"--{kind}={name}={path}")
+        return " \\\n    ".join(args)
@@ -0,0 +1,180 @@
+from datetime import datetime
+from operator import itemgetter
+from typing import Dict, Any, Optional, Tuple, Callable
+from loguru import logger
+from neo4j_manager import Neo4jManager
+from config import settings
+
+
+# Key property used to MERGE each entity label created from document fields
+ENTITY_KEYS = {
+    'LegalEntity': 'name',
+    'HSCode': 'code',
+    'Product': 'name',
+    'Location': 'name'
+}
+
+# (start label, start key, end label, end key) for every relationship type
+RELATIONSHIP_ENDPOINTS = {
+    'PROCESSED': ('Customer', 'id', 'Document', 'id'),
+    'HAS_SHIPPER': ('Document', 'id', 'LegalEntity', 'name'),
+    'HAS_CONSIGNEE': ('Document', 'id', 'LegalEntity', 'name'),
+    'CONTAINS': ('Document', 'id', 'Product', 'name'),
+    'ORIGINATED_FROM': ('Document', 'id', 'Location', 'name'),
+    'DESTINED_FOR': ('Document', 'id', 'Location', 'name'),
+    'CLASSIFIED_AS': ('Product', 'name', 'HSCode', 'code')
+}
+
+CUSTOMER_STATEMENT = """
+UNWIND $rows AS row
+MERGE (c:Customer {id: row.id, generation: $generation})
+SET c.name = row.name, c.email = row.email, c.updated_at = datetime()
+"""
+
+DOCUMENT_STATEMENT = """
+UNWIND $rows AS row
+MERGE (d:Document {id: row.id, generation: $generation})
+SET d.document_number = row.document_number,
+    d.document_type = row.document_type,
+    d.customer_id = row.customer_id,
+    d.created_at = row.created_at,
+    d.updated_at = datetime()
+"""
+
+
+def entity_statement(label: str) -> str:
+    """Batched MERGE statement for an entity label"""
+    key = ENTITY_KEYS[label]
+    return f"""
+    UNWIND $rows AS row
+    MERGE (n:{label} {{{key}: row.key, generation: $generation}})
+    SET n.updated_at = datetime()
+    """
+
+
+def relationship_statement(relationship_type: str) -> str:
+    """Batched MERGE statement for a relationship type"""
+    start_label, start_key, end_label, end_key = RELATIONSHIP_ENDPOINTS[relationship_type]
+    return f"""
+    UNWIND $rows AS row
+    MATCH (a:{start_label} {{{start_key}: row.start, generation: $generation}})
+    MATCH (b:{end_label} {{{end_key}: row.end, generation: $generation}})
+    MERGE (a)-[:{relationship_type}]->(b)
+    """
+
+
+def relationship_delete_statement(relationship_type: str) -> str:
+    """Batched DELETE statement for a relationship type"""
+    start_label, start_key, end_label, end_key = RELATIONSHIP_ENDPOINTS[relationship_type]
+    return f"""
+    UNWIND $rows AS row
+    MATCH (a:{start_label} {{{start_key}: row.start, generation: $generation}})
+          -[r:{relationship_type}]->(b:{end_label} {{{end_key}: row.end, generation: $generation}})
+    DELETE r
+    """
+
+
+class BulkGraphWriter:
+    """
+    Accumulates nodes and relationships and writes them to Neo4j in
+    batched UNWIND statements, one write transaction per batch.
+    Writes go to the active graph generation unless one is given.
+    """
+
+    def __init__(self, neo4j_manager: Neo4jManager, batch_size: Optional[int] = None,
+                 generation: Optional[int] = None, on_flush: Optional[Callable[[], None]] = None):
+        self.neo4j_manager = neo4j_manager
+        self.on_flush = on_flush
+        self.batch_size = batch_size or settings.sync_batch_size
+        self.generation = generation if generation is not None else neo4j_manager.get_active_generation()
+        self.customers: Dict[int, Dict[str, Any]] = {}
+        self.documents: Dict[int, Dict[str, Any]] = {}
+        self.entities: Dict[str, Dict[Any, Dict[str, Any]]] = {label: {} for label in ENTITY_KEYS}
+        self.relationships: Dict[str, Dict[Tuple[Any, Any], Dict[str, Any]]] = {
+            rel_type: {} for rel_type in RELATIONSHIP_ENDPOINTS
+        }
+        self.removed_relationships: Dict[str, Dict[Tuple[Any, Any], Dict[str, Any]]] = {
+            rel_type: {} for rel_type in RELATIONSHIP_ENDPOINTS
+        }
+        self.pending = 0
+        self.written = {"nodes": 0, "relationships": 0, "deleted_relationships": 0, "batches": 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+
+    def add_customer(self, customer_id: int, name: str, email: Optional[str] = None) -> None:
+        """Queue a Customer node"""
+        self._add(self.customers, customer_id, {"id": customer_id, "name": name, "email": email})
+
+    def add_document(self, document_id: int, document_number: str,
+                     document_type: str, customer_id: int, created_at: Optional[datetime] = None) -> None:
+        """Queue a Document node"""
+        self._add(self.documents, document_id, {
+            "id": document_id,
+            "document_number": document_number,
+            "document_type": document_type,
+            "customer_id": customer_id,
+            "created_at": created_at
+        })
+
+    def add_entity(self, label: str, key: Any) -> None:
+        """Queue a LegalEntity, HSCode, Product or Location node"""
+        self._add(self.entities[label], key, {"key": key})
+
+    def add_relationship(self, relationship_type: str, start: Any, end: Any) -> None:
+        """Queue a relationship between two nodes identified by their key properties"""
+        self._add(self.relationships[relationship_type], (start, end), {"start": start, "end": end})
+
+    def remove_relationship(self, relationship_type: str, start: Any, end: Any) -> None:
+        """Queue the deletion of a relationship between two nodes identified by their key properties"""
+        self._add(self.removed_relationships[relationship_type], (start, end), {"start": start, "end": end})
+
+    def _add(self, buffer: Dict[Any, Dict[str, Any]], key: Any, row: Dict[str, Any]) -> None:
+        if key not in buffer:
+            self.pending += 1
+        buffer[key] = row
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write everything queued so far; nodes first so relationship MATCHes find them"""
+        if not self.pending:
+            return
+
+        self._write_rows(CUSTOMER_STATEMENT, self.customers, "nodes")
+        self._write_rows(DOCUMENT_STATEMENT, self.documents, "nodes")
+        for label, rows in self.entities.items():
+            self._write_rows(entity_statement(label), rows, "nodes")
+        # A consistent endpoint order keeps concurrent writers from deadlocking on shared nodes
+        for rel_type, rows in self.removed_relationships.items():
+            self._write_rows(relationship_delete_statement(rel_type), rows, "deleted_relationships",
+                             sort_key=itemgetter("end", "start"))
+        for rel_type, rows in self.relationships.items():
+            self._write_rows(relationship_statement(rel_type), rows, "relationships",
+                             sort_key=itemgetter("end", "start"))
+
+        self.pending = 0
+        # Shadow generations are invisible to readers until activation bumps the version itself
+        if self.generation == self.neo4j_manager.get_active_generation():
+            self.neo4j_manager.bump_graph_version()
+        if self.on_flush:
+            self.on_flush()
+
+    def _write_rows(self, statement: str, buffer: Dict[Any, Dict[str, Any]], kind: str,
+                    sort_key: Optional[Callable[[Dict[str, Any]], Any]] = None) -> None:
+        if not buffer:
+            return
+        rows = list(buffer.values())
+        buffer.clear()
+        if sort_key:
+            rows.sort(key=sort_key)
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            self.neo4j_manager.execute_write(statement, {"rows": batch, "generation": self.generation})
+            self.written[kind] += len(batch)
+            self.written["batches"] += 1
+        logger.debug(f"Flushed {len(rows)} {kind}")
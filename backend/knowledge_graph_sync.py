@@ -1,133 +1,647 @@
-from typing import Dict, Any, List
+import threading
+import time
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Iterable, Iterator, Optional, Set, Tuple, Callable
 from loguru import logger
-from database_manager import PostgreSQLManager
+from database_manager import PostgreSQLManager, RebuildLock
 from neo4j_manager import Neo4jManager
+from graph_writer import BulkGraphWriter, RELATIONSHIP_ENDPOINTS
+from risk_profiles import RiskProfileWriter, PROFILE_RELATIONSHIPS
+from config import settings
+
+
+INCREMENTAL_SYNC = "incremental"
+
+# Pooled PostgreSQL connections a full-sync partition worker holds at once:
+# its document stream and, while a batch is checkpointed, one more
+CONNECTIONS_PER_SYNC_WORKER = 2
+
+
+def gc_grace_seconds() -> float:
+    """How long a replaced generation outlives its activation: readers cache the
+    active generation for graph_state_refresh_seconds and may then run a query for
+    up to query_timeout_seconds"""
+    return max(settings.graph_gc_delay_seconds,
+               settings.graph_state_refresh_seconds + settings.query_timeout_seconds)
+
+
+def check_pool_capacity(workers: int) -> None:
+    """Refuse worker counts that could take every pooled connection and wait on each other for one more"""
+    needed = CONNECTIONS_PER_SYNC_WORKER * workers + settings.postgres_pool_reserved
+    if settings.postgres_pool_max_size < needed:
+        raise ValueError(
+            f"POSTGRES_POOL_MAX_SIZE={settings.postgres_pool_max_size} is too small for {workers} sync workers: "
+            f"need {CONNECTIONS_PER_SYNC_WORKER} per worker plus POSTGRES_POOL_RESERVED={settings.postgres_pool_reserved}, "
+            f"at least {needed}"
+        )
 
 
 class KnowledgeGraphSync:
     def __init__(self):
         self.pg_manager = PostgreSQLManager()
         self.neo4j_manager = Neo4jManager()
+        self.risk_profiles = RiskProfileWriter(self.neo4j_manager)
         
-        # Mapping of field names to graph operations
+        # Mapping of field names to graph node labels and document relationships
         self.field_mappings = {
-            'ShipperName': {
-                'node_type': 'LegalEntity',
-                'relationship': 'HAS_SHIPPER',
-                'create_node': self.neo4j_manager.create_or_update_legal_entity,
-                'create_relationship': self.neo4j_manager.create_document_entity_relationship
-            },
-            'ConsigneeName': {
-                'node_type': 'LegalEntity',
-                'relationship': 'HAS_CONSIGNEE',
-                'create_node': self.neo4j_manager.create_or_update_legal_entity,
-                'create_relationship': self.neo4j_manager.create_document_entity_relationship
-            },
-            'HS_Code': {
-                'node_type': 'HSCode',
-                'relationship': None,
-                'create_node': self.neo4j_manager.create_or_update_hs_code,
-                'create_relationship': None
-            },
-            'Product': {
-                'node_type': 'Product',
-                'relationship': 'CONTAINS',
-                'create_node': self.neo4j_manager.create_or_update_product,
-                'create_relationship': self.neo4j_manager.create_document_contains_relationship
-            },
-            'OriginPort': {
-                'node_type': 'Location',
-                'relationship': 'ORIGINATED_FROM',
-                'create_node': self.neo4j_manager.create_or_update_location,
-                'create_relationship': self.neo4j_manager.create_document_location_relationship
-            },
-            'DestinationPort': {
-                'node_type': 'Location',
-                'relationship': 'DESTINED_FOR',
-                'create_node': self.neo4j_manager.create_or_update_location,
-                'create_relationship': self.neo4j_manager.create_document_location_relationship
-            }
+            'ShipperName': {'node_type': 'LegalEntity', 'relationship': 'HAS_SHIPPER'},
+            'ConsigneeName': {'node_type': 'LegalEntity', 'relationship': 'HAS_CONSIGNEE'},
+            'HS_Code': {'node_type': 'HSCode', 'relationship': None},
+            'Product': {'node_type': 'Product', 'relationship': 'CONTAINS'},
+            'OriginPort': {'node_type': 'Location', 'relationship': 'ORIGINATED_FROM'},
+            'DestinationPort': {'node_type': 'Location', 'relationship': 'DESTINED_FOR'}
         }
+        
+        # Per-partition progress of the running full sync
+        self.partition_progress: Dict[int, Dict[str, Any]] = {}
+    
+    def create_writer(self, generation: Optional[int] = None) -> BulkGraphWriter:
+        """Create a bulk writer bound to this sync's Neo4j manager"""
+        return BulkGraphWriter(self.neo4j_manager, generation=generation)
     
     def initialize_graph(self) -> None:
         """Initialize the graph with constraints"""
         logger.info("Initializing Neo4j graph with constraints...")
+        self.neo4j_manager.adopt_unversioned_nodes()
         self.neo4j_manager.create_constraints()
+        self.collect_stale_generations()
         logger.info("Graph initialization completed")
     
-    def sync_all_data(self) -> None:
-        """Sync all data from PostgreSQL to Neo4j"""
+    def sync_all_data(self, wait_for_gc: bool = False,
+                      progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                      run_id: Optional[str] = None, resume: bool = True) -> Dict[str, Any]:
+        """Rebuild the whole graph from PostgreSQL without taking the live graph offline"""
+        return self.rebuild_graph(wait_for_gc=wait_for_gc, progress_callback=progress_callback,
+                                  run_id=run_id, resume=resume)
+    
+    def rebuild_graph(self, wait_for_gc: bool = False,
+                      progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                      run_id: Optional[str] = None, resume: bool = True) -> Dict[str, Any]:
+        """
+        Blue/green rebuild: write a shadow generation next to the live one,
+        validate it against PostgreSQL, flip readers to it atomically and
+        garbage-collect the old generation in chunked background deletes.
+        Progress is checkpointed per partition, so an interrupted rebuild
+        continues into the same shadow generation on the next run.
+        Only one process rebuilds at a time: the rebuild holds a PostgreSQL
+        advisory lock throughout and raises RebuildInProgress if it is taken.
+        """
+        with self.pg_manager.rebuild_lock() as lock:
+            return self._rebuild_graph(lock, wait_for_gc, progress_callback, run_id, resume)
+    
+    def _rebuild_graph(self, lock: RebuildLock, wait_for_gc: bool,
+                       progress_callback: Optional[Callable[[Dict[str, Any]], None]],
+                       run_id: Optional[str], resume: bool) -> Dict[str, Any]:
+        """Body of rebuild_graph, run while holding the rebuild lock"""
         logger.info("Starting full data synchronization...")
         
-        # Clear existing graph
-        self.neo4j_manager.clear_graph()
+        if not resume:
+            self._discard_unfinished_runs()
+        run = self._resumable_run() if resume else None
+        if run:
+            run_id, generation = run['run_id'], run['generation']
+            logger.info(f"Resuming sync run {run_id} into graph generation {generation}")
+            self.pg_manager.resume_sync_run(run_id)
+            watermark = self.pg_manager.get_sync_state(self._run_state_name(run_id))
+            expected_before = {"customers": run['expected_customers'], "documents": run['expected_documents']}
+        else:
+            # Rows changed after this point are picked up by the incremental catch-up below
+            watermark = self.pg_manager.get_current_watermark()
+            expected_before = self.pg_manager.get_row_counts()
+            
+            generation = self.neo4j_manager.begin_generation()
+            run_id = run_id or f"sync_all_{int(time.time())}"
+            partitions = self.pg_manager.get_document_id_partitions(settings.sync_workers)
+            self.pg_manager.create_sync_run(run_id, generation, expected_before, partitions)
+            self.pg_manager.save_sync_state(self._run_state_name(run_id), watermark)
+            logger.info(f"Building graph generation {generation} as sync run {run_id}")
+        
+        try:
+            self.sync_customers(generation=generation)
+            self.sync_documents(generation=generation, progress_callback=progress_callback, run_id=run_id)
+            self.risk_profiles.refresh_all(generation)
+        except Exception as e:
+            # Keep the partial shadow generation; the next rebuild resumes it
+            logger.error(f"Sync run {run_id} interrupted, generation {generation} kept for resume: {e}")
+            self.pg_manager.finish_sync_run(run_id, "interrupted", str(e))
+            raise
         
-        # Sync customers
-        self.sync_customers()
+        try:
+            counts = self._validate_generation(generation, expected_before)
+        except Exception as e:
+            logger.error(f"Graph generation {generation} failed, discarding it")
+            self.neo4j_manager.delete_generation(generation)
+            self.pg_manager.finish_sync_run(run_id, "failed", str(e))
+            raise
         
-        # Sync documents and their fields
-        self.sync_documents()
+        # Never activate if the lock was lost and another rebuild may have taken over
+        try:
+            lock.check()
+        except Exception as e:
+            self.pg_manager.finish_sync_run(run_id, "interrupted", f"Rebuild lock lost: {e}")
+            raise
+        previous = self.neo4j_manager.activate_generation(generation)
+        self.pg_manager.finish_sync_run(run_id, "completed")
+        
+        # Replay changes made to the old generation while the shadow was being built
+        self.pg_manager.save_sync_state(INCREMENTAL_SYNC, watermark, completed=True)
+        self.sync_incremental()
+        
+        if previous is not None and previous != generation:
+            gc_thread = threading.Thread(
+                target=self._collect_after_grace,
+                name=f"graph-gc-{previous}",
+                daemon=True
+            )
+            gc_thread.start()
+            if wait_for_gc:
+                gc_thread.join()
         
         logger.info("Data synchronization completed")
+        return {"run_id": run_id, "generation": generation, "previous_generation": previous, "counts": counts}
+    
+    def collect_stale_generations(self) -> List[int]:
+        """
+        Delete every generation that is not active, not being built and not the one
+        replaced within the grace period; this also clears generations left behind
+        by a restart during GC or by an abandoned rebuild
+        """
+        state = self.neo4j_manager.get_generation_state()
+        keep = {state['active'], state['building']}
+        since = state['seconds_since_activation']
+        if state['previous'] is not None and since is not None and since < gc_grace_seconds():
+            keep.add(state['previous'])
+        run = self.pg_manager.get_latest_sync_run(unfinished_only=True)
+        if run:
+            keep.add(run['generation'])
+        
+        stale = [generation for generation in self.neo4j_manager.list_generations() if generation not in keep]
+        for generation in stale:
+            logger.info(f"Garbage-collecting graph generation {generation}")
+            self.neo4j_manager.delete_generation(generation)
+        return stale
+    
+    def _collect_after_grace(self) -> None:
+        """Wait until no reader can still be on the replaced generation, then collect it"""
+        time.sleep(gc_grace_seconds())
+        try:
+            self.collect_stale_generations()
+        except Exception as e:
+            logger.error(f"Graph garbage collection failed: {e}")
+    
+    @staticmethod
+    def _run_state_name(run_id: str) -> str:
+        """graph_sync_state row holding the watermark a rebuild run started from"""
+        return f"run:{run_id}"
+    
+    def _resumable_run(self) -> Optional[Dict[str, Any]]:
+        """
+        Latest unfinished rebuild run whose shadow generation can still be continued;
+        called under the rebuild lock, so a run still marked running lost its process
+        """
+        run = self.pg_manager.get_latest_sync_run(unfinished_only=True)
+        if not run:
+            return None
+        if run['generation'] == self.neo4j_manager.get_active_generation(refresh=True):
+            self.pg_manager.finish_sync_run(run['run_id'], "failed", "Generation is already active")
+            return None
+        if not self.pg_manager.get_sync_state(self._run_state_name(run['run_id'])):
+            self._discard_run(run, "Start watermark missing")
+            return None
+        return run
+    
+    def _discard_unfinished_runs(self) -> None:
+        """Drop the shadow generation of an unfinished run before starting from scratch"""
+        run = self.pg_manager.get_latest_sync_run(unfinished_only=True)
+        if run:
+            self._discard_run(run, "Superseded by a new rebuild")
+    
+    def _discard_run(self, run: Dict[str, Any], reason: str) -> None:
+        logger.info(f"Discarding sync run {run['run_id']} (generation {run['generation']}): {reason}")
+        self.neo4j_manager.delete_generation(run['generation'])
+        self.pg_manager.finish_sync_run(run['run_id'], "failed", reason)
+    
+    def get_sync_progress(self, run_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Progress of a rebuild run (the latest one by default) with throughput and ETA"""
+        run = self.pg_manager.get_sync_run(run_id) if run_id else self.pg_manager.get_latest_sync_run()
+        if not run:
+            return None
+        
+        checkpoints = self.pg_manager.get_sync_checkpoints(run['run_id'])
+        done = sum(c['documents_done'] or 0 for c in checkpoints)
+        total = sum(c['total_documents'] or 0 for c in checkpoints)
+        remaining = max(total - done, 0)
+        
+        # Throughput of the current attempt only, so a resume is not credited with earlier work
+        rows_per_second = None
+        eta_seconds = None
+        if run['status'] == 'running' and run['seconds_since_resume']:
+            elapsed = float(run['seconds_since_resume'])
+            processed = done - (run['documents_at_resume'] or 0)
+            if elapsed > 0 and processed > 0:
+                rows_per_second = processed / elapsed
+                eta_seconds = remaining / rows_per_second
+        
+        return {
+            "run_id": run['run_id'],
+            "generation": run['generation'],
+            "status": run['status'],
+            "entities_synced": run['entities_synced'],
+            "documents_done": done,
+            "documents_total": total,
+            "documents_remaining": remaining,
+            "percent": round(100.0 * done / total, 1) if total else 100.0,
+            "rows_per_second": round(rows_per_second, 1) if rows_per_second else None,
+            "eta_seconds": round(eta_seconds) if eta_seconds is not None else None,
+            "started_at": run['started_at'].isoformat() if run['started_at'] else None,
+            "completed_at": run['completed_at'].isoformat() if run['completed_at'] else None,
+            "error": run['error_message'],
+            "partitions": [
+                {
+                    "index": c['partition_index'],
+                    "id_range": [c['low_id'], c['high_id']],
+                    "status": c['status'],
+                    "documents": c['documents_done'],
+                    "total": c['total_documents'],
+                    "last_document_id": c['last_document_id']
+                }
+                for c in checkpoints
+            ]
+        }
+    
+    def _validate_generation(self, generation: int, expected_before: Dict[str, int]) -> Dict[str, int]:
+        """Check a shadow generation's node counts against PostgreSQL before activating it"""
+        expected_after = self.pg_manager.get_row_counts()
+        counts = self.neo4j_manager.count_generation_nodes(generation)
+        
+        for label, table in (("Customer", "customers"), ("Document", "documents")):
+            # Rows written while the rebuild ran may or may not have been included
+            low = min(expected_before[table], expected_after[table])
+            high = max(expected_before[table], expected_after[table])
+            if not low <= counts[label] <= high:
+                raise ValueError(
+                    f"Generation {generation} has {counts[label]} {label} nodes, "
+                    f"expected {low}-{high} from PostgreSQL {table}"
+                )
+        
+        logger.info(f"Graph generation {generation} validated: {counts}")
+        return counts
+    
+    def sync_incremental(self) -> Dict[str, int]:
+        """Sync only rows changed since the last successful sync's watermark"""
+        logger.info("Starting incremental data synchronization...")
+        
+        state = self.pg_manager.get_sync_state(INCREMENTAL_SYNC) or {}
+        watermark = {
+            key: state.get(key) for key in (
+                "customers_updated_at", "documents_updated_at", "fields_updated_at", "deletes_updated_at"
+            )
+        }
+        for key in ("customers_last_id", "documents_last_id", "fields_last_id", "deletes_last_id"):
+            watermark[key] = state.get(key) or 0
+        
+        # updated_at is stamped when the writing transaction starts, so a row committed after a
+        # later-stamped one was synced sits below the watermark; re-read an overlap window before it
+        overlap = timedelta(seconds=settings.sync_watermark_overlap_seconds)
+        cursor = {}
+        for stream in ("customers", "documents", "fields", "deletes"):
+            updated_at = watermark[f"{stream}_updated_at"]
+            cursor[stream] = (updated_at - overlap, 0) if updated_at is not None else (None, 0)
+        
+        page_size = settings.sync_incremental_page_size
+        synced = {"customers": 0, "documents": 0}
+        synced_document_ids = set()
+        
+        # Customers first so PROCESSED relationships find their start node
+        while True:
+            customers = self.pg_manager.get_customers_changed_since(
+                *cursor["customers"], page_size
+            )
+            if not customers:
+                break
+            with self.create_writer() as writer:
+                for customer in customers:
+                    writer.add_customer(
+                        customer_id=customer['id'],
+                        name=customer['name'],
+                        email=customer.get('email')
+                    )
+            cursor["customers"] = self._advance_watermark(watermark, "customers", customers[-1])
+            self.pg_manager.save_sync_state(INCREMENTAL_SYNC, watermark)
+            synced["customers"] += len(customers)
+        
+        # Documents whose own row changed
+        while True:
+            documents = self.pg_manager.get_documents_changed_since(
+                *cursor["documents"], page_size
+            )
+            if not documents:
+                break
+            self._sync_document_rows(documents)
+            synced_document_ids.update(d['id'] for d in documents)
+            cursor["documents"] = self._advance_watermark(watermark, "documents", documents[-1])
+            self.pg_manager.save_sync_state(INCREMENTAL_SYNC, watermark)
+        
+        # Documents with changed fields that were not already re-synced above
+        while True:
+            fields = self.pg_manager.get_document_fields_changed_since(
+                *cursor["fields"], page_size
+            )
+            if not fields:
+                break
+            document_ids = {f['document_id'] for f in fields} - synced_document_ids
+            if document_ids:
+                self._sync_document_rows(self.pg_manager.get_documents_by_ids(sorted(document_ids)))
+                synced_document_ids.update(document_ids)
+            cursor["fields"] = self._advance_watermark(watermark, "fields", fields[-1])
+            self.pg_manager.save_sync_state(INCREMENTAL_SYNC, watermark)
+        
+        # Deleted rows: documents are removed or, for a deleted field, re-synced; then customers
+        synced["deleted"] = 0
+        while True:
+            deletes = self.pg_manager.get_deletes_since(*cursor["deletes"], page_size)
+            if not deletes:
+                break
+            document_ids = {d['entity_id'] for d in deletes if d['entity'] == 'document'}
+            customer_ids = {d['entity_id'] for d in deletes if d['entity'] == 'customer'}
+            if document_ids:
+                self.sync_documents_by_ids(document_ids)
+                synced_document_ids.update(document_ids)
+            if customer_ids:
+                self.sync_customers_by_ids(customer_ids)
+            synced["deleted"] += len(deletes)
+            cursor["deletes"] = self._advance_watermark(watermark, "deletes", deletes[-1])
+            self.pg_manager.save_sync_state(INCREMENTAL_SYNC, watermark)
+        
+        synced["documents"] = len(synced_document_ids)
+        self.pg_manager.save_sync_state(INCREMENTAL_SYNC, watermark, completed=True)
+        if watermark["deletes_updated_at"] is not None:
+            self.pg_manager.prune_sync_deletes(watermark["deletes_updated_at"] - overlap)
+        logger.info(
+            f"Incremental synchronization completed: {synced['customers']} customers, "
+            f"{synced['documents']} documents, {synced['deleted']} deletes"
+        )
+        return synced
+    
+    @staticmethod
+    def _advance_watermark(watermark: Dict[str, Any], stream: str,
+                           last: Dict[str, Any]) -> Tuple[Any, int]:
+        """
+        Move a stream's watermark up to the last row read, never below where it was, so re-reading
+        the overlap window does not pull the saved watermark back; returns the next read cursor
+        """
+        position = (last['updated_at'], last['id'])
+        saved_at = watermark[f"{stream}_updated_at"]
+        if saved_at is None or position > (saved_at, watermark[f"{stream}_last_id"]):
+            watermark[f"{stream}_updated_at"], watermark[f"{stream}_last_id"] = position
+        return position
+    
+    def _sync_document_rows(self, documents: Iterable[Dict[str, Any]],
+                             fields_by_document: Optional[Dict[int, List[Dict[str, Any]]]] = None) -> None:
+        """
+        Re-sync the given document rows with their fields as a diff against the graph:
+        only changed Document properties, missing relationships and stale relationships are written,
+        then the risk profiles of the shippers of changed documents are recomputed
+        """
+        documents = list(documents)
+        if fields_by_document is None:
+            fields_by_document = {}
+            for field in self.pg_manager.get_document_fields_for_documents([d['id'] for d in documents]):
+                fields_by_document.setdefault(field['document_id'], []).append(field)
+        
+        document_relationships = sorted({m['relationship'] for m in self.field_mappings.values() if m['relationship']})
+        current_state = self.neo4j_manager.get_document_graph_state([d['id'] for d in documents], document_relationships)
+        
+        # Shippers before and after the change, of documents whose profile inputs changed
+        profiled_shippers = set()
+        # Products that gained an HS code; every shipper of them has a changed HS code mix
+        classified_products = set()
+        
+        with self.create_writer() as writer:
+            for document in documents:
+                doc_id = document['id']
+                current = current_state.get(doc_id)
+                properties = self._document_properties(document)
+                # created_at never changes once set, and comes back from the graph as a string
+                changed = current is None or any(
+                    current[key] != value for key, value in properties.items() if key != 'created_at'
+                ) or (properties['created_at'] is not None and not current['has_created_at'])
+                if changed:
+                    writer.add_document(**properties)
+                
+                entities, relationships = self._field_edges(doc_id, fields_by_document.get(doc_id, []))
+                classifications = {rel for rel in relationships if rel[0] == 'CLASSIFIED_AS'}
+                relationships -= classifications
+                relationships.add(('PROCESSED', document['customer_id'], doc_id))
+                
+                existing = set()
+                existing_classifications = set()
+                if current is not None:
+                    existing = {(rel_type, doc_id, key) for rel_type, key in current['edges']}
+                    existing |= {('PROCESSED', customer_id, doc_id) for customer_id in current['customers']}
+                    existing_classifications = {('CLASSIFIED_AS', p, h) for p, h in current['classifications']}
+                
+                for rel_type, start, end in relationships - existing:
+                    if rel_type != 'PROCESSED':
+                        writer.add_entity(RELATIONSHIP_ENDPOINTS[rel_type][2], end)
+                    writer.add_relationship(rel_type, start, end)
+                for rel_type, start, end in existing - relationships:
+                    writer.remove_relationship(rel_type, start, end)
+                
+                if changed or any(rel[0] in PROFILE_RELATIONSHIPS for rel in relationships ^ existing):
+                    profiled_shippers.update(
+                        end for rel_type, _, end in relationships | existing if rel_type == 'HAS_SHIPPER'
+                    )
+                
+                # Classifications belong to the shared Product, so they are only ever added
+                new_classifications = classifications - existing_classifications
+                if new_classifications:
+                    profiled_shippers.update(end for rel_type, _, end in relationships if rel_type == 'HAS_SHIPPER')
+                    classified_products.update(start for _, start, _ in new_classifications)
+                for rel_type, start, end in new_classifications:
+                    writer.add_entity('Product', start)
+                    writer.add_entity('HSCode', end)
+                    writer.add_relationship(rel_type, start, end)
+        
+        # Read after the writer flushed, so documents that just gained the Product are included
+        if classified_products:
+            profiled_shippers.update(
+                self.neo4j_manager.get_product_shippers(sorted(classified_products), writer.generation)
+            )
+        self.risk_profiles.refresh(profiled_shippers, writer.generation)
     
-    def sync_customers(self) -> None:
+    def sync_customers(self, generation: Optional[int] = None) -> None:
         """Sync customers from PostgreSQL to Neo4j"""
         logger.info("Syncing customers...")
         customers = self.pg_manager.get_customers()
         
-        for customer in customers:
-            self.neo4j_manager.create_or_update_customer(
-                customer_id=customer['id'],
-                name=customer['name'],
-                email=customer.get('email')
-            )
+        with self.create_writer(generation) as writer:
+            for customer in customers:
+                writer.add_customer(
+                    customer_id=customer['id'],
+                    name=customer['name'],
+                    email=customer.get('email')
+                )
         
         logger.info(f"Synced {len(customers)} customers")
     
-    def sync_documents(self) -> None:
-        """Sync documents and their fields from PostgreSQL to Neo4j"""
-        logger.info("Syncing documents and fields...")
+    def sync_documents(self, generation: Optional[int] = None, workers: Optional[int] = None,
+                       progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                       run_id: Optional[str] = None) -> None:
+        """
+        Sync documents and their fields, partitioned by document id across worker threads.
+        With a run_id, partitions are checkpointed after every flushed batch and
+        restarted after their last committed document.
+        """
+        workers = workers or settings.sync_workers
+        check_pool_capacity(workers)
+        logger.info(f"Syncing documents and fields with {workers} workers...")
         
-        # Get all documents
-        documents = self.pg_manager.get_documents()
+        run = self.pg_manager.get_sync_run(run_id) if run_id else None
         
-        # Group document fields by document
-        document_fields = self.pg_manager.get_document_fields()
-        fields_by_document = {}
+        # Shared LegalEntity/Product/HSCode/Location nodes are created once up front,
+        # so partitions only write their own Document nodes and relationships
+        if not run or not run['entities_synced']:
+            self._sync_field_entities(generation)
+            if run:
+                self.pg_manager.mark_sync_run_entities_synced(run_id)
         
-        for field in document_fields:
-            doc_id = field['document_id']
-            if doc_id not in fields_by_document:
-                fields_by_document[doc_id] = []
-            fields_by_document[doc_id].append(field)
+        if run:
+            partitions = [
+                {
+                    "id_range": (c['low_id'], c['high_id']),
+                    "status": c['status'],
+                    "documents": c['documents_done'] or 0,
+                    "total": c['total_documents'],
+                    "last_document_id": c['last_document_id']
+                }
+                for c in self.pg_manager.get_sync_checkpoints(run_id)
+            ]
+        else:
+            partitions = [
+                {
+                    "id_range": (p['low'], p['high']),
+                    "status": "pending",
+                    "documents": 0,
+                    "total": p['documents'],
+                    "last_document_id": None
+                }
+                for p in self.pg_manager.get_document_id_partitions(workers)
+            ]
+        self.partition_progress = dict(enumerate(partitions))
         
-        # Process each document
-        for document in documents:
-            doc_id = document['id']
-            
-            # Create document node
-            self.neo4j_manager.create_or_update_document(
-                document_id=doc_id,
-                document_number=document['document_number'] or f"DOC-{doc_id}",
-                document_type=document['document_type'],
-                customer_id=document['customer_id']
-            )
-            
-            # Create customer-document relationship
-            self.neo4j_manager.create_customer_document_relationship(
-                customer_id=document['customer_id'],
-                document_id=doc_id
-            )
-            
-            # Process document fields
-            if doc_id in fields_by_document:
-                self.sync_document_fields(doc_id, fields_by_document[doc_id])
+        pending = [index for index, p in self.partition_progress.items() if p["status"] != "completed"]
+        if len(pending) < len(partitions):
+            logger.info(f"Skipping {len(partitions) - len(pending)} partitions completed by an earlier attempt")
         
-        logger.info(f"Synced {len(documents)} documents")
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="graph-sync") as executor:
+            futures = [
+                executor.submit(self._sync_partition, index, generation, progress_callback, run_id)
+                for index in pending
+            ]
+            # Surface the first partition failure
+            for future in futures:
+                future.result()
+        
+        synced = sum(p["documents"] for p in self.partition_progress.values())
+        logger.info(f"Synced {synced} documents in {len(partitions)} partitions")
     
-    def sync_document_fields(self, document_id: int, fields: List[Dict[str, Any]]) -> None:
-        """Sync fields for a specific document"""
-        product_hs_codes = {}  # Track product-HS code relationships
+    def _sync_field_entities(self, generation: Optional[int] = None) -> None:
+        """Create every distinct entity node referenced by document fields"""
+        count = 0
+        with self.create_writer(generation) as writer:
+            for row in self.pg_manager.iter_distinct_field_values(list(self.field_mappings)):
+                writer.add_entity(self.field_mappings[row['field_name']]['node_type'], row['best_value'])
+                count += 1
+        logger.info(f"Synced {count} entity nodes")
+    
+    def _sync_partition(self, index: int, generation: Optional[int],
+                        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                        run_id: Optional[str] = None) -> None:
+        """Sync the documents of one id range with its own pooled PostgreSQL and Neo4j sessions"""
+        progress = self.partition_progress[index]
+        low, high = progress["id_range"]
+        if progress["last_document_id"] is not None:
+            low = progress["last_document_id"] + 1
+        progress["status"] = "running"
+        
+        # Documents fully queued since the last flush; a document still being queued
+        # when a batch flushes is not checkpointed and is simply rewritten on resume
+        queued = {"documents": progress["documents"], "last_document_id": progress["last_document_id"]}
+        
+        def checkpoint(status: str = "running") -> None:
+            progress["documents"] = queued["documents"]
+            progress["last_document_id"] = queued["last_document_id"]
+            if run_id:
+                self.pg_manager.save_sync_checkpoint(
+                    run_id, index, progress["last_document_id"], progress["documents"], status
+                )
+            self._report_progress(index, progress_callback)
+        
+        try:
+            writer = BulkGraphWriter(self.neo4j_manager, generation=generation, on_flush=checkpoint)
+            for document, fields in self._iter_documents_with_fields((low, high)):
+                self._queue_document(writer, document)
+                if fields:
+                    self._queue_document_fields(writer, document['id'], fields, include_entities=False)
+                queued["documents"] += 1
+                queued["last_document_id"] = document['id']
+            writer.flush()
+        except Exception as e:
+            progress["status"] = "failed"
+            progress["error"] = str(e)
+            if run_id:
+                self.pg_manager.save_sync_checkpoint(
+                    run_id, index, progress["last_document_id"], progress["documents"], "failed"
+                )
+            logger.error(f"Partition {index} {progress['id_range']} failed: {e}")
+            raise
+        
+        progress["status"] = "completed"
+        checkpoint("completed")
+    
+    def _report_progress(self, index: int,
+                         progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> None:
+        progress = self.partition_progress[index]
+        logger.info(
+            f"Partition {index} {progress['id_range']}: "
+            f"{progress['documents']}/{progress['total']} documents ({progress['status']})"
+        )
+        if progress_callback:
+            progress_callback(self.partition_progress)
+    
+    def _iter_documents_with_fields(self, id_range: Optional[Tuple[int, int]] = None
+                                    ) -> Iterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """Documents of an id range with their fields, read through one pooled connection"""
+        for document in self.pg_manager.iter_documents_with_fields(id_range):
+            fields = document.pop('fields')
+            yield document, fields
+    
+    @staticmethod
+    def _document_properties(document: Dict[str, Any]) -> Dict[str, Any]:
+        """Document node properties from a documents row"""
+        doc_id = document['id']
+        return {
+            "document_id": doc_id,
+            "document_number": document['document_number'] or f"DOC-{doc_id}",
+            "document_type": document['document_type'],
+            "customer_id": document['customer_id'],
+            "created_at": document.get('created_at')
+        }
+    
+    def _queue_document(self, writer: BulkGraphWriter, document: Dict[str, Any]) -> None:
+        """Queue a Document node and its PROCESSED relationship"""
+        writer.add_document(**self._document_properties(document))
+        writer.add_relationship('PROCESSED', document['customer_id'], document['id'])
+    
+    def _field_edges(self, document_id: int, fields: List[Dict[str, Any]]
+                     ) -> Tuple[List[Tuple[str, Any]], Set[Tuple[str, Any, Any]]]:
+        """Entity nodes (label, key) and relationships (type, start, end) implied by a document's best values"""
+        entities = []
+        relationships = set()
+        product_name = None
+        hs_code = None
         
         for field in fields:
             field_name = field['field_name']
@@ -137,100 +651,110 @@ class KnowledgeGraphSync:
                 continue
             
             mapping = self.field_mappings[field_name]
+            entities.append((mapping['node_type'], best_value))
             
-            # Create the node
-            mapping['create_node'](best_value)
+            if mapping['relationship']:
+                relationships.add((mapping['relationship'], document_id, best_value))
             
-            # Create relationship if applicable
-            if mapping['create_relationship']:
-                if field_name == 'Product':
-                    # For products, we need to handle the relationship differently
-                    # to track product-HS code relationships
-                    product_hs_codes[best_value] = None
-                elif field_name in ['OriginPort', 'DestinationPort']:
-                    # Location relationships
-                    mapping['create_relationship'](
-                        document_id=document_id,
-                        location_name=best_value,
-                        relationship_type=mapping['relationship']
-                    )
-                else:
-                    # Entity relationships (ShipperName, ConsigneeName, etc.)
-                    mapping['create_relationship'](
-                        document_id=document_id,
-                        entity_name=best_value,
-                        relationship_type=mapping['relationship']
-                    )
+            # Track the document's product and HS code to link them below
+            if field_name == 'Product' and product_name is None:
+                product_name = best_value
             elif field_name == 'HS_Code':
-                # Store HS code to potentially link with products
-                # Find if there's a product in the same document
-                for other_field in fields:
-                    if other_field['field_name'] == 'Product':
-                        product_hs_codes[other_field['best_value']] = best_value
-                        break
-        
-        # Create product-HS code relationships and document-product relationships
-        for product_name, hs_code in product_hs_codes.items():
-            # Create document-product relationship
-            self.neo4j_manager.create_document_contains_relationship(
-                document_id=document_id,
-                product_name=product_name
-            )
-            
-            # Create product-HS code relationship if HS code exists
-            if hs_code:
-                self.neo4j_manager.create_product_hs_code_relationship(
-                    product_name=product_name,
-                    hs_code=hs_code
-                )
+                hs_code = best_value
+        
+        if product_name and hs_code:
+            relationships.add(('CLASSIFIED_AS', product_name, hs_code))
+        
+        return entities, relationships
+    
+    def _queue_document_fields(self, writer: BulkGraphWriter, document_id: int,
+                               fields: List[Dict[str, Any]], include_entities: bool = True) -> None:
+        """Queue entity nodes (unless already created) and relationships for a document's fields"""
+        entities, relationships = self._field_edges(document_id, fields)
+        if include_entities:
+            for label, key in entities:
+                writer.add_entity(label, key)
+        for relationship in relationships:
+            writer.add_relationship(*relationship)
+    
+    def sync_document_fields(self, document_id: int, fields: List[Dict[str, Any]]) -> None:
+        """Sync fields for a specific document, adding and removing only the relationships that changed"""
+        document = self.pg_manager.get_document(document_id)
+        if not document:
+            logger.error(f"Document {document_id} not found")
+            return
+        self._sync_document_rows([document], {document_id: fields})
     
     def sync_single_document(self, document_id: int) -> None:
         """Sync a single document from PostgreSQL to Neo4j"""
         logger.info(f"Syncing single document: {document_id}")
         
-        # Get document details
-        documents = self.pg_manager.get_documents()
-        document = next((d for d in documents if d['id'] == document_id), None)
+        # Get document details and fields by primary key in one query
+        document = self.pg_manager.get_document_with_fields(document_id)
         
         if not document:
             logger.error(f"Document {document_id} not found")
             return
         
-        # Create/update document node
-        self.neo4j_manager.create_or_update_document(
-            document_id=document_id,
-            document_number=document['document_number'] or f"DOC-{document_id}",
-            document_type=document['document_type'],
-            customer_id=document['customer_id']
-        )
+        # Write only what changed for the document, its relationships and its fields
+        fields = document.pop('fields')
+        self._sync_document_rows([document], {document_id: fields})
         
-        # Create customer-document relationship
-        self.neo4j_manager.create_customer_document_relationship(
-            customer_id=document['customer_id'],
-            document_id=document_id
-        )
+        logger.info(f"Synced document {document_id}")
+    
+    def sync_documents_by_ids(self, document_ids: Iterable[int]) -> int:
+        """
+        Sync a batch of documents and their fields through one bulk graph write;
+        documents no longer in PostgreSQL are removed from the graph
+        """
+        document_ids = sorted(set(document_ids))
+        documents = self.pg_manager.get_documents_by_ids(document_ids)
         
-        # Sync document fields
-        fields = self.pg_manager.get_document_fields(document_id)
-        if fields:
-            self.sync_document_fields(document_id, fields)
+        missing = set(document_ids) - {d['id'] for d in documents}
+        if missing:
+            state = self.neo4j_manager.get_document_graph_state(sorted(missing), ['HAS_SHIPPER'])
+            deleted = self.neo4j_manager.delete_nodes('Document', 'id', sorted(missing))
+            logger.info(f"Removed {deleted} deleted documents from the graph")
+            self.risk_profiles.refresh(key for current in state.values() for _, key in current['edges'])
         
-        logger.info(f"Synced document {document_id}")
+        if documents:
+            self._sync_document_rows(documents)
+        logger.info(f"Synced {len(documents)} documents")
+        return len(documents)
+    
+    def sync_customers_by_ids(self, customer_ids: Iterable[int]) -> int:
+        """Sync a batch of customers; customers no longer in PostgreSQL are removed from the graph"""
+        customer_ids = sorted(set(customer_ids))
+        customers = self.pg_manager.get_customers_by_ids(customer_ids)
+        
+        missing = set(customer_ids) - {c['id'] for c in customers}
+        if missing:
+            deleted = self.neo4j_manager.delete_nodes('Customer', 'id', sorted(missing))
+            logger.info(f"Removed {deleted} deleted customers from the graph")
+        
+        with self.create_writer() as writer:
+            for customer in customers:
+                writer.add_customer(
+                    customer_id=customer['id'],
+                    name=customer['name'],
+                    email=customer.get('email')
+                )
+        return len(customers)
     
     def get_sync_status(self) -> Dict[str, Any]:
         """Get the current sync status"""
         # Get PostgreSQL stats
-        pg_stats = {
-            "customers": len(self.pg_manager.get_customers()),
-            "documents": len(self.pg_manager.get_documents()),
-            "document_fields": len(self.pg_manager.get_document_fields())
-        }
+        pg_stats = self.pg_manager.get_row_counts()
         
         # Get Neo4j stats
         neo4j_stats = self.neo4j_manager.get_graph_statistics()
         
+        # Last successful sync from the persisted watermark
+        state = self.pg_manager.get_sync_state(INCREMENTAL_SYNC)
+        last_sync = state["last_sync_at"].isoformat() if state and state.get("last_sync_at") else "Not available"
+        
         return {
             "postgresql": pg_stats,
             "neo4j": neo4j_stats,
-            "last_sync": "Not available"  # TODO: Implement sync timestamp tracking
+            "last_sync": last_sync
         }
@@ -1,52 +1,450 @@
-from neo4j import GraphDatabase
-from typing import List, Dict, Any, Optional
-from contextlib import contextmanager
+import asyncio
+import re
+import threading
+import time
+from neo4j import GraphDatabase, Driver, AsyncGraphDatabase, AsyncDriver, READ_ACCESS, unit_of_work
+from typing import List, Dict, Any, Optional, Tuple, Iterator, AsyncIterator
+from contextlib import contextmanager, asynccontextmanager
 from loguru import logger
 from config import settings
 
 
+_driver: Optional[Driver] = None
+_driver_lock = threading.Lock()
+_async_driver: Optional[AsyncDriver] = None
+
+# Labels written by the sync; every node carries the generation it was built in
+GRAPH_LABELS = ["Customer", "Document", "LegalEntity", "HSCode", "Product", "Location"]
+
+# Cached copy of the active-generation pointer, shared by all managers in the process.
+# version is bumped by every write to the active generation, so readers can tell
+# whether results they cached are still current.
+_graph_state: Dict[str, Any] = {"generation": None, "version": 0, "fetched_at": 0.0}
+_graph_state_lock = threading.Lock()
+
+GRAPH_STATE_QUERY = """
+MATCH (g:GraphGeneration {name: 'active'})
+RETURN g.generation as generation, coalesce(g.version, 0) as version
+"""
+
+BUMP_GRAPH_VERSION_QUERY = """
+MERGE (g:GraphGeneration {name: 'active'})
+ON CREATE SET g.generation = 0
+SET g.version = coalesce(g.version, 0) + 1
+RETURN g.version as version
+"""
+
+# Node counts reported by get_graph_statistics
+NODE_COUNT_QUERIES = {
+    "customers": "MATCH (c:Customer {generation: $generation}) RETURN count(c) as count",
+    "documents": "MATCH (d:Document {generation: $generation}) RETURN count(d) as count",
+    "legal_entities": "MATCH (e:LegalEntity {generation: $generation}) RETURN count(e) as count",
+    "hs_codes": "MATCH (h:HSCode {generation: $generation}) RETURN count(h) as count",
+    "products": "MATCH (p:Product {generation: $generation}) RETURN count(p) as count",
+    "locations": "MATCH (l:Location {generation: $generation}) RETURN count(l) as count"
+}
+
+# Full-text (Lucene) indexes for name and document-number searches; they span
+# generations, so queries filter on node.generation after the index lookup
+ENTITY_NAME_INDEX = "entity_names"
+DOCUMENT_NUMBER_INDEX = "document_numbers"
+
+FULLTEXT_INDEXES = [
+    f"CREATE FULLTEXT INDEX {ENTITY_NAME_INDEX} IF NOT EXISTS "
+    "FOR (n:Customer|LegalEntity|HSCode|Product|Location) ON EACH [n.name, n.code]",
+    f"CREATE FULLTEXT INDEX {DOCUMENT_NUMBER_INDEX} IF NOT EXISTS "
+    "FOR (d:Document) ON EACH [d.document_number]"
+]
+
+# Trigram text indexes, so the CONTAINS predicates that remain are index-backed too
+TEXT_INDEX_PROPERTIES = {
+    "Customer": "name",
+    "LegalEntity": "name",
+    "HSCode": "code",
+    "Product": "name",
+    "Location": "name",
+    "Document": "document_number"
+}
+
+SEARCH_TOKEN = re.compile(r"\w+")
+
+RELATIONSHIP_COUNT_QUERY = """
+MATCH (n)-[r]->()
+WHERE n.generation = $generation
+RETURN type(r) as relationship_type, count(r) as count 
+ORDER BY count DESC
+"""
+
+
+def _driver_kwargs() -> Dict[str, Any]:
+    """Pool settings shared by the sync and async drivers"""
+    return {
+        "auth": (settings.neo4j_user, settings.neo4j_password),
+        "max_connection_pool_size": settings.neo4j_max_connection_pool_size,
+        "connection_acquisition_timeout": settings.neo4j_connection_acquisition_timeout,
+        "keep_alive": settings.neo4j_keep_alive,
+        "max_connection_lifetime": settings.neo4j_max_connection_lifetime,
+        "max_transaction_retry_time": settings.neo4j_max_transaction_retry_time
+    }
+
+
+def fulltext_search(text: str) -> Optional[str]:
+    """
+    Lucene query for a free-text lookup: every word must match exactly, as a
+    prefix, or (for longer alphabetic words) within one edit, so typos in names
+    are forgiven but numbers are not. None if text has no words.
+    """
+    clauses = []
+    for token in SEARCH_TOKEN.findall(text.lower()):
+        clause = f"{token} OR {token}*"
+        if len(token) >= 4 and token.isalpha():
+            clause += f" OR {token}~1"
+        clauses.append(f"({clause})")
+    return " AND ".join(clauses) or None
+
+
+def _cached_graph_state(refresh: bool = False) -> Optional[Tuple[int, int]]:
+    """Cached (generation, version) if it is fresh enough to use"""
+    with _graph_state_lock:
+        cached = _graph_state["generation"]
+        if not refresh and cached is not None and time.monotonic() - _graph_state["fetched_at"] < settings.graph_state_refresh_seconds:
+            return cached, _graph_state["version"]
+    return None
+
+
+def _store_graph_state(record, fetched_at: float) -> Tuple[int, int]:
+    """Cache the pointer node's state; versions bumped in-process since the read are kept"""
+    generation = record["generation"] if record and record["generation"] is not None else 0
+    version = record["version"] if record else 0
+    with _graph_state_lock:
+        _graph_state["generation"] = generation
+        _graph_state["version"] = max(version, _graph_state["version"])
+        _graph_state["fetched_at"] = fetched_at
+        return generation, _graph_state["version"]
+
+
+def _store_graph_version(version: int) -> int:
+    """Cache a version this process just bumped, so its own readers drop stale results at once"""
+    with _graph_state_lock:
+        _graph_state["version"] = max(version, _graph_state["version"])
+    return version
+
+
+def get_driver() -> Driver:
+    """Return the process-wide pooled Neo4j driver, creating it on first use"""
+    global _driver
+    if _driver is None:
+        with _driver_lock:
+            if _driver is None:
+                _driver = GraphDatabase.driver(settings.neo4j_uri, **_driver_kwargs())
+                logger.info(
+                    f"Created Neo4j driver for {settings.neo4j_uri} "
+                    f"(pool size {settings.neo4j_max_connection_pool_size})"
+                )
+    return _driver
+
+
+def close_driver() -> None:
+    """Close the process-wide Neo4j driver and release its pooled connections"""
+    global _driver
+    with _driver_lock:
+        if _driver is not None:
+            _driver.close()
+            _driver = None
+            logger.info("Neo4j driver closed")
+
+
+def get_async_driver() -> AsyncDriver:
+    """Return the process-wide pooled async Neo4j driver for event-loop code paths"""
+    global _async_driver
+    if _async_driver is None:
+        _async_driver = AsyncGraphDatabase.driver(settings.neo4j_uri, **_driver_kwargs())
+        logger.info(
+            f"Created async Neo4j driver for {settings.neo4j_uri} "
+            f"(pool size {settings.neo4j_max_connection_pool_size})"
+        )
+    return _async_driver
+
+
+async def close_async_driver() -> None:
+    """Close the async Neo4j driver"""
+    global _async_driver
+    if _async_driver is not None:
+        await _async_driver.close()
+        _async_driver = None
+        logger.info("Async Neo4j driver closed")
+
+
 class Neo4jManager:
     def __init__(self):
         self.uri = settings.neo4j_uri
         self.user = settings.neo4j_user
         self.password = settings.neo4j_password
     
+    @property
+    def driver(self) -> Driver:
+        return get_driver()
+    
     @contextmanager
-    def get_session(self):
-        """Context manager for Neo4j sessions"""
-        driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password))
+    def get_session(self, **config):
+        """Context manager for Neo4j sessions borrowed from the shared driver pool"""
+        session = self.driver.session(**config)
         try:
-            session = driver.session()
             yield session
         except Exception as e:
             logger.error(f"Neo4j session error: {e}")
             raise
         finally:
             session.close()
-            driver.close()
+    
+    @staticmethod
+    def _serialize_record(record) -> Dict[str, Any]:
+        """Convert a record to a dict, turning Neo4j DateTime objects into strings"""
+        data = record.data()
+        for key, value in data.items():
+            if hasattr(value, 'iso_format'):
+                data[key] = value.iso_format()
+            elif isinstance(value, dict):
+                for sub_key, sub_value in value.items():
+                    if hasattr(sub_value, 'iso_format'):
+                        value[sub_key] = sub_value.iso_format()
+        return data
+    
+    def _run_in_transaction(self, tx, query: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Transaction function: results must be consumed before the transaction ends"""
+        result = tx.run(query, params)
+        return [self._serialize_record(record) for record in result]
+    
+    def _bind_generation(self, query: str, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Fill in $generation with the active generation unless the caller pinned one"""
+        params = dict(params or {})
+        if "$generation" in query and "generation" not in params:
+            params["generation"] = self.get_active_generation()
+        return params
     
     def execute_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
-        """Execute a Cypher query and return results"""
+        """Execute a Cypher query in an auto-commit transaction and return results"""
         try:
+            params = self._bind_generation(query, params)
             with self.get_session() as session:
-                result = session.run(query, params or {})
-                records = []
-                for record in result:
-                    data = record.data()
-                    # Convert Neo4j DateTime objects to strings for serialization
-                    for key, value in data.items():
-                        if hasattr(value, 'iso_format'):
-                            data[key] = value.iso_format()
-                        elif isinstance(value, dict):
-                            for sub_key, sub_value in value.items():
-                                if hasattr(sub_value, 'iso_format'):
-                                    value[sub_key] = sub_value.iso_format()
-                    records.append(data)
-                return records
+                result = session.run(query, params)
+                return [self._serialize_record(record) for record in result]
         except Exception as e:
             logger.error(f"Neo4j query error: {e}")
             raise
     
+    def execute_read(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Execute a read query in a managed transaction, retried on transient errors"""
+        try:
+            params = self._bind_generation(query, params)
+            with self.get_session() as session:
+                return session.execute_read(self._run_in_transaction, query, params)
+        except Exception as e:
+            logger.error(f"Neo4j read error: {e}")
+            raise
+    
+    def execute_write(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Execute a write query in a managed transaction, retried on transient errors"""
+        try:
+            params = self._bind_generation(query, params)
+            with self.get_session() as session:
+                return session.execute_write(self._run_in_transaction, query, params)
+        except Exception as e:
+            logger.error(f"Neo4j write error: {e}")
+            raise
+    
+    def stream_read(self, query: str, params: Optional[Dict[str, Any]] = None,
+                    fetch_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the records of a read query as they come off the Bolt cursor.
+        The driver pulls fetch_size records at a time, so memory stays bounded;
+        not retried, since records may already have been handed out.
+        """
+        params = self._bind_generation(query, params)
+        with self.get_session(default_access_mode=READ_ACCESS,
+                              fetch_size=fetch_size or settings.neo4j_stream_fetch_size) as session:
+            with session.begin_transaction() as tx:
+                for record in tx.run(query, params):
+                    yield self._serialize_record(record)
+    
+    def get_active_generation(self, refresh: bool = False) -> int:
+        """Generation that readers query, cached for graph_state_refresh_seconds"""
+        return self.get_graph_version(refresh)[0]
+    
+    def get_graph_version(self, refresh: bool = False) -> Tuple[int, int]:
+        """(active generation, write version) of the graph, cached for graph_state_refresh_seconds"""
+        cached = _cached_graph_state(refresh)
+        if cached is not None:
+            return cached
+        
+        now = time.monotonic()
+        with self.get_session() as session:
+            record = session.run(GRAPH_STATE_QUERY).single()
+        return _store_graph_state(record, now)
+    
+    def bump_graph_version(self) -> int:
+        """Record a write to the active generation so cached query results are dropped"""
+        return _store_graph_version(self.execute_write(BUMP_GRAPH_VERSION_QUERY)[0]["version"])
+    
+    def begin_generation(self) -> int:
+        """Reserve a new generation number for a shadow build"""
+        query = """
+        MERGE (g:GraphGeneration {name: 'active'})
+        ON CREATE SET g.generation = 0
+        WITH g, coalesce(g.last_allocated, g.generation) + 1 as next_generation
+        SET g.last_allocated = next_generation, g.building = next_generation
+        RETURN next_generation as generation
+        """
+        result = self.execute_write(query)
+        return result[0]["generation"]
+    
+    def activate_generation(self, generation: int) -> Optional[int]:
+        """Atomically point readers at a generation, returning the one it replaces"""
+        query = """
+        MERGE (g:GraphGeneration {name: 'active'})
+        WITH g, g.generation as previous
+        SET g.generation = $new_generation,
+            g.previous = previous,
+            g.building = null,
+            g.version = coalesce(g.version, 0) + 1,
+            g.activated_at = datetime()
+        RETURN previous
+        """
+        result = self.execute_write(query, {"new_generation": generation})
+        self.get_active_generation(refresh=True)
+        logger.info(f"Activated graph generation {generation}")
+        return result[0]["previous"] if result else None
+    
+    def get_generation_state(self) -> Dict[str, Any]:
+        """Active, building and previous generation, and seconds since the last activation"""
+        query = """
+        MATCH (g:GraphGeneration {name: 'active'})
+        RETURN g.generation as active,
+               g.building as building,
+               g.previous as previous,
+               duration.inSeconds(g.activated_at, datetime()).seconds as seconds_since_activation
+        """
+        result = self.execute_read(query)
+        if not result:
+            return {"active": 0, "building": None, "previous": None, "seconds_since_activation": None}
+        state = result[0]
+        state["active"] = state["active"] if state["active"] is not None else 0
+        return state
+    
+    def list_generations(self) -> List[int]:
+        """
+        Every generation that still has nodes: each generation up to the last one allocated
+        is probed with one seek per label on the generation indexes, instead of scanning every node
+        """
+        result = self.execute_read("""
+        MATCH (g:GraphGeneration {name: 'active'})
+        RETURN coalesce(g.last_allocated, g.generation, 0) as last_allocated
+        """)
+        candidates = list(range(0, (result[0]["last_allocated"] if result else 0) + 1))
+        generations = set()
+        for label in GRAPH_LABELS:
+            result = self.execute_read(
+                f"UNWIND $candidates AS generation "
+                f"WITH generation WHERE EXISTS {{ MATCH (:{label} {{generation: generation}}) }} "
+                f"RETURN generation",
+                {"candidates": [g for g in candidates if g not in generations]}
+            )
+            generations.update(record["generation"] for record in result)
+        return sorted(generations)
+    
+    def count_generation_nodes(self, generation: int) -> Dict[str, int]:
+        """Count nodes per label in a generation"""
+        counts = {}
+        for label in GRAPH_LABELS:
+            result = self.execute_read(
+                f"MATCH (n:{label} {{generation: $generation}}) RETURN count(n) as count",
+                {"generation": generation}
+            )
+            counts[label] = result[0]["count"] if result else 0
+        return counts
+    
+    def delete_generation(self, generation: int, chunk_size: Optional[int] = None) -> int:
+        """Delete a generation in small transactions instead of one giant DETACH DELETE"""
+        chunk_size = chunk_size or settings.graph_gc_chunk_size
+        query_template = """
+        MATCH (n:{label} {{generation: $generation}})
+        WITH n LIMIT $chunk_size
+        DETACH DELETE n
+        RETURN count(*) as deleted
+        """
+        total = 0
+        for label in GRAPH_LABELS:
+            query = query_template.format(label=label)
+            while True:
+                result = self.execute_write(query, {"generation": generation, "chunk_size": chunk_size})
+                deleted = result[0]["deleted"] if result else 0
+                total += deleted
+                if deleted < chunk_size:
+                    break
+        logger.info(f"Deleted {total} nodes of graph generation {generation}")
+        return total
+    
+    def adopt_unversioned_nodes(self) -> None:
+        """Stamp nodes written before generations existed with generation 0"""
+        for label in GRAPH_LABELS:
+            self.execute_query(f"""
+            MATCH (n:{label}) WHERE n.generation IS NULL
+            CALL {{ WITH n SET n.generation = 0 }} IN TRANSACTIONS OF 10000 ROWS
+            """)
+    
+    def get_document_graph_state(self, document_ids: List[int],
+                                 relationship_types: List[str]) -> Dict[int, Dict[str, Any]]:
+        """Current properties, customer, outgoing field relationships and product classifications of documents"""
+        query = """
+        UNWIND $document_ids AS document_id
+        MATCH (d:Document {id: document_id, generation: $generation})
+        OPTIONAL MATCH (d)-[r]->(e)
+        WHERE type(r) IN $relationship_types
+        WITH d, collect(CASE WHEN r IS NULL THEN NULL ELSE [type(r), coalesce(e.name, e.code)] END) as edges
+        OPTIONAL MATCH (c:Customer {generation: $generation})-[:PROCESSED]->(d)
+        WITH d, edges, collect(c.id) as customers
+        OPTIONAL MATCH (d)-[:CONTAINS]->(p:Product)-[:CLASSIFIED_AS]->(h:HSCode)
+        RETURN d.id as document_id,
+               d.document_number as document_number,
+               d.document_type as document_type,
+               d.customer_id as customer_id,
+               d.created_at IS NOT NULL as has_created_at,
+               edges,
+               customers,
+               collect(CASE WHEN h IS NULL THEN NULL ELSE [p.name, h.code] END) as classifications
+        """
+        result = self.execute_read(query, {
+            "document_ids": list(document_ids),
+            "relationship_types": list(relationship_types)
+        })
+        return {record["document_id"]: record for record in result}
+    
+    def get_product_shippers(self, product_names: List[str], generation: Optional[int] = None) -> List[str]:
+        """Names of the shippers of every document containing one of the products"""
+        query = """
+        UNWIND $product_names AS product_name
+        MATCH (:Product {name: product_name, generation: $generation})<-[:CONTAINS]-(:Document)-[:HAS_SHIPPER]->(e:LegalEntity)
+        RETURN DISTINCT e.name as name
+        """
+        params = {"product_names": list(product_names)}
+        if generation is not None:
+            params["generation"] = generation
+        return [record["name"] for record in self.execute_read(query, params)]
+    
+    def delete_nodes(self, label: str, key: str, values: List[Any]) -> int:
+        """Detach-delete nodes of the active generation whose key property is one of values"""
+        query = f"""
+        MATCH (n:{label} {{generation: $generation}})
+        WHERE n.{key} IN $values
+        DETACH DELETE n
+        RETURN count(*) as deleted
+        """
+        result = self.execute_write(query, {"values": list(values)})
+        deleted = result[0]["deleted"] if result else 0
+        if deleted:
+            self.bump_graph_version()
+        return deleted
+    
     def clear_graph(self) -> None:
         """Clear all nodes and relationships from the graph"""
         query = "MATCH (n) DETACH DELETE n"
@@ -54,16 +452,44 @@ class Neo4jManager:
         logger.info("Graph cleared successfully")
     
     def create_constraints(self) -> None:
-        """Create uniqueness constraints for the graph"""
-        constraints = [
-            "CREATE CONSTRAINT customer_id_unique IF NOT EXISTS FOR (c:Customer) REQUIRE c.id IS UNIQUE",
-            "CREATE CONSTRAINT document_id_unique IF NOT EXISTS FOR (d:Document) REQUIRE d.id IS UNIQUE",
-            "CREATE CONSTRAINT legal_entity_name_unique IF NOT EXISTS FOR (e:LegalEntity) REQUIRE e.name IS UNIQUE",
-            "CREATE CONSTRAINT hs_code_code_unique IF NOT EXISTS FOR (h:HSCode) REQUIRE h.code IS UNIQUE",
-            "CREATE CONSTRAINT product_name_unique IF NOT EXISTS FOR (p:Product) REQUIRE p.name IS UNIQUE",
-            "CREATE CONSTRAINT location_name_unique IF NOT EXISTS FOR (l:Location) REQUIRE l.name IS UNIQUE"
+        """Create uniqueness constraints and lookup indexes for the graph"""
+        # Keys are unique per generation so a shadow rebuild can coexist with the live graph
+        legacy_constraints = [
+            "customer_id_unique", "document_id_unique", "legal_entity_name_unique",
+            "hs_code_code_unique", "product_name_unique", "location_name_unique"
         ]
+        for name in legacy_constraints:
+            self.execute_query(f"DROP CONSTRAINT {name} IF EXISTS")
         
+        constraints = [
+            "CREATE CONSTRAINT customer_id_generation_unique IF NOT EXISTS FOR (c:Customer) REQUIRE (c.id, c.generation) IS UNIQUE",
+            "CREATE CONSTRAINT document_id_generation_unique IF NOT EXISTS FOR (d:Document) REQUIRE (d.id, d.generation) IS UNIQUE",
+            "CREATE CONSTRAINT legal_entity_name_generation_unique IF NOT EXISTS FOR (e:LegalEntity) REQUIRE (e.name, e.generation) IS UNIQUE",
+            "CREATE CONSTRAINT hs_code_code_generation_unique IF NOT EXISTS FOR (h:HSCode) REQUIRE (h.code, h.generation) IS UNIQUE",
+            "CREATE CONSTRAINT product_name_generation_unique IF NOT EXISTS FOR (p:Product) REQUIRE (p.name, p.generation) IS UNIQUE",
+            "CREATE CONSTRAINT location_name_generation_unique IF NOT EXISTS FOR (l:Location) REQUIRE (l.name, l.generation) IS UNIQUE",
+            "CREATE CONSTRAINT graph_generation_name_unique IF NOT EXISTS FOR (g:GraphGeneration) REQUIRE g.name IS UNIQUE"
+        ]
+        # Generation-only indexes for counting and chunked garbage collection
+        constraints += [
+            f"CREATE INDEX {label.lower()}_generation IF NOT EXISTS FOR (n:{label}) ON (n.generation)"
+            for label in GRAPH_LABELS
+        ]
+        constraints += [
+            f"CREATE TEXT INDEX {label.lower()}_{key}_text IF NOT EXISTS FOR (n:{label}) ON (n.{key})"
+            for label, key in TEXT_INDEX_PROPERTIES.items()
+        ]
+        constraints += FULLTEXT_INDEXES
+        # Lets the entity gazetteer fetch only what changed since its last refresh
+        constraints += [
+            f"CREATE INDEX {label.lower()}_generation_updated_at IF NOT EXISTS FOR (n:{label}) ON (n.generation, n.updated_at)"
+            for label in ("LegalEntity", "HSCode", "Product", "Location")
+        ]
+        # Risk dashboards list shippers by their precomputed risk level
+        constraints.append(
+            "CREATE INDEX legalentity_generation_risk_level IF NOT EXISTS FOR (e:LegalEntity) ON (e.generation, e.risk_level)"
+        )
+
         for constraint in constraints:
             try:
                 self.execute_query(constraint)
@@ -74,7 +500,7 @@ class Neo4jManager:
     def create_or_update_customer(self, customer_id: int, name: str, email: Optional[str] = None) -> None:
         """Create or update a Customer node"""
         query = """
-        MERGE (c:Customer {id: $customer_id})
+        MERGE (c:Customer {id: $customer_id, generation: $generation})
         SET c.name = $name, c.email = $email, c.updated_at = datetime()
         """
         params = {
@@ -82,13 +508,13 @@ class Neo4jManager:
             "name": name,
             "email": email
         }
-        self.execute_query(query, params)
+        self.execute_write(query, params)
     
     def create_or_update_document(self, document_id: int, document_number: str, 
                                  document_type: str, customer_id: int) -> None:
         """Create or update a Document node"""
         query = """
-        MERGE (d:Document {id: $document_id})
+        MERGE (d:Document {id: $document_id, generation: $generation})
         SET d.document_number = $document_number, 
             d.document_type = $document_type,
             d.customer_id = $customer_id,
@@ -100,120 +526,233 @@ class Neo4jManager:
             "document_type": document_type,
             "customer_id": customer_id
         }
-        self.execute_query(query, params)
+        self.execute_write(query, params)
     
     def create_or_update_legal_entity(self, name: str) -> None:
         """Create or update a LegalEntity node"""
         query = """
-        MERGE (e:LegalEntity {name: $name})
+        MERGE (e:LegalEntity {name: $name, generation: $generation})
         SET e.updated_at = datetime()
         """
         params = {"name": name}
-        self.execute_query(query, params)
+        self.execute_write(query, params)
     
     def create_or_update_hs_code(self, code: str) -> None:
         """Create or update an HSCode node"""
         query = """
-        MERGE (h:HSCode {code: $code})
+        MERGE (h:HSCode {code: $code, generation: $generation})
         SET h.updated_at = datetime()
         """
         params = {"code": code}
-        self.execute_query(query, params)
+        self.execute_write(query, params)
     
     def create_or_update_product(self, name: str) -> None:
         """Create or update a Product node"""
         query = """
-        MERGE (p:Product {name: $name})
+        MERGE (p:Product {name: $name, generation: $generation})
         SET p.updated_at = datetime()
         """
         params = {"name": name}
-        self.execute_query(query, params)
+        self.execute_write(query, params)
     
     def create_or_update_location(self, name: str) -> None:
         """Create or update a Location node"""
         query = """
-        MERGE (l:Location {name: $name})
+        MERGE (l:Location {name: $name, generation: $generation})
         SET l.updated_at = datetime()
         """
         params = {"name": name}
-        self.execute_query(query, params)
+        self.execute_write(query, params)
     
     def create_customer_document_relationship(self, customer_id: int, document_id: int) -> None:
         """Create PROCESSED relationship between Customer and Document"""
         query = """
-        MATCH (c:Customer {id: $customer_id})
-        MATCH (d:Document {id: $document_id})
+        MATCH (c:Customer {id: $customer_id, generation: $generation})
+        MATCH (d:Document {id: $document_id, generation: $generation})
         MERGE (c)-[:PROCESSED]->(d)
         """
         params = {"customer_id": customer_id, "document_id": document_id}
-        self.execute_query(query, params)
+        self.execute_write(query, params)
     
     def create_document_entity_relationship(self, document_id: int, entity_name: str, 
                                           relationship_type: str) -> None:
         """Create relationship between Document and LegalEntity"""
         query = f"""
-        MATCH (d:Document {{id: $document_id}})
-        MATCH (e:LegalEntity {{name: $entity_name}})
+        MATCH (d:Document {{id: $document_id, generation: $generation}})
+        MATCH (e:LegalEntity {{name: $entity_name, generation: $generation}})
         MERGE (d)-[:{relationship_type}]->(e)
         """
         params = {"document_id": document_id, "entity_name": entity_name}
-        self.execute_query(query, params)
+        self.execute_write(query, params)
     
     def create_product_hs_code_relationship(self, product_name: str, hs_code: str) -> None:
         """Create CLASSIFIED_AS relationship between Product and HSCode"""
         query = """
-        MATCH (p:Product {name: $product_name})
-        MATCH (h:HSCode {code: $hs_code})
+        MATCH (p:Product {name: $product_name, generation: $generation})
+        MATCH (h:HSCode {code: $hs_code, generation: $generation})
         MERGE (p)-[:CLASSIFIED_AS]->(h)
         """
         params = {"product_name": product_name, "hs_code": hs_code}
-        self.execute_query(query, params)
+        self.execute_write(query, params)
     
     def create_document_contains_relationship(self, document_id: int, product_name: str) -> None:
         """Create CONTAINS relationship between Document and Product"""
         query = """
-        MATCH (d:Document {id: $document_id})
-        MATCH (p:Product {name: $product_name})
+        MATCH (d:Document {id: $document_id, generation: $generation})
+        MATCH (p:Product {name: $product_name, generation: $generation})
         MERGE (d)-[:CONTAINS]->(p)
         """
         params = {"document_id": document_id, "product_name": product_name}
-        self.execute_query(query, params)
+        self.execute_write(query, params)
     
     def create_document_location_relationship(self, document_id: int, location_name: str, 
                                             relationship_type: str) -> None:
         """Create relationship between Document and Location"""
         query = f"""
-        MATCH (d:Document {{id: $document_id}})
-        MATCH (l:Location {{name: $location_name}})
+        MATCH (d:Document {{id: $document_id, generation: $generation}})
+        MATCH (l:Location {{name: $location_name, generation: $generation}})
         MERGE (d)-[:{relationship_type}]->(l)
         """
         params = {"document_id": document_id, "location_name": location_name}
-        self.execute_query(query, params)
+        self.execute_write(query, params)
     
     def get_graph_statistics(self) -> Dict[str, int]:
         """Get statistics about the graph"""
         stats = {}
+        params = {"generation": self.get_active_generation()}
         
-        node_queries = {
-            "customers": "MATCH (c:Customer) RETURN count(c) as count",
-            "documents": "MATCH (d:Document) RETURN count(d) as count",
-            "legal_entities": "MATCH (e:LegalEntity) RETURN count(e) as count",
-            "hs_codes": "MATCH (h:HSCode) RETURN count(h) as count",
-            "products": "MATCH (p:Product) RETURN count(p) as count",
-            "locations": "MATCH (l:Location) RETURN count(l) as count"
-        }
-        
-        for key, query in node_queries.items():
-            result = self.execute_query(query)
+        for key, query in NODE_COUNT_QUERIES.items():
+            result = self.execute_read(query, params)
             stats[key] = result[0]["count"] if result else 0
         
         # Get relationship counts
-        rel_query = """
-        MATCH ()-[r]->() 
-        RETURN type(r) as relationship_type, count(r) as count 
-        ORDER BY count DESC
-        """
-        rel_results = self.execute_query(rel_query)
+        rel_results = self.execute_read(RELATIONSHIP_COUNT_QUERY, params)
         stats["relationships"] = {r["relationship_type"]: r["count"] for r in rel_results}
         
         return stats
+
+
+class AsyncNeo4jManager:
+    """
+    Read-side Neo4jManager for FastAPI handlers: queries are awaited on the
+    async driver, so a slow query does not block the event loop. Shares the
+    cached active-generation pointer with the sync managers in the process.
+    """
+    
+    @property
+    def driver(self) -> AsyncDriver:
+        return get_async_driver()
+    
+    @asynccontextmanager
+    async def get_session(self, **config):
+        """Async context manager for sessions borrowed from the shared async driver pool"""
+        session = self.driver.session(**config)
+        try:
+            yield session
+        except Exception as e:
+            logger.error(f"Neo4j session error: {e}")
+            raise
+        finally:
+            await session.close()
+    
+    @staticmethod
+    async def _run_in_transaction(tx, query: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Transaction function: results must be consumed before the transaction ends"""
+        result = await tx.run(query, params)
+        return [Neo4jManager._serialize_record(record) async for record in result]
+    
+    async def _bind_generation(self, query: str, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Fill in $generation with the active generation unless the caller pinned one"""
+        params = dict(params or {})
+        if "$generation" in query and "generation" not in params:
+            params["generation"] = await self.get_active_generation()
+        return params
+    
+    async def execute_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Execute a Cypher query in an auto-commit transaction and return results"""
+        try:
+            params = await self._bind_generation(query, params)
+            async with self.get_session() as session:
+                result = await session.run(query, params)
+                return [Neo4jManager._serialize_record(record) async for record in result]
+        except Exception as e:
+            logger.error(f"Neo4j query error: {e}")
+            raise
+    
+    async def execute_read(self, query: str, params: Optional[Dict[str, Any]] = None,
+                           timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Execute a read query in a managed transaction, retried on transient errors.
+        The server terminates it after timeout seconds when one is given.
+        """
+        try:
+            params = await self._bind_generation(query, params)
+            work = unit_of_work(timeout=timeout)(self._run_in_transaction) if timeout else self._run_in_transaction
+            async with self.get_session() as session:
+                return await session.execute_read(work, query, params)
+        except Exception as e:
+            logger.error(f"Neo4j read error: {e}")
+            raise
+    
+    async def execute_write(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Execute a write query in a managed transaction, retried on transient errors"""
+        try:
+            params = await self._bind_generation(query, params)
+            async with self.get_session() as session:
+                return await session.execute_write(self._run_in_transaction, query, params)
+        except Exception as e:
+            logger.error(f"Neo4j write error: {e}")
+            raise
+    
+    async def stream_read(self, query: str, params: Optional[Dict[str, Any]] = None,
+                          fetch_size: Optional[int] = None,
+                          timeout: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the records of a read query as they come off the Bolt cursor, fetch_size at a time"""
+        params = await self._bind_generation(query, params)
+        async with self.get_session(default_access_mode=READ_ACCESS,
+                                    fetch_size=fetch_size or settings.neo4j_stream_fetch_size) as session:
+            async with await session.begin_transaction(timeout=timeout) as tx:
+                result = await tx.run(query, params)
+                async for record in result:
+                    yield Neo4jManager._serialize_record(record)
+    
+    async def explain(self, query: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Planner's plan for a query, without running it"""
+        params = await self._bind_generation(query, params)
+        async with self.get_session(default_access_mode=READ_ACCESS) as session:
+            result = await session.run("EXPLAIN " + query, params)
+            summary = await result.consume()
+        return summary.plan or {}
+    
+    async def get_active_generation(self, refresh: bool = False) -> int:
+        """Generation that readers query, cached for graph_state_refresh_seconds"""
+        return (await self.get_graph_version(refresh))[0]
+    
+    async def get_graph_version(self, refresh: bool = False) -> Tuple[int, int]:
+        """(active generation, write version) of the graph, cached for graph_state_refresh_seconds"""
+        cached = _cached_graph_state(refresh)
+        if cached is not None:
+            return cached
+        
+        now = time.monotonic()
+        async with self.get_session() as session:
+            result = await session.run(GRAPH_STATE_QUERY)
+            record = await result.single()
+        return _store_graph_state(record, now)
+    
+    async def bump_graph_version(self) -> int:
+        """Record a write to the active generation so cached query results are dropped"""
+        return _store_graph_version((await self.execute_write(BUMP_GRAPH_VERSION_QUERY))[0]["version"])
+    
+    async def get_graph_statistics(self) -> Dict[str, int]:
+        """Get statistics about the graph, running the count queries concurrently"""
+        params = {"generation": await self.get_active_generation()}
+        keys = list(NODE_COUNT_QUERIES)
+        *node_results, rel_results = await asyncio.gather(
+            *(self.execute_read(NODE_COUNT_QUERIES[key], params) for key in keys),
+            self.execute_read(RELATIONSHIP_COUNT_QUERY, params)
+        )
+        
+        stats = {key: result[0]["count"] if result else 0 for key, result in zip(keys, node_results)}
+        stats["relationships"] = {r["relationship_type"]: r["count"] for r in rel_results}
+        return stats
@@ -1,17 +1,129 @@
 import re
 import json
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Optional, Tuple, Any
 from loguru import logger
-from schemas import EntityExtraction
+from schemas import EntityExtraction, EntityMention
+from graph_writer import ENTITY_KEYS
+from neo4j_manager import GRAPH_LABELS, ENTITY_NAME_INDEX, DOCUMENT_NUMBER_INDEX, fulltext_search
+from config import settings
+
+
+QUOTED_VALUE = re.compile(r'"([^"]+)"')
+PROPER_NOUN = re.compile(r'\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\b')
+
+KEYWORD_SEPARATOR = re.compile(r'[\s_]+')
+WORD_CHARACTER = re.compile(r'\w')
+
+# Node counts per label, each read from the label's generation index rather than a scan of every node
+OVERVIEW_QUERY = "CALL {\n" + "\nUNION ALL\n".join(
+    f"MATCH (n:{label} {{generation: $generation}}) RETURN '{label}' as node_type, count(n) as count"
+    for label in GRAPH_LABELS
+) + "\n}\nRETURN node_type, count\nORDER BY count DESC"
+
+# Phrases that identify each question type; words may be separated by
+# whitespace or underscores, so the original keys ('has_ever') still match
+INTENT_KEYWORDS = {
+    'has_ever': ['has ever', 'ever sent', 'ever shipped'],
+    'is_high_risk': ['is high risk', 'high risk'],
+    'how_many': ['how many'],
+    'what_products': ['what products'],
+    'which_customers': ['which customers'],
+    'list_all': ['list all'],
+    'find_documents': ['find documents']
+}
+
+
+def trie_pattern(keywords: List[str]) -> str:
+    """
+    Regex matching any of the keywords, factored into a prefix trie so the
+    engine follows one branch per character instead of trying every
+    keyword at every position. Spaces in a keyword match any run of
+    whitespace or underscores; longer keywords win over their prefixes.
+    """
+    trie: Dict[str, Any] = {}
+    for keyword in keywords:
+        node = trie
+        for atom in re.split(r'( )', keyword):
+            for char in ([atom] if atom == ' ' else atom):
+                node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: Dict[str, Any]) -> str:
+        branches = [
+            (r'[\s_]+' if char == ' ' else re.escape(char)) + build(child)
+            for char, child in sorted(node.items()) if char
+        ]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            pattern = '(?:' + pattern + ')?'
+        return pattern
+
+    return build(trie)
+
+
+# How a memoized translation rebuilds a parameter from a new question's slots:
+# ('text', i) the slot as written, ('name', i) the graph key it resolved to,
+# ('search', i) fulltext_search of the slot text, ('const', value) unchanged
+Recipe = Dict[str, Tuple[str, Any]]
+
+
+class TranslationMemo:
+    """
+    LRU map from question shapes (the question with its entity slots replaced
+    by placeholders) to the Cypher they translate to and the recipe that
+    binds a question's slot values to its parameters.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries if max_entries is not None else settings.translation_memo_size
+        self._entries: "OrderedDict[str, Tuple[str, Recipe]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.metrics = {"hits": 0, "misses": 0, "evictions": 0, "unmemoizable": 0}
+
+    def get(self, shape: str) -> Optional[Tuple[str, Recipe]]:
+        with self._lock:
+            entry = self._entries.get(shape)
+            if entry is None:
+                self.metrics["misses"] += 1
+                return None
+            self._entries.move_to_end(shape)
+            self.metrics["hits"] += 1
+            return entry
+
+    def put(self, shape: str, query: str, recipe: Recipe) -> None:
+        with self._lock:
+            self._entries[shape] = (query, recipe)
+            self._entries.move_to_end(shape)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.metrics["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.metrics["hits"] + self.metrics["misses"]
+            return {
+                **self.metrics,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hit_rate": round(self.metrics["hits"] / lookups, 4) if lookups else 0.0
+            }
 
 
 class NLToCypherTranslator:
     """
     Translates natural language questions into Cypher queries
-    for the logistics knowledge graph
+    for the logistics knowledge graph. With a gazetteer, entity names
+    found in the question are bound to their exact graph keys.
     """
     
-    def __init__(self):
+    def __init__(self, gazetteer=None, memo: Optional[TranslationMemo] = None):
+        self.gazetteer = gazetteer
+        self.memo = memo if memo is not None else TranslationMemo()
+        
         # Entity patterns and their corresponding graph labels
         self.entity_patterns = {
             'shipper': 'LegalEntity',
@@ -47,6 +159,51 @@ class NLToCypherTranslator:
             'list_all': self._handle_list_all_question,
             'find_documents': self._handle_find_documents_question
         }
+        
+        self._compile_patterns()
+    
+    def _compile_patterns(self) -> None:
+        """
+        Compile every intent, entity-type and relationship keyword into one
+        trie-shaped regex, so a single findall over the lowercased question
+        finds them all. It has no capturing groups; matched text is mapped
+        back to its keyword through self._keywords.
+        """
+        self._keywords: Dict[str, Tuple[str, str]] = {}
+        for intent, phrases in INTENT_KEYWORDS.items():
+            for phrase in phrases:
+                self._keywords[phrase] = ('intent', intent)
+        for kind, names in (('entity', self.entity_patterns), ('relationship', self.relationship_patterns)):
+            for name in names:
+                self._keywords[name] = (kind, name)
+        self._keyword_matcher = re.compile(trie_pattern(list(self._keywords)))
+        self._intent_priority = {intent: index for index, intent in enumerate(self.question_patterns)}
+        
+        # Value patterns of _find_entity_by_type, per entity type
+        self._entity_value_patterns: Dict[str, List[re.Pattern]] = {}
+    
+    def _keyword(self, text: str) -> Tuple[str, str]:
+        keyword = self._keywords.get(text)
+        if keyword is None:
+            keyword = self._keywords[KEYWORD_SEPARATOR.sub(' ', text)]
+        return keyword
+    
+    def _match_keywords(self, question: str, matches: Optional[List[re.Match]] = None) -> Dict[str, set]:
+        """All intents, entity types and relationships mentioned in the question, in one pass"""
+        found = {'intent': set(), 'entity': set(), 'relationship': set()}
+        if matches is None:
+            texts = self._keyword_matcher.findall(question.lower())
+        else:
+            texts = [match.group() for match in matches]
+        for text in texts:
+            kind, name = self._keyword(text)
+            found[kind].add(name)
+            if kind == 'intent':
+                # Keywords inside an intent phrase, like "customer" in "which customers"
+                for inner in self._keyword_matcher.findall(text, 1):
+                    inner_kind, inner_name = self._keyword(inner)
+                    found[inner_kind].add(inner_name)
+        return found
     
     def translate(self, question: str) -> Tuple[str, Dict[str, Any]]:
         """
@@ -58,59 +215,217 @@ class NLToCypherTranslator:
         Returns:
             Tuple of (cypher_query, parameters)
         """
-        question_lower = question.lower().strip()
+        question = question.strip()
+        mentions = self.gazetteer.find_mentions(question) if self.gazetteer else []
+        if self.memo.max_entries <= 0:
+            return self._translate(question, mentions)
+        
+        lowered = question.lower()
+        matches = list(self._keyword_matcher.finditer(lowered))
+        # Keyword offsets only line up with slot offsets if lowercasing kept the length
+        slots = self._question_slots(question, mentions, matches) if len(lowered) == len(question) else None
+        if slots is None:
+            self.memo.metrics["unmemoizable"] += 1
+            return self._translate(question, mentions, matches)
+        shape, values = slots
+        
+        memoized = self.memo.get(shape)
+        if memoized is not None:
+            query, recipe = memoized
+            return query, self._bind(recipe, values)
+        
+        query, params = self._translate(question, mentions, matches)
+        recipe = self._recipe(params, values)
+        if recipe is None:
+            self.memo.metrics["unmemoizable"] += 1
+        else:
+            self.memo.put(shape, query, recipe)
+        return query, params
+    
+    def _translate(self, question: str, mentions: List[EntityMention],
+                   matches: Optional[List[re.Match]] = None) -> Tuple[str, Dict[str, Any]]:
+        """Translate a stripped question, without the memo"""
+        keywords = self._match_keywords(question, matches)
         
         # Extract entities and constraints
-        entities = self._extract_entities(question)
+        entities = self._extract_entities(question, keywords, mentions)
         
         # Determine question type and generate query
-        for pattern, handler in self.question_patterns.items():
-            if pattern in question_lower:
-                return handler(question, entities)
+        if keywords['intent']:
+            intent = min(keywords['intent'], key=self._intent_priority.__getitem__)
+            return self.question_patterns[intent](question, entities)
         
         # Default fallback
         return self._handle_generic_question(question, entities)
     
-    def _extract_entities(self, question: str) -> EntityExtraction:
+    def _question_slots(self, question: str, mentions: List[EntityMention],
+                        matches: List[re.Match]) -> Optional[Tuple[str, List[Tuple[str, Optional[str]]]]]:
+        """
+        (shape, slot values) of a question for the memo. Slots are quoted values
+        and unquoted gazetteer mentions; the shape is the question with each slot
+        replaced by a placeholder recording everything about it that can steer
+        translation (mention labels, whether text and graph key agree, repeats of
+        an earlier slot). None when a slot could steer it some other way, e.g. a
+        quoted value containing a question keyword.
+        """
+        quoted = [match.span(1) for match in QUOTED_VALUE.finditer(question)]
+        if not quoted and not mentions:
+            return question, []
+        # Keywords inside a slot, or running into one, can change the intent or what gets extracted
+        for match in matches:
+            match_start, match_end = match.span()
+            for start, end in quoted:
+                if start < match_end and match_start < end:
+                    return None
+            for mention in mentions:
+                if mention.start < match_end and match_start < mention.end:
+                    return None
+        
+        # [start, end, graph key or None, signature] per slot
+        spans: List[List[Any]] = []
+        in_quotes = set()
+        for start, end in quoted:
+            labels = []
+            names = set()
+            for index, mention in enumerate(mentions):
+                if start <= mention.start and mention.end <= end:
+                    in_quotes.add(index)
+                    if WORD_CHARACTER.search(question, start, mention.start) or WORD_CHARACTER.search(question, mention.end, end):
+                        labels.append(mention.label)
+                    else:
+                        labels.append(mention.label + '=')
+                        names.add(mention.name)
+            if len(names) > 1:
+                return None
+            spans.append([start, end, names.pop() if names else None, 'Q' + ','.join(labels)])
+        
+        # Mentions of one span under several labels come out of the gazetteer together
+        unquoted = False
+        for index, mention in enumerate(mentions):
+            if index in in_quotes:
+                continue
+            for start, end in quoted:
+                if start < mention.end and mention.start < end:
+                    return None
+            previous = spans[-1] if unquoted else None
+            if previous is not None and previous[0] == mention.start and previous[1] == mention.end:
+                if previous[2] != mention.name:
+                    return None
+                previous[3] += ',' + mention.label
+            else:
+                spans.append([mention.start, mention.end, mention.name, 'M' + mention.label])
+                unquoted = True
+        if unquoted and quoted:
+            spans.sort()
+        
+        shape = []
+        values = []
+        seen: Dict[str, int] = {}
+        position = 0
+        for index, (start, end, name, signature) in enumerate(spans):
+            text = question[start:end]
+            if not WORD_CHARACTER.search(text):
+                return None
+            forms = [text.lower()]
+            if name is not None:
+                signature += '=' if name == text else '!'
+                forms.append(name.lower())
+            # A slot repeating an earlier one (in any case) can steer handlers that compare them
+            for form in forms:
+                if form in seen:
+                    signature += f'~{seen[form]}'
+                    break
+            for form in forms:
+                seen.setdefault(form, index)
+            shape.append(question[position:start] + '\0' + signature + '\0')
+            values.append((text, name))
+            position = end
+        shape.append(question[position:])
+        return ''.join(shape), values
+    
+    @staticmethod
+    def _recipe(params: Dict[str, Any], values: List[Tuple[str, Optional[str]]]) -> Optional[Recipe]:
+        """How each parameter derives from the slot values, or None if that is ambiguous"""
+        recipe: Recipe = {}
+        for param, value in params.items():
+            if not isinstance(value, str):
+                recipe[param] = ('const', value)
+                continue
+            sources = []
+            for index, (text, name) in enumerate(values):
+                if value == text:
+                    sources.append(('text', index))
+                elif value == name:
+                    sources.append(('name', index))
+                elif value == fulltext_search(text):
+                    sources.append(('search', index))
+            if len({index for _, index in sources}) > 1:
+                return None
+            if sources:
+                recipe[param] = sources[0]
+                continue
+            # A value built from part of a slot cannot be rebuilt from another question
+            lowered = value.lower()
+            for text, name in values:
+                for form in (text.lower(), (name or '').lower()):
+                    if form and (form in lowered or lowered in form):
+                        return None
+            recipe[param] = ('const', value)
+        return recipe
+    
+    @staticmethod
+    def _bind(recipe: Recipe, values: List[Tuple[str, Optional[str]]]) -> Dict[str, Any]:
+        """Parameters of a memoized translation for a question's slot values"""
+        params = {}
+        for param, (kind, source) in recipe.items():
+            if kind == 'const':
+                params[param] = source
+            elif kind == 'text':
+                params[param] = values[source][0]
+            elif kind == 'name':
+                params[param] = values[source][1]
+            else:
+                params[param] = fulltext_search(values[source][0])
+        return params
+    
+    def _extract_entities(self, question: str, keywords: Optional[Dict[str, set]] = None,
+                          mentions: Optional[List[EntityMention]] = None) -> EntityExtraction:
         """Extract entities, relationships, and constraints from question"""
-        entities = []
-        relationships = []
-        constraints = []
-        
-        # Extract quoted entities (exact matches)
-        quoted_entities = re.findall(r'"([^"]+)"', question)
-        entities.extend(quoted_entities)
+        if keywords is None:
+            keywords = self._match_keywords(question)
         
-        # Extract entity types
-        for entity_type in self.entity_patterns.keys():
-            if entity_type in question.lower():
-                entities.append(entity_type)
-        
-        # Extract relationship indicators
-        for rel_type in self.relationship_patterns.keys():
-            if rel_type in question.lower():
-                relationships.append(rel_type)
+        # Quoted entities (exact matches) and the entity types mentioned
+        entities = set(QUOTED_VALUE.findall(question)) | keywords['entity']
         
         # Extract specific names (proper nouns - simplified)
-        words = re.findall(r'\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\b', question)
-        constraints.extend(words)
+        constraints = set(PROPER_NOUN.findall(question))
+        
+        # Known graph entities, with their exact keys
+        if mentions is None:
+            mentions = self.gazetteer.find_mentions(question) if self.gazetteer else []
         
         return EntityExtraction(
-            entities=list(set(entities)),
-            relationships=list(set(relationships)),
-            constraints=list(set(constraints))
+            entities=list(entities),
+            mentions=mentions,
+            relationships=list(keywords['relationship']),
+            constraints=list(constraints)
         )
     
     def _handle_has_ever_question(self, question: str, entities: EntityExtraction) -> Tuple[str, Dict[str, Any]]:
         """Handle 'Has X ever sent Y to Z?' type questions"""
-        # Extract specific entities
-        shipper = self._extract_quoted_value(question, 'shipper') or self._find_entity_by_type(question, 'shipper')
-        product = self._extract_quoted_value(question, 'product') or self._find_entity_by_type(question, 'product')
-        destination = self._extract_quoted_value(question, 'destination') or self._find_entity_by_type(question, 'port')
+        # Quoted values in question order: "shipper" ever sent "product" to "destination"
+        quoted = QUOTED_VALUE.findall(question)
+        if len(quoted) == 3:
+            shipper, product, destination = quoted
+        else:
+            shipper = (self._extract_quoted_value(question, 'shipper') or self._mentioned(entities, 'LegalEntity')
+                       or self._find_entity_by_type(question, 'shipper'))
+            product = self._mentioned(entities, 'Product') or self._find_entity_by_type(question, 'product')
+            destination = self._mentioned(entities, 'Location') or self._find_entity_by_type(question, 'port')
         
         if shipper and product and destination:
             query = """
-            MATCH (shipper:LegalEntity {name: $shipper})<-[:HAS_SHIPPER]-(d:Document)
+            MATCH (shipper:LegalEntity {name: $shipper, generation: $generation})<-[:HAS_SHIPPER]-(d:Document)
             MATCH (d)-[:CONTAINS]->(product:Product {name: $product})
             MATCH (d)-[:DESTINED_FOR]->(dest:Location {name: $destination})
             RETURN count(d) > 0 as has_ever_sent
@@ -121,7 +436,7 @@ class NLToCypherTranslator:
         # Fallback with partial matches
         if shipper and destination:
             query = """
-            MATCH (shipper:LegalEntity {name: $shipper})<-[:HAS_SHIPPER]-(d:Document)
+            MATCH (shipper:LegalEntity {name: $shipper, generation: $generation})<-[:HAS_SHIPPER]-(d:Document)
             MATCH (d)-[:DESTINED_FOR]->(dest:Location {name: $destination})
             RETURN count(d) > 0 as has_ever_sent
             """
@@ -132,27 +447,25 @@ class NLToCypherTranslator:
     
     def _handle_risk_question(self, question: str, entities: EntityExtraction) -> Tuple[str, Dict[str, Any]]:
         """Handle 'Is X high risk?' type questions"""
-        entity = self._extract_quoted_value(question) or self._find_entity_by_type(question, 'shipper')
+        entity = (self._extract_quoted_value(question) or self._mentioned(entities, 'LegalEntity')
+                  or self._find_entity_by_type(question, 'shipper'))
         
         if entity:
-            # Risk assessment based on document patterns and destinations
+            # Risk profile kept up to date on the entity by the sync, read in one index lookup
             query = """
-            MATCH (entity:LegalEntity {name: $entity})<-[:HAS_SHIPPER]-(d:Document)
-            OPTIONAL MATCH (d)-[:DESTINED_FOR]->(dest:Location)
-            WITH entity, count(d) as total_shipments, collect(DISTINCT dest.name) as destinations
+            MATCH (entity:LegalEntity {name: $entity, generation: $generation})
+            WHERE entity.shipment_count > 0
             RETURN 
                 entity.name as entity,
-                total_shipments,
-                size(destinations) as unique_destinations,
-                CASE 
-                    WHEN total_shipments > 100 THEN 'High'
-                    WHEN total_shipments > 50 THEN 'Medium'
-                    ELSE 'Low'
-                END as risk_level,
-                CASE 
-                    WHEN total_shipments > 100 THEN true
-                    ELSE false
-                END as is_high_risk
+                entity.shipment_count as total_shipments,
+                entity.unique_destinations as unique_destinations,
+                entity.embargo_lanes as embargo_lanes,
+                entity.embargo_shipments as embargo_shipments,
+                entity.hs_codes as hs_codes,
+                entity.first_seen as first_seen,
+                entity.last_seen as last_seen,
+                entity.risk_level as risk_level,
+                entity.is_high_risk as is_high_risk
             """
             params = {"entity": entity}
             return query, params
@@ -162,26 +475,27 @@ class NLToCypherTranslator:
     def _handle_how_many_question(self, question: str, entities: EntityExtraction) -> Tuple[str, Dict[str, Any]]:
         """Handle 'How many X?' type questions"""
         if 'document' in entities.entities:
-            query = "MATCH (d:Document) RETURN count(d) as total_documents"
+            query = "MATCH (d:Document {generation: $generation}) RETURN count(d) as total_documents"
             return query, {}
         
         if 'shipper' in entities.entities or 'consignee' in entities.entities:
-            query = "MATCH (e:LegalEntity) RETURN count(e) as total_entities"
+            query = "MATCH (e:LegalEntity {generation: $generation}) RETURN count(e) as total_entities"
             return query, {}
         
         if 'product' in entities.entities:
-            query = "MATCH (p:Product) RETURN count(p) as total_products"
+            query = "MATCH (p:Product {generation: $generation}) RETURN count(p) as total_products"
             return query, {}
         
         return self._handle_generic_question(question, entities)
     
     def _handle_what_products_question(self, question: str, entities: EntityExtraction) -> Tuple[str, Dict[str, Any]]:
         """Handle 'What products did X send?' type questions"""
-        entity = self._extract_quoted_value(question) or self._find_entity_by_type(question, 'shipper')
+        entity = (self._extract_quoted_value(question) or self._mentioned(entities, 'LegalEntity')
+                  or self._find_entity_by_type(question, 'shipper'))
         
         if entity:
             query = """
-            MATCH (entity:LegalEntity {name: $entity})<-[:HAS_SHIPPER]-(d:Document)
+            MATCH (entity:LegalEntity {name: $entity, generation: $generation})<-[:HAS_SHIPPER]-(d:Document)
             MATCH (d)-[:CONTAINS]->(p:Product)
             RETURN DISTINCT p.name as product, count(d) as shipment_count
             ORDER BY shipment_count DESC
@@ -195,7 +509,7 @@ class NLToCypherTranslator:
     def _handle_which_customers_question(self, question: str, entities: EntityExtraction) -> Tuple[str, Dict[str, Any]]:
         """Handle 'Which customers process X?' type questions"""
         query = """
-        MATCH (c:Customer)-[:PROCESSED]->(d:Document)
+        MATCH (c:Customer {generation: $generation})-[:PROCESSED]->(d:Document)
         RETURN c.name as customer, count(d) as document_count
         ORDER BY document_count DESC
         """
@@ -205,7 +519,7 @@ class NLToCypherTranslator:
         """Handle 'List all X' type questions"""
         if 'shipper' in entities.entities or 'consignee' in entities.entities:
             query = """
-            MATCH (e:LegalEntity)
+            MATCH (e:LegalEntity {generation: $generation})
             OPTIONAL MATCH (e)<-[:HAS_SHIPPER|:HAS_CONSIGNEE]-(d:Document)
             RETURN e.name as entity, count(d) as document_count
             ORDER BY document_count DESC
@@ -215,7 +529,7 @@ class NLToCypherTranslator:
         
         if 'product' in entities.entities:
             query = """
-            MATCH (p:Product)
+            MATCH (p:Product {generation: $generation})
             OPTIONAL MATCH (p)<-[:CONTAINS]-(d:Document)
             RETURN p.name as product, count(d) as document_count
             ORDER BY document_count DESC
@@ -228,64 +542,94 @@ class NLToCypherTranslator:
     def _handle_find_documents_question(self, question: str, entities: EntityExtraction) -> Tuple[str, Dict[str, Any]]:
         """Handle 'Find documents for X' type questions"""
         entity = self._extract_quoted_value(question)
+        known = self._mentioned(entities, 'LegalEntity')
         
-        if entity:
+        if known and (entity is None or entity.lower() == known.lower()):
             query = """
-            MATCH (d:Document)
-            WHERE d.document_number CONTAINS $entity
-               OR EXISTS {
-                   MATCH (d)-[:HAS_SHIPPER|:HAS_CONSIGNEE]-(e:LegalEntity)
-                   WHERE e.name CONTAINS $entity
-               }
-            RETURN DISTINCT d.document_number, d.document_type, d.created_at
-            ORDER BY d.created_at DESC
+            MATCH (e:LegalEntity {name: $entity, generation: $generation})<-[:HAS_SHIPPER|:HAS_CONSIGNEE]-(d:Document)
+            RETURN DISTINCT d.document_number as document_number, d.document_type as document_type,
+                   d.created_at as created_at
+            ORDER BY created_at DESC
             LIMIT 20
             """
-            params = {"entity": entity}
+            return query, {"entity": known}
+        
+        search = fulltext_search(entity) if entity else None
+        if search:
+            # Documents whose number, or whose shipper or consignee name, matches
+            query = f"""
+            CALL {{
+                CALL db.index.fulltext.queryNodes('{DOCUMENT_NUMBER_INDEX}', $search) YIELD node, score
+                WHERE node.generation = $generation
+                RETURN node as d, score
+                UNION
+                CALL db.index.fulltext.queryNodes('{ENTITY_NAME_INDEX}', $search) YIELD node, score
+                WHERE node:LegalEntity AND node.generation = $generation
+                MATCH (node)<-[:HAS_SHIPPER|:HAS_CONSIGNEE]-(d:Document)
+                RETURN d, score
+            }}
+            WITH d, max(score) as score
+            RETURN d.document_number as document_number, d.document_type as document_type,
+                   d.created_at as created_at, score
+            ORDER BY score DESC, created_at DESC
+            LIMIT 20
+            """
+            params = {"search": search}
             return query, params
         
         return self._handle_generic_question(question, entities)
     
     def _handle_generic_question(self, question: str, entities: EntityExtraction) -> Tuple[str, Dict[str, Any]]:
         """Generic fallback for unrecognized question patterns"""
+        if entities.mentions:
+            mention = entities.mentions[0]
+            key = ENTITY_KEYS[mention.label]
+            query = f"""
+            MATCH (n:{mention.label} {{{key}: $entity, generation: $generation}})
+            RETURN labels(n) as types, n.{key} as name, properties(n) as properties
+            """
+            return query, {"entity": mention.name}
+        
         # Try to find any entities mentioned
         entity = self._extract_quoted_value(question) or (entities.constraints[0] if entities.constraints else None)
+        search = fulltext_search(entity) if entity else None
         
-        if entity:
-            query = """
-            MATCH (n)
-            WHERE n.name CONTAINS $entity
-            RETURN labels(n) as types, n.name as name, properties(n) as properties
+        if search:
+            query = f"""
+            CALL db.index.fulltext.queryNodes('{ENTITY_NAME_INDEX}', $search) YIELD node, score
+            WHERE node.generation = $generation
+            RETURN labels(node) as types, coalesce(node.name, node.code) as name, properties(node) as properties, score
             LIMIT 10
             """
-            params = {"entity": entity}
+            params = {"search": search}
             return query, params
         
         # Return basic graph overview
-        query = """
-        MATCH (n)
-        WITH labels(n) as types, count(n) as count
-        RETURN types[0] as node_type, count
-        ORDER BY count DESC
-        """
-        return query, {}
+        return OVERVIEW_QUERY, {}
+    
+    def _mentioned(self, entities: EntityExtraction, label: str) -> Optional[str]:
+        """Exact key of the first known graph entity of this label in the question"""
+        for mention in entities.mentions:
+            if mention.label == label:
+                return mention.name
+        return None
     
     def _extract_quoted_value(self, question: str, entity_type: str = None) -> Optional[str]:
         """Extract quoted values from question"""
-        quoted_values = re.findall(r'"([^"]+)"', question)
-        if quoted_values:
-            return quoted_values[0]
-        return None
+        match = QUOTED_VALUE.search(question)
+        return match.group(1) if match else None
     
     def _find_entity_by_type(self, question: str, entity_type: str) -> Optional[str]:
         """Find entity value by type in question"""
-        patterns = [
-            rf'{entity_type}[:\s]+([A-Z][A-Za-z\s]+?)(?:\s+to|\s+and|\?|$)',
-            rf'{entity_type}\s+([A-Z][A-Za-z\s]+?)(?:\s+to|\s+and|\?|$)',
-        ]
+        patterns = self._entity_value_patterns.get(entity_type)
+        if patterns is None:
+            patterns = self._entity_value_patterns[entity_type] = [
+                re.compile(rf'{entity_type}[:\s]+([A-Z][A-Za-z\s]+?)(?:\s+to|\s+and|\?|$)', re.IGNORECASE),
+                re.compile(rf'{entity_type}\s+([A-Z][A-Za-z\s]+?)(?:\s+to|\s+and|\?|$)', re.IGNORECASE),
+            ]
         
         for pattern in patterns:
-            match = re.search(pattern, question, re.IGNORECASE)
+            match = pattern.search(question)
             if match:
                 return match.group(1).strip()
         
@@ -306,7 +650,10 @@ class NLToCypherTranslator:
             risk_level = results[0].get('risk_level', 'Unknown')
             is_high_risk = results[0].get('is_high_risk', False)
             answer = "Yes" if is_high_risk else "No"
-            return f"{answer}, this entity has a {risk_level.lower()} risk level based on {results[0].get('total_shipments', 0)} total shipments."
+            summary = f"{answer}, this entity has a {risk_level.lower()} risk level based on {results[0].get('total_shipments', 0)} total shipments."
+            if results[0].get('embargo_shipments'):
+                summary += f" {results[0]['embargo_shipments']} of them touch an embargoed country."
+            return summary
         
         # Handle count questions
         if len(results) == 1 and any(key in results[0] for key in ['total_documents', 'total_entities', 'total_products']):
@@ -17,7 +17,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'OCR', 'backend'))
 
 from config import settings as kg_settings
-from neo4j_manager import Neo4jManager
+from neo4j_manager import AsyncNeo4jManager, close_async_driver
 from psycopg2.extras import RealDictCursor
 import psycopg2
 
@@ -32,7 +32,7 @@ class OCRToKGIntegration:
     """
     
     def __init__(self):
-        self.neo4j_manager = Neo4jManager()
+        self.neo4j_manager = AsyncNeo4jManager()
         self.ocr_db_config = {
             'host': os.getenv('OCR_DB_HOST', 'localhost'),
             'port': os.getenv('OCR_DB_PORT', '5432'),
@@ -284,6 +284,8 @@ class OCRToKGIntegration:
                     field
                 )
             
+            # Drop /query results cached before this write
+            await self.neo4j_manager.bump_graph_version()
             logger.info(f"Synced {len(document_fields)} fields to Neo4j for document {kg_document_id}")
             
         except Exception as e:
@@ -293,7 +295,7 @@ class OCRToKGIntegration:
     async def create_document_node(self, document_id: int, ocr_document: Dict):
         """Create document node in Neo4j"""
         query = """
-        MERGE (d:Document {id: $document_id})
+        MERGE (d:Document {id: $document_id, generation: $generation})
         SET d.document_number = $document_number,
             d.document_type = $document_type,
             d.ocr_id = $ocr_id,
@@ -315,7 +317,7 @@ class OCRToKGIntegration:
     async def create_entity_node(self, entity_type: str, entity_name: str, field: Dict) -> int:
         """Create entity node in Neo4j"""
         query = f"""
-        MERGE (e:{entity_type} {{name: $entity_name}})
+        MERGE (e:{entity_type} {{name: $entity_name, generation: $generation}})
         SET e.source = 'ocr_integration',
             e.extracted_from = $field_name,
             e.confidence = $confidence,
@@ -335,7 +337,7 @@ class OCRToKGIntegration:
     async def create_relationship(self, document_id: int, entity_id: int, relationship_type: str, field: Dict):
         """Create relationship between document and entity"""
         query = f"""
-        MATCH (d:Document {{id: $document_id}})
+        MATCH (d:Document {{id: $document_id, generation: $generation}})
         MATCH (e) WHERE id(e) = $entity_id
         MERGE (d)-[:{relationship_type}]->(e)
         SET r.extracted_from = $field_name,
@@ -461,7 +463,7 @@ class OCRToKGIntegration:
             kg_conn.close()
             
             # Get Neo4j statistics
-            neo4j_stats = self.neo4j_manager.get_graph_statistics()
+            neo4j_stats = await self.neo4j_manager.get_graph_statistics()
             
             return {
                 'ocr_documents_with_hitl': ocr_count,
@@ -511,5 +513,12 @@ async def main():
     else:
         parser.print_help()
 
+async def run_main():
+    """Run the CLI and close the async Neo4j driver before the loop ends"""
+    try:
+        await main()
+    finally:
+        await close_async_driver()
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(run_main())
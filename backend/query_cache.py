@@ -0,0 +1,106 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+from config import settings
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_cypher(query: str) -> str:
+    """Collapse whitespace so formatting differences share a cache entry"""
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+class QueryResultCache:
+    """
+    LRU cache of read query results with a TTL, keyed on the normalized
+    (cypher, params) pair. Entries belong to one (generation, version) of
+    the graph: the sync bumps the version on every write and generation
+    flip, and the first lookup that sees a new one drops everything
+    cached before it.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries if max_entries is not None else settings.query_cache_max_entries
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.query_cache_ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._graph_state: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+        self.metrics = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @staticmethod
+    def make_key(query: str, params: Optional[Dict[str, Any]]) -> str:
+        return normalize_cypher(query) + "\n" + json.dumps(params or {}, sort_keys=True, default=str)
+
+    def _check_graph_state(self, graph_state: Tuple[int, int]) -> bool:
+        """
+        Drop every entry when the graph changed since they were cached; caller holds the lock.
+        False for a state older than the newest one seen, whose results are already stale.
+        """
+        if self._graph_state is not None and graph_state[1] < self._graph_state[1]:
+            return False
+        if graph_state != self._graph_state:
+            if self._entries:
+                self._entries.clear()
+                self.metrics["invalidations"] += 1
+            self._graph_state = graph_state
+        return True
+
+    def get(self, query: str, params: Optional[Dict[str, Any]],
+            graph_state: Tuple[int, int]) -> Optional[List[Dict[str, Any]]]:
+        """Cached results of a query against the given (generation, version), or None"""
+        if self.max_entries <= 0:
+            return None
+        key = self.make_key(query, params)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key) if self._check_graph_state(graph_state) else None
+            if entry is None:
+                self.metrics["misses"] += 1
+                return None
+            expires_at, results = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.metrics["expirations"] += 1
+                self.metrics["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.metrics["hits"] += 1
+            return results
+
+    def put(self, query: str, params: Optional[Dict[str, Any]],
+            graph_state: Tuple[int, int], results: List[Dict[str, Any]]) -> None:
+        """Cache results read from the given (generation, version) of the graph"""
+        if self.max_entries <= 0:
+            return
+        key = self.make_key(query, params)
+        with self._lock:
+            if not self._check_graph_state(graph_state):
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.metrics["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.metrics["hits"] + self.metrics["misses"]
+            return {
+                **self.metrics,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hit_rate": round(self.metrics["hits"] / lookups, 4) if lookups else 0.0,
+                "graph_generation": self._graph_state[0] if self._graph_state else None,
+                "graph_version": self._graph_state[1] if self._graph_state else None
+            }
@@ -0,0 +1,151 @@
+import re
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Set, Tuple
+from dataclasses import dataclass, replace
+from loguru import logger
+from neo4j_manager import AsyncNeo4jManager
+from query_cache import normalize_cypher
+from config import settings
+
+
+# Plan operators that touch every node, or every pair of rows, of the graph
+REJECTED_OPERATORS = {
+    "AllNodesScan": "scans every node in the graph",
+    "CartesianProduct": "combines unrelated patterns into a cartesian product"
+}
+
+TRAILING_LIMIT = re.compile(r"\bLIMIT\s+(\$?\w+)\s*$", re.IGNORECASE)
+TOP_LEVEL_UNION = re.compile(r"\bUNION\b", re.IGNORECASE)
+TOP_LEVEL_RETURN = re.compile(r"\bRETURN\b", re.IGNORECASE)
+TOP_LEVEL_ORDER_BY = re.compile(r"\bORDER\s+BY\b", re.IGNORECASE)
+
+
+class QueryRejected(Exception):
+    """A query whose plan is too expensive to run"""
+
+
+@dataclass
+class QueryPlan:
+    operators: Set[str]
+    estimated_rows: Optional[float]
+    # estimated_rows was planned for the first query of this shape, with its parameters
+    first_seen_estimate: bool = False
+
+
+def plan_operators(plan: Dict[str, Any]) -> Set[str]:
+    """Every operator type in an EXPLAIN plan, without the runtime suffix ('AllNodesScan@neo4j')"""
+    operators = set()
+    pending = [plan]
+    while pending:
+        operator = pending.pop()
+        if operator.get("operatorType"):
+            operators.add(operator["operatorType"].split("@")[0])
+        pending.extend(operator.get("children", []))
+    return operators
+
+
+def _top_level_matches(query: str, pattern: re.Pattern) -> List[int]:
+    """Offsets where pattern matches outside any { } subquery or map"""
+    depth = 0
+    matches = []
+    for index, char in enumerate(query):
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+        elif depth == 0 and pattern.match(query, index) and (index == 0 or not query[index - 1].isalnum()):
+            matches.append(index)
+    return matches
+
+
+def _has_top_level_union(query: str) -> bool:
+    """True if UNION joins whole queries, rather than sitting inside a CALL { } subquery"""
+    return bool(_top_level_matches(query, TOP_LEVEL_UNION))
+
+
+def has_stable_order(query: str) -> bool:
+    """
+    True if the query's final RETURN is followed by an ORDER BY, so re-running it
+    returns rows in the same order; a top-level UNION only orders its last branch
+    """
+    if _has_top_level_union(query):
+        return False
+    returns = _top_level_matches(query, TOP_LEVEL_RETURN)
+    return bool(returns) and any(index > returns[-1] for index in _top_level_matches(query, TOP_LEVEL_ORDER_BY))
+
+
+class QueryGuard:
+    """
+    Cost guard for generated read queries. Each query shape is planned once
+    with EXPLAIN and its plan summary kept (LRU); shapes whose plan contains an
+    operator from REJECTED_OPERATORS are refused. Queries get a LIMIT of
+    max_rows and are run with a transaction timeout, so one question
+    cannot pin the database.
+    """
+
+    def __init__(self, neo4j_manager: AsyncNeo4jManager, max_rows: Optional[int] = None,
+                 timeout: Optional[float] = None, max_plans: Optional[int] = None):
+        self.neo4j_manager = neo4j_manager
+        self.max_rows = max_rows if max_rows is not None else settings.query_max_rows
+        self.timeout = timeout if timeout is not None else settings.query_timeout_seconds
+        self.max_plans = max_plans if max_plans is not None else settings.query_plan_cache_size
+        self._plans: "OrderedDict[str, QueryPlan]" = OrderedDict()
+        self.metrics = {"plan_hits": 0, "explains": 0, "rejections": 0, "limits_added": 0}
+
+    def cap(self, query: str) -> str:
+        """The query with a LIMIT of at most max_rows on its final RETURN"""
+        if self.max_rows <= 0:
+            return query
+        query = query.rstrip().rstrip(";")
+        match = TRAILING_LIMIT.search(query)
+        if match:
+            limit = match.group(1)
+            if limit.isdigit() and int(limit) > self.max_rows:
+                return query[:match.start(1)] + str(self.max_rows)
+            return query
+        self.metrics["limits_added"] += 1
+        if _has_top_level_union(query):
+            return f"CALL {{\n{query}\n}}\nRETURN *\nLIMIT {self.max_rows}"
+        return f"{query}\nLIMIT {self.max_rows}"
+
+    async def plan(self, query: str, params: Optional[Dict[str, Any]] = None) -> QueryPlan:
+        """
+        EXPLAIN plan summary of the query's shape, planned on first sight.
+        The row estimate depends on the parameters, so later queries of the shape
+        get the first one's estimate marked with first_seen_estimate.
+        """
+        shape = normalize_cypher(query)
+        cached = self._plans.get(shape)
+        if cached is not None:
+            self._plans.move_to_end(shape)
+            self.metrics["plan_hits"] += 1
+            return replace(cached, first_seen_estimate=True)
+
+        explained = await self.neo4j_manager.explain(query, params)
+        self.metrics["explains"] += 1
+        plan = QueryPlan(
+            operators=plan_operators(explained),
+            estimated_rows=explained.get("args", {}).get("EstimatedRows")
+        )
+        self._plans[shape] = plan
+        while len(self._plans) > self.max_plans:
+            self._plans.popitem(last=False)
+        return plan
+
+    async def check(self, query: str, params: Optional[Dict[str, Any]] = None) -> QueryPlan:
+        """Plan of the query; raises QueryRejected if it has an operator that is too expensive"""
+        plan = await self.plan(query, params)
+        reasons = [reason for operator, reason in REJECTED_OPERATORS.items() if operator in plan.operators]
+        if reasons:
+            self.metrics["rejections"] += 1
+            logger.warning(f"Rejected query ({'; '.join(reasons)}): {normalize_cypher(query)}")
+            raise QueryRejected(f"Query rejected: its plan {' and '.join(reasons)}")
+        return plan
+
+    async def prepare(self, query: str, params: Optional[Dict[str, Any]] = None) -> Tuple[str, QueryPlan]:
+        """The capped query to run and its checked plan"""
+        query = self.cap(query)
+        return query, await self.check(query, params)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.metrics, "plans": len(self._plans), "max_rows": self.max_rows, "timeout_seconds": self.timeout}
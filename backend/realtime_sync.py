@@ -1,17 +1,350 @@
 import asyncio
-import json
+import os
+import re
+import select
+import socket
+import threading
+import time
 import asyncpg
-from typing import Callable, Optional
+import psycopg2
+import psycopg2.errors
+from psycopg2.extras import LogicalReplicationConnection
+from collections import namedtuple, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from itertools import groupby
+from typing import Awaitable, Callable, Dict, Any, Iterable, List, Optional, Set
 from loguru import logger
-import aiohttp
-from schemas import CDCNotification
 from knowledge_graph_sync import KnowledgeGraphSync
+from neo4j_manager import close_driver
+from database_manager import get_async_pool, close_async_pool, close_pool, connection_kwargs
 from config import settings
 
 
+# Channel the outbox triggers NOTIFY to wake consumers up
+OUTBOX_CHANNEL = "cdc_outbox"
+
+# A batch of one customer's documents waiting for a sync worker, with the source events it acknowledges
+SyncJob = namedtuple(
+    "SyncJob", ["customer_id", "document_ids", "changes", "first_seen", "enqueued_at", "event_ids"]
+)
+
+
+# Tables the logical replication source reacts to
+REPLICATED_TABLES = ("public.customers", "public.documents", "public.document_fields")
+
+# A decoded row change; old_columns is only present for updates that carry the old row
+RowChange = namedtuple("RowChange", ["lsn", "table", "operation", "columns", "old_columns"])
+
+_TEST_DECODING_CHANGE = re.compile(r"table (\S+): (INSERT|UPDATE|DELETE): ?(.*)", re.DOTALL)
+_TEST_DECODING_COLUMN = re.compile(r'(\w+|"[^"]+")\[(.+?)\]:')
+
+
+def parse_test_decoding(payload: str, lsn: int) -> Optional[RowChange]:
+    """Decode a test_decoding change line; BEGIN/COMMIT and other messages yield None"""
+    match = _TEST_DECODING_CHANGE.fullmatch(payload)
+    if not match:
+        return None
+    table, operation, data = match.groups()
+    
+    columns: Dict[str, Optional[str]] = {}
+    old_columns = None
+    pos = 0
+    while pos < len(data):
+        if data[pos] == " ":
+            pos += 1
+        elif data.startswith("old-key:", pos):
+            pos += len("old-key:")
+        elif data.startswith("new-tuple:", pos):
+            old_columns, columns = columns, {}
+            pos += len("new-tuple:")
+        else:
+            column = _TEST_DECODING_COLUMN.match(data, pos)
+            if not column:
+                break
+            name = column.group(1).strip('"')
+            pos = column.end()
+            if data.startswith("'", pos):
+                # Quoted literal; a doubled quote is an escaped quote
+                parts = []
+                pos += 1
+                while True:
+                    end = data.find("'", pos)
+                    if end == -1:
+                        parts.append(data[pos:])
+                        pos = len(data)
+                        break
+                    parts.append(data[pos:end])
+                    if data.startswith("''", end):
+                        parts.append("'")
+                        pos = end + 2
+                    else:
+                        pos = end + 1
+                        break
+                columns[name] = "".join(parts)
+            else:
+                end = data.find(" ", pos)
+                end = len(data) if end == -1 else end
+                value = data[pos:end]
+                columns[name] = None if value == "null" else value
+                pos = end
+    
+    return RowChange(lsn, table, operation, columns, old_columns)
+
+
+class LsnTracker:
+    """
+    Tracks which decoded changes have reached the graph. The confirmed LSN is
+    just below the oldest change still in flight, so the slot never releases
+    WAL for a change that a crash could lose.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending: Dict[int, int] = {}
+        self.seen = 0
+    
+    def add(self, lsn: int) -> None:
+        """Record a change that must be written before its LSN is confirmed"""
+        with self.lock:
+            self.pending[lsn] = self.pending.get(lsn, 0) + 1
+            self.seen = max(self.seen, lsn)
+    
+    def advance(self, lsn: int) -> None:
+        """Record a message that needs no graph write"""
+        with self.lock:
+            self.seen = max(self.seen, lsn)
+    
+    def done(self, lsns: Iterable[int]) -> None:
+        with self.lock:
+            for lsn in lsns:
+                remaining = self.pending.get(lsn, 0) - 1
+                if remaining > 0:
+                    self.pending[lsn] = remaining
+                else:
+                    self.pending.pop(lsn, None)
+    
+    def confirmed(self) -> int:
+        with self.lock:
+            return min(self.pending) - 1 if self.pending else self.seen
+    
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.pending)
+
+
+class DocumentChangeBuffer:
+    """
+    Coalesces change notifications by document id. A document is due for sync
+    once it has been quiet for the debounce window, or once the max-latency cap
+    has passed since its first buffered change, whichever comes first.
+    Documents handed out for sync stay in flight until released; changes to
+    them are held back meanwhile, so two syncs of a document never overlap
+    and an older sync cannot finish after a newer one.
+    """
+    
+    def __init__(self, debounce_seconds: float, max_latency_seconds: float):
+        self.debounce_seconds = debounce_seconds
+        self.max_latency_seconds = max_latency_seconds
+        self.pending: Dict[int, Dict[str, Any]] = {}
+        self.in_flight: Set[int] = set()
+    
+    def __len__(self) -> int:
+        return len(self.pending)
+    
+    def add(self, document_id: int, source: str, now: Optional[float] = None,
+            event_ids: Iterable[int] = ()) -> None:
+        """Record a change to a document, extending its debounce window"""
+        now = now if now is not None else time.monotonic()
+        entry = self.pending.get(document_id)
+        if entry is None:
+            entry = self.pending[document_id] = {
+                "document_id": document_id,
+                "first_seen": now,
+                "last_seen": now,
+                "changes": 1,
+                "sources": {source},
+                "event_ids": []
+            }
+        else:
+            entry["last_seen"] = now
+            entry["changes"] += 1
+            entry["sources"].add(source)
+        entry["event_ids"].extend(event_ids)
+    
+    def _due_at(self, entry: Dict[str, Any]) -> float:
+        return min(entry["last_seen"] + self.debounce_seconds, entry["first_seen"] + self.max_latency_seconds)
+    
+    def next_deadline(self) -> Optional[float]:
+        """Monotonic time at which the next document becomes due, if any are buffered and not in flight"""
+        deadlines = [
+            self._due_at(entry) for doc_id, entry in self.pending.items() if doc_id not in self.in_flight
+        ]
+        return min(deadlines) if deadlines else None
+    
+    def _take(self, document_ids: List[int]) -> List[Dict[str, Any]]:
+        self.in_flight.update(document_ids)
+        return [self.pending.pop(doc_id) for doc_id in document_ids]
+    
+    def pop_due(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Remove and return every due document that is not in flight, marking it in flight"""
+        now = now if now is not None else time.monotonic()
+        return self._take([
+            doc_id for doc_id, entry in self.pending.items()
+            if doc_id not in self.in_flight and self._due_at(entry) <= now
+        ])
+    
+    def pop_all(self) -> List[Dict[str, Any]]:
+        """Remove and return every buffered document that is not in flight, marking it in flight"""
+        return self._take([doc_id for doc_id in self.pending if doc_id not in self.in_flight])
+    
+    def release(self, document_ids: Iterable[int]) -> None:
+        """Mark documents as synced (or failed), letting their held-back changes go out"""
+        self.in_flight.difference_update(document_ids)
+    
+    def put_back(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """Return popped documents that were never synced, merged with changes buffered since"""
+        for entry in entries:
+            document_id = entry["document_id"]
+            self.in_flight.discard(document_id)
+            newer = self.pending.get(document_id)
+            if newer is not None:
+                entry["last_seen"] = newer["last_seen"]
+                entry["changes"] += newer["changes"]
+                entry["sources"] |= newer["sources"]
+                entry["event_ids"].extend(newer["event_ids"])
+            self.pending[document_id] = entry
+
+
+class SyncWorkerPool:
+    """
+    Runs blocking graph syncs in worker threads, fed by a bounded asyncio queue.
+    At most max_per_customer batches of one customer run at once; further
+    batches of that customer wait without holding a worker.
+    """
+    
+    def __init__(self, sync: KnowledgeGraphSync, workers: int, queue_size: int, max_per_customer: int,
+                 on_complete: Optional[Callable[[SyncJob, Optional[Exception]], Awaitable[None]]] = None):
+        self.sync = sync
+        self.on_complete = on_complete
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_per_customer = max_per_customer
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.tasks: List[asyncio.Task] = []
+        self.active: Dict[Any, int] = defaultdict(int)
+        self.deferred: Dict[Any, deque] = defaultdict(deque)
+        self.stats = {
+            "jobs_completed": 0,
+            "jobs_failed": 0,
+            "documents_synced": 0,
+            "last_queue_wait": 0.0,
+            "max_queue_wait": 0.0,
+            "last_sync_lag": 0.0,
+            "max_sync_lag": 0.0
+        }
+    
+    def start(self) -> None:
+        """Start the worker threads and the tasks feeding them"""
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cdc-sync")
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Started {self.workers} CDC sync workers")
+    
+    async def close(self) -> None:
+        """Finish every queued batch, then stop the workers"""
+        if not self.tasks:
+            return
+        await self.queue.join()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        self.executor.shutdown(wait=True)
+        logger.info("CDC sync workers stopped")
+    
+    @property
+    def depth(self) -> int:
+        """Batches waiting to run, including those held back by a customer's limit"""
+        return self.queue.qsize() + sum(len(jobs) for jobs in self.deferred.values())
+    
+    def has_capacity(self) -> bool:
+        return self.depth < self.queue_size
+    
+    async def submit(self, job: SyncJob) -> None:
+        """Queue a batch, waiting while the queue is full"""
+        await self.queue.put(job)
+    
+    async def _worker(self) -> None:
+        while True:
+            job = await self.queue.get()
+            customer_id = job.customer_id
+            if self.active[customer_id] >= self.max_per_customer:
+                # Picked up by whichever worker finishes this customer's running batch
+                self.deferred[customer_id].append(job)
+                continue
+            
+            while job is not None:
+                await self._run(job)
+                self.queue.task_done()
+                job = self.deferred[customer_id].popleft() if self.deferred[customer_id] else None
+            
+            if not self.active[customer_id]:
+                self.active.pop(customer_id, None)
+                self.deferred.pop(customer_id, None)
+    
+    async def _run(self, job: SyncJob) -> None:
+        self.active[job.customer_id] += 1
+        queue_wait = time.monotonic() - job.enqueued_at
+        error = None
+        try:
+            loop = asyncio.get_running_loop()
+            synced = await loop.run_in_executor(self.executor, self.sync.sync_documents_by_ids, job.document_ids)
+            self.stats["jobs_completed"] += 1
+            self.stats["documents_synced"] += synced
+            logger.info(
+                f"Synced {synced} documents of customer {job.customer_id} "
+                f"for {job.changes} change notifications"
+            )
+        except Exception as e:
+            error = e
+            self.stats["jobs_failed"] += 1
+            logger.error(f"Sync failed for documents {job.document_ids}: {e}")
+        finally:
+            self.active[job.customer_id] -= 1
+        
+        if self.on_complete:
+            try:
+                await self.on_complete(job, error)
+            except Exception as e:
+                logger.error(f"Completion handling failed for documents {job.document_ids}: {e}")
+        
+        sync_lag = time.monotonic() - job.first_seen
+        self.stats["last_queue_wait"] = queue_wait
+        self.stats["max_queue_wait"] = max(self.stats["max_queue_wait"], queue_wait)
+        self.stats["last_sync_lag"] = sync_lag
+        self.stats["max_sync_lag"] = max(self.stats["max_sync_lag"], sync_lag)
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, running batches and lag since the first buffered change"""
+        return {
+            "queued": self.queue.qsize(),
+            "deferred": self.depth - self.queue.qsize(),
+            "running": sum(self.active.values()),
+            **{key: round(value, 3) if isinstance(value, float) else value for key, value in self.stats.items()}
+        }
+
+
 class CDCListener:
     """
-    Listens for PostgreSQL notifications and triggers real-time sync
+    Consumes the cdc_outbox table and triggers real-time sync. Events are
+    claimed with FOR UPDATE SKIP LOCKED under a lease and deleted only after
+    their documents are written to the graph, so delivery is at-least-once
+    and several listeners can share the load. Leases of events still
+    buffered or queued here are renewed; should one lapse anyway (e.g. a
+    stalled listener), another listener may sync the document again.
+    Events that keep failing are dead-lettered after cdc_outbox_max_attempts.
+    NOTIFY merely wakes the listener up; it also polls, so missed
+    notifications only add latency.
     """
     
     def __init__(self):
@@ -19,135 +352,459 @@ class CDCListener:
             f"postgresql://{settings.postgres_user}:{settings.postgres_password}"
             f"@{settings.postgres_host}:{settings.postgres_port}/{settings.postgres_db}"
         )
+        self.consumer_id = f"{socket.gethostname()}-{os.getpid()}"
         self.sync = KnowledgeGraphSync()
-        self.api_base_url = "http://localhost:8000"
         self.running = False
         self.connection: Optional[asyncpg.Connection] = None
+        self.wakeup = asyncio.Event()
+        self.polled_at = 0.0
+        # Claimed outbox events not yet acknowledged or released, and when their leases were last renewed
+        self.leased: Set[int] = set()
+        self.leases_renewed_at = time.monotonic()
+        self.changes = DocumentChangeBuffer(settings.cdc_debounce_seconds, settings.cdc_max_latency_seconds)
+        self.workers = SyncWorkerPool(
+            self.sync,
+            workers=settings.cdc_sync_workers,
+            queue_size=settings.cdc_queue_size,
+            max_per_customer=settings.cdc_max_concurrent_per_customer,
+            on_complete=self._finish_job
+        )
+        self.metrics_logged_at = time.monotonic()
+    
+    def _on_notification(self, connection, pid, channel, payload):
+        """asyncpg listener callback; wakes the main loop to claim outbox events"""
+        self.wakeup.set()
+    
+    def _wait_timeout(self) -> float:
+        """Seconds until the next buffered document is due, polling at least once a second"""
+        deadline = self.changes.next_deadline()
+        if deadline is None:
+            return 1.0
+        return min(max(deadline - time.monotonic(), 0.0), 1.0)
     
     async def start_listening(self):
-        """Start listening for PostgreSQL notifications"""
+        """Start consuming outbox events"""
         logger.info("Starting CDC listener...")
         
+        pool = None
         try:
-            # Connect to PostgreSQL
-            self.connection = await asyncpg.connect(self.pg_dsn)
+            # Hold one pooled connection for LISTEN for the listener's lifetime
+            pool = await get_async_pool()
+            self.connection = await pool.acquire()
             logger.info("Connected to PostgreSQL for CDC")
             
-            # Listen for notification channels
-            await self.connection.execute("LISTEN hitl_finished")
-            await self.connection.execute("LISTEN document_created")
-            logger.info("Listening for CDC notifications")
+            await self.connection.add_listener(OUTBOX_CHANNEL, self._on_notification)
+            logger.info(f"Listening for CDC outbox events as {self.consumer_id}")
             
             self.running = True
+            self.workers.start()
+            # Pick up events written while no listener was running
+            self.wakeup.set()
             
-            # Main notification loop
+            # Main loop
             while self.running:
+                if self.workers.has_capacity():
+                    try:
+                        # Wait for a wake-up, but no longer than until the next buffered document is due
+                        await asyncio.wait_for(self.wakeup.wait(), timeout=self._wait_timeout())
+                    except asyncio.TimeoutError:
+                        # Timeout is normal, continue loop
+                        pass
+                else:
+                    # Backpressure: nothing is claimed and due documents stay buffered
+                    # (and keep coalescing) until a running batch finishes
+                    await asyncio.sleep(0.1)
+                
                 try:
-                    # Wait for notification with timeout
-                    notification = await self.connection.notifies.get(timeout=1.0)
-                    await self.handle_notification(notification)
+                    poll_due = time.monotonic() - self.polled_at >= settings.cdc_outbox_poll_seconds
+                    if (self.wakeup.is_set() or poll_due) and self.workers.has_capacity():
+                        self.wakeup.clear()
+                        await self.claim_changes()
+                    
+                    if self.workers.has_capacity():
+                        await self.flush_changes(self.changes.pop_due())
                     
-                except asyncio.TimeoutError:
-                    # Timeout is normal, continue loop
-                    continue
+                    await self._renew_leases()
                 except Exception as e:
-                    logger.error(f"Error in notification loop: {e}")
+                    logger.error(f"Error in CDC loop: {e}")
                     await asyncio.sleep(1)
+                self._log_metrics()
         
         except Exception as e:
             logger.error(f"CDC listener failed: {e}")
             raise
         
         finally:
+            # Don't hold back changes that were still waiting out their debounce window
+            if self.workers.tasks:
+                await self._drain_changes()
+                await self.workers.close()
             if self.connection:
-                await self.connection.close()
+                await self.connection.remove_listener(OUTBOX_CHANNEL, self._on_notification)
+                await pool.release(self.connection)
+                self.connection = None
             logger.info("CDC listener stopped")
     
-    async def handle_notification(self, notification):
-        """Handle incoming PostgreSQL notification"""
+    async def claim_changes(self):
+        """Claim a batch of outbox events and buffer their documents"""
+        self.polled_at = time.monotonic()
+        events = await self.claim_outbox_events(settings.cdc_outbox_batch_size)
+        self.leased.update(event["id"] for event in events)
+        for event in events:
+            await self.trigger_sync(event["document_id"], event["event_type"], event_ids=[event["id"]])
+        
+        if events:
+            logger.debug(f"Claimed {len(events)} outbox events")
+        if len(events) == settings.cdc_outbox_batch_size:
+            # More are probably waiting; claim again on the next iteration
+            self.wakeup.set()
+    
+    async def claim_outbox_events(self, limit: int) -> List[asyncpg.Record]:
+        """Lease unclaimed (or expired) outbox events to this consumer"""
+        pool = await get_async_pool()
+        return await pool.fetch(
+            """
+            UPDATE cdc_outbox o SET
+                claimed_by = $1,
+                claimed_until = LOCALTIMESTAMP + make_interval(secs => $2)
+            FROM (
+                SELECT id FROM cdc_outbox
+                WHERE claimed_until IS NULL OR claimed_until < LOCALTIMESTAMP
+                ORDER BY id
+                LIMIT $3
+                FOR UPDATE SKIP LOCKED
+            ) claimable
+            WHERE o.id = claimable.id
+            RETURNING o.id, o.event_type, o.document_id
+            """,
+            self.consumer_id, settings.cdc_outbox_lease_seconds, limit
+        )
+    
+    async def ack_outbox_events(self, outbox_ids: List[int]):
+        """Delete events whose documents have been written to the graph"""
+        pool = await get_async_pool()
+        await pool.execute(
+            "DELETE FROM cdc_outbox WHERE id = ANY($1::bigint[]) AND claimed_by = $2",
+            outbox_ids, self.consumer_id
+        )
+    
+    async def release_outbox_events(self, outbox_ids: List[int], error: str):
+        """
+        Hand events of a failed sync back for a retry after cdc_outbox_retry_seconds,
+        or dead-letter them once they have failed cdc_outbox_max_attempts times
+        """
+        pool = await get_async_pool()
+        rows = await pool.fetch(
+            """
+            UPDATE cdc_outbox SET
+                claimed_by = NULL,
+                claimed_until = CASE
+                    WHEN $5 > 0 AND attempts + 1 >= $5 THEN 'infinity'::timestamp
+                    ELSE LOCALTIMESTAMP + make_interval(secs => $3)
+                END,
+                attempts = attempts + 1,
+                last_error = $2
+            WHERE id = ANY($1::bigint[]) AND claimed_by = $4
+            RETURNING id, document_id, attempts, claimed_until = 'infinity'::timestamp as dead_lettered
+            """,
+            outbox_ids, error, settings.cdc_outbox_retry_seconds, self.consumer_id,
+            settings.cdc_outbox_max_attempts
+        )
+        for row in rows:
+            if row["dead_lettered"]:
+                logger.error(
+                    f"Dead-lettered outbox event {row['id']} for document {row['document_id']} "
+                    f"after {row['attempts']} failed syncs: {error}"
+                )
+    
+    async def renew_outbox_leases(self, outbox_ids: List[int]):
+        """Extend the leases of events this consumer still holds"""
+        pool = await get_async_pool()
+        await pool.execute(
+            """
+            UPDATE cdc_outbox SET claimed_until = LOCALTIMESTAMP + make_interval(secs => $2)
+            WHERE id = ANY($1::bigint[]) AND claimed_by = $3
+            """,
+            outbox_ids, settings.cdc_outbox_lease_seconds, self.consumer_id
+        )
+    
+    async def _renew_leases(self):
+        """Renew leases a third of the way through, while their events wait in the buffer or queue"""
+        now = time.monotonic()
+        if now - self.leases_renewed_at < settings.cdc_outbox_lease_seconds / 3:
+            return
+        self.leases_renewed_at = now
+        if self.leased:
+            await self.renew_outbox_leases(sorted(self.leased))
+    
+    async def _finish_job(self, job: SyncJob, error: Optional[Exception]):
         try:
-            logger.info(f"Received notification: {notification.channel} - {notification.payload}")
-            
-            # Parse notification payload
-            payload = json.loads(notification.payload)
-            
-            if notification.channel == "hitl_finished":
-                await self.handle_hitl_finished(payload)
-            elif notification.channel == "document_created":
-                await self.handle_document_created(payload)
-            
-        except Exception as e:
-            logger.error(f"Error handling notification: {e}")
+            await self._complete_job(job, error)
+        finally:
+            self.changes.release(job.document_ids)
+    
+    async def _complete_job(self, job: SyncJob, error: Optional[Exception]):
+        if not job.event_ids:
+            return
+        self.leased.difference_update(job.event_ids)
+        if error is None:
+            await self.ack_outbox_events(job.event_ids)
+        else:
+            await self.release_outbox_events(job.event_ids, str(error))
     
-    async def handle_hitl_finished(self, payload: dict):
-        """Handle hitl_finished notification"""
+    async def trigger_sync(self, document_id: int, trigger_source: str, event_ids: Iterable[int] = ()):
+        """Queue a document for the next coalesced sync"""
+        self.changes.add(document_id, trigger_source, event_ids=event_ids)
+    
+    async def _drain_changes(self):
+        """Sync every buffered document, waiting for running batches to release the ones they hold back"""
+        while len(self.changes):
+            failed = self.workers.stats["jobs_failed"]
+            await self.flush_changes(self.changes.pop_all())
+            await self.workers.queue.join()
+            if self.workers.stats["jobs_failed"] > failed:
+                # The graph is failing; what is left is redelivered after a restart
+                break
+    
+    async def flush_changes(self, entries: List[Dict[str, Any]]):
+        """
+        Queue buffered documents as per-customer batches of at most cdc_max_batch_documents;
+        the documents stay in flight until their batch completes
+        """
+        if not entries:
+            return
+        
         try:
-            # Create CDC notification object
-            cdc_notification = CDCNotification(
-                document_id=payload.get('document_id'),
-                field_id=payload.get('field_id'),
-                field_name=payload.get('field_name'),
-                hitl_value=payload.get('hitl_value'),
-                finished_at=payload.get('finished_at')
-            )
-            
-            logger.info(f"Processing HITL finished for document {cdc_notification.document_id}")
-            
-            # Trigger immediate sync for the document
-            await self.trigger_sync(cdc_notification.document_id, "hitl_finished")
-            
-            # Also notify API endpoint
-            await self.notify_api_endpoint(cdc_notification)
-            
+            customers = await self._get_document_customers([entry["document_id"] for entry in entries])
         except Exception as e:
-            logger.error(f"Error handling hitl_finished: {e}")
+            # Still sync the documents, just without per-customer limits
+            logger.warning(f"Could not look up document customers: {e}")
+            customers = {}
+        
+        # Unknown documents (e.g. deleted since the notification) share customer id None
+        def customer_of(entry: Dict[str, Any]) -> Optional[int]:
+            return customers.get(entry["document_id"])
+        
+        entries.sort(key=lambda entry: (customer_of(entry) is None, customer_of(entry) or 0, entry["document_id"]))
+        
+        batch_size = settings.cdc_max_batch_documents
+        submitted = 0
+        try:
+            for customer_id, group in groupby(entries, key=customer_of):
+                group = list(group)
+                for start in range(0, len(group), batch_size):
+                    batch = group[start:start + batch_size]
+                    await self.workers.submit(SyncJob(
+                        customer_id=customer_id,
+                        document_ids=[entry["document_id"] for entry in batch],
+                        changes=sum(entry["changes"] for entry in batch),
+                        first_seen=min(entry["first_seen"] for entry in batch),
+                        enqueued_at=time.monotonic(),
+                        event_ids=[event_id for entry in batch for event_id in entry["event_ids"]]
+                    ))
+                    submitted += len(batch)
+        finally:
+            # Documents that never reached a worker go back to the buffer instead of staying in flight
+            self.changes.put_back(entries[submitted:])
     
-    async def handle_document_created(self, payload: dict):
-        """Handle document_created notification"""
+    async def _get_document_customers(self, document_ids: List[int]) -> Dict[int, int]:
+        """Map document ids to customer ids without blocking the event loop"""
+        pool = await get_async_pool()
+        rows = await pool.fetch(
+            "SELECT id, customer_id FROM documents WHERE id = ANY($1::int[])", document_ids
+        )
+        return {row["id"]: row["customer_id"] for row in rows}
+    
+    def _log_metrics(self):
+        now = time.monotonic()
+        if now - self.metrics_logged_at < settings.cdc_metrics_log_seconds:
+            return
+        self.metrics_logged_at = now
+        logger.info(f"CDC metrics: buffered={len(self.changes)} {self.workers.metrics()}")
+    
+    def stop(self):
+        """Stop the CDC listener"""
+        logger.info("Stopping CDC listener...")
+        self.running = False
+
+
+class ReplicationCDCListener(CDCListener):
+    """
+    Reads row changes of customers, documents and document_fields from a
+    logical replication slot (test_decoding) instead of the trigger-fed
+    outbox, so CDC adds nothing to the write path and deletes propagate.
+    The slot's confirmed LSN only moves past changes written to the graph.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self.slot_name = settings.cdc_replication_slot
+        self.lsns = LsnTracker()
+        # Bounded so a slow graph leaves WAL in the slot instead of filling memory
+        self.row_changes: asyncio.Queue = asyncio.Queue(
+            maxsize=settings.cdc_queue_size * settings.cdc_max_batch_documents
+        )
+        self.customer_changes: Dict[int, List[int]] = {}
+        self.reader_stop = threading.Event()
+    
+    async def start_listening(self):
+        """Start streaming changes from the replication slot"""
+        logger.info(f"Starting logical replication CDC listener on slot {self.slot_name}...")
+        
+        loop = asyncio.get_running_loop()
+        self.running = True
+        self.workers.start()
+        reader = loop.run_in_executor(None, self._read_replication_stream, loop)
+        
         try:
-            document_id = payload.get('document_id')
-            logger.info(f"Processing document created for document {document_id}")
-            
-            # Trigger sync for new document
-            await self.trigger_sync(document_id, "document_created")
+            while self.running and not reader.done():
+                if self.workers.has_capacity():
+                    try:
+                        change = await asyncio.wait_for(self.row_changes.get(), timeout=self._wait_timeout())
+                        self._buffer_row_change(change)
+                        while not self.row_changes.empty():
+                            self._buffer_row_change(self.row_changes.get_nowait())
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    # Backpressure: changes wait in the queue and, beyond that, in the slot
+                    await asyncio.sleep(0.1)
+                
+                try:
+                    if self.workers.has_capacity():
+                        await self.flush_changes(self.changes.pop_due())
+                except Exception as e:
+                    logger.error(f"Error in CDC loop: {e}")
+                    await asyncio.sleep(1)
+                self._log_metrics()
             
+            if reader.done():
+                # Surface why the replication stream ended
+                reader.result()
+        
         except Exception as e:
-            logger.error(f"Error handling document_created: {e}")
+            logger.error(f"CDC listener failed: {e}")
+            raise
+        
+        finally:
+            if self.workers.tasks:
+                await self._drain_changes()
+                await self.workers.close()
+            # Stopped last, so the final status update confirms everything written above
+            self.reader_stop.set()
+            await asyncio.gather(reader, return_exceptions=True)
+            logger.info("CDC listener stopped")
     
-    async def trigger_sync(self, document_id: int, trigger_source: str):
-        """Trigger sync for a specific document"""
+    def _read_replication_stream(self, loop: asyncio.AbstractEventLoop):
+        """Blocking replication reader; runs in a thread and hands decoded changes to the event loop"""
+        connection = psycopg2.connect(connection_factory=LogicalReplicationConnection, **connection_kwargs())
         try:
-            logger.info(f"Triggering sync for document {document_id} from {trigger_source}")
+            cursor = connection.cursor()
+            try:
+                cursor.create_replication_slot(self.slot_name, output_plugin="test_decoding")
+                logger.info(f"Created replication slot {self.slot_name}")
+            except psycopg2.errors.DuplicateObject:
+                pass
             
-            # Perform sync directly
-            self.sync.sync_single_document(document_id)
+            # Resumes after the slot's confirmed LSN
+            cursor.start_replication(
+                slot_name=self.slot_name,
+                decode=True,
+                options={"include-xids": "0", "skip-empty-xacts": "1"}
+            )
+            logger.info(f"Streaming changes from replication slot {self.slot_name}")
             
-            logger.info(f"Sync completed for document {document_id}")
+            confirmed = 0
+            feedback_at = time.monotonic()
+            while not self.reader_stop.is_set():
+                message = cursor.read_message()
+                if message is not None:
+                    self._handle_replication_message(message, loop)
+                else:
+                    select.select([cursor], [], [], 1.0)
+                
+                lsn = self.lsns.confirmed()
+                now = time.monotonic()
+                if (lsn > confirmed and now - feedback_at >= 1.0) \
+                        or now - feedback_at >= settings.cdc_replication_feedback_seconds:
+                    cursor.send_feedback(flush_lsn=lsn, reply=True)
+                    confirmed, feedback_at = max(confirmed, lsn), now
             
-        except Exception as e:
-            logger.error(f"Sync failed for document {document_id}: {e}")
+            cursor.send_feedback(flush_lsn=self.lsns.confirmed(), force=True)
+        finally:
+            connection.close()
     
-    async def notify_api_endpoint(self, notification: CDCNotification):
-        """Notify API endpoint about CDC event"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.api_base_url}/cdc/notification",
-                    json=notification.dict(),
-                    timeout=aiohttp.ClientTimeout(total=10)
-                ) as response:
-                    if response.status == 200:
-                        logger.info("API notification sent successfully")
-                    else:
-                        logger.warning(f"API notification failed: {response.status}")
-                        
-        except Exception as e:
-            logger.warning(f"Failed to notify API endpoint: {e}")
+    def _handle_replication_message(self, message, loop: asyncio.AbstractEventLoop):
+        change = parse_test_decoding(message.payload, message.data_start)
+        if change is None or change.table not in REPLICATED_TABLES:
+            self.lsns.advance(message.data_start)
+            return
+        
+        self.lsns.add(change.lsn)
+        future = asyncio.run_coroutine_threadsafe(self.row_changes.put(change), loop)
+        while not self.reader_stop.is_set():
+            try:
+                future.result(timeout=1.0)
+                return
+            except FutureTimeoutError:
+                continue
+        future.cancel()
     
-    def stop(self):
-        """Stop the CDC listener"""
-        logger.info("Stopping CDC listener...")
-        self.running = False
+    def _buffer_row_change(self, change: RowChange):
+        """Route a decoded change to the customer or document it affects"""
+        columns = change.columns
+        if change.table == "public.customers":
+            self.customer_changes.setdefault(int(columns["id"]), []).append(change.lsn)
+            return
+        
+        if change.table == "public.documents":
+            document_ids = {columns.get("id")}
+        else:
+            # A field moved to another document changes both
+            document_ids = {columns.get("document_id")}
+            if change.old_columns:
+                document_ids.add(change.old_columns.get("document_id"))
+        document_ids.discard(None)
+        
+        if not document_ids:
+            # document_fields deletes only carry document_id with REPLICA IDENTITY FULL
+            logger.warning(f"Cannot tell which document {change.table} {change.operation} at {change.lsn} affects")
+            self.lsns.done([change.lsn])
+            return
+        
+        for index, document_id in enumerate(document_ids):
+            if index:
+                self.lsns.add(change.lsn)
+            self.changes.add(int(document_id), f"{change.table}:{change.operation}", event_ids=[change.lsn])
+    
+    async def flush_changes(self, entries: List[Dict[str, Any]]):
+        """Sync changed customers first so document batches find their PROCESSED start node"""
+        if self.customer_changes:
+            changes, self.customer_changes = self.customer_changes, {}
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(self.workers.executor, self.sync.sync_customers_by_ids, list(changes))
+                self.lsns.done(lsn for lsns in changes.values() for lsn in lsns)
+            except Exception as e:
+                logger.error(f"Sync failed for customers {list(changes)}: {e}")
+                for customer_id, lsns in changes.items():
+                    self.customer_changes.setdefault(customer_id, []).extend(lsns)
+        
+        await super().flush_changes(entries)
+    
+    async def _complete_job(self, job: SyncJob, error: Optional[Exception]):
+        if error is None:
+            self.lsns.done(job.event_ids)
+        else:
+            # Retry with the next flush; the slot keeps the changes until they succeed
+            for index, document_id in enumerate(job.document_ids):
+                self.changes.add(document_id, "retry", event_ids=job.event_ids if index == 0 else ())
+    
+    def _log_metrics(self):
+        now = time.monotonic()
+        if now - self.metrics_logged_at >= settings.cdc_metrics_log_seconds:
+            logger.info(f"Replication: queued={self.row_changes.qsize()} confirmed_lsn={self.lsns.confirmed()}")
+        super()._log_metrics()
 
 
 class RealTimeSyncService:
@@ -156,7 +813,10 @@ class RealTimeSyncService:
     """
     
     def __init__(self):
-        self.cdc_listener = CDCListener()
+        if settings.cdc_source == "logical_replication":
+            self.cdc_listener = ReplicationCDCListener()
+        else:
+            self.cdc_listener = CDCListener()
         self.running = False
     
     async def start(self):
@@ -193,6 +853,10 @@ async def run_realtime_sync():
         logger.error(f"Service crashed: {e}")
         service.stop()
         raise
+    finally:
+        await close_async_pool()
+        close_pool()
+        close_driver()
 
 
 if __name__ == "__main__":
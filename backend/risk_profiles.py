@@ -0,0 +1,140 @@
+from typing import List, Iterable, Optional
+from loguru import logger
+from neo4j_manager import Neo4jManager
+from config import settings
+
+
+# Same countries as the compliance engine's EMBARGO_COUNTRY rule
+EMBARGOED_COUNTRIES = {
+    'IR': 'IRAN',
+    'SY': 'SYRIA',
+    'KP': 'NORTH KOREA',
+    'RU': 'RUSSIA',
+    'BY': 'BELARUS'
+}
+
+# Location names mentioning an embargoed country by code or by name, as whole words;
+# codes only in capitals so ordinary words like "by" do not count
+EMBARGO_LOCATION_PATTERN = (
+    r".*\b(" + "|".join(EMBARGOED_COUNTRIES)
+    + "|(?i:" + "|".join(name.lower() for name in EMBARGOED_COUNTRIES.values()) + r"))\b.*"
+)
+
+# Shipment counts above which a shipper is rated High and Medium risk
+HIGH_RISK_SHIPMENTS = 100
+MEDIUM_RISK_SHIPMENTS = 50
+RISK_LEVELS = ['High', 'Medium', 'Low']
+
+# Document relationships a shipper's profile is computed from
+PROFILE_RELATIONSHIPS = frozenset({'HAS_SHIPPER', 'ORIGINATED_FROM', 'DESTINED_FOR', 'CONTAINS'})
+
+PROFILE_STATEMENT = """
+UNWIND $names AS name
+MATCH (e:LegalEntity {name: name, generation: $generation})
+CALL {
+    WITH e
+    OPTIONAL MATCH (e)<-[:HAS_SHIPPER]-(d:Document)
+    OPTIONAL MATCH (d)-[:ORIGINATED_FROM]->(origin:Location)
+    OPTIONAL MATCH (d)-[:DESTINED_FOR]->(dest:Location)
+    WITH d, origin, dest,
+         coalesce(origin.name =~ $embargo_pattern, false) OR coalesce(dest.name =~ $embargo_pattern, false) as embargoed
+    RETURN count(DISTINCT d) as shipments,
+           count(DISTINCT dest) as destinations,
+           count(DISTINCT CASE WHEN embargoed THEN [origin.name, dest.name] END) as embargo_lanes,
+           count(DISTINCT CASE WHEN embargoed THEN d END) as embargo_shipments,
+           min(d.created_at) as first_seen,
+           max(d.created_at) as last_seen
+}
+CALL {
+    WITH e
+    MATCH (e)<-[:HAS_SHIPPER]-(d:Document)-[:CONTAINS]->(:Product)-[:CLASSIFIED_AS]->(h:HSCode)
+    WITH h, count(DISTINCT d) as documents
+    ORDER BY documents DESC, h.code
+    RETURN collect(h.code) as hs_codes, collect(documents) as hs_code_shipments
+}
+SET e.shipment_count = shipments,
+    e.unique_destinations = destinations,
+    e.embargo_lanes = embargo_lanes,
+    e.embargo_shipments = embargo_shipments,
+    e.hs_codes = hs_codes,
+    e.hs_code_shipments = hs_code_shipments,
+    e.first_seen = first_seen,
+    e.last_seen = last_seen,
+    e.risk_level = CASE
+        WHEN shipments > $high_risk_shipments THEN 'High'
+        WHEN shipments > $medium_risk_shipments THEN 'Medium'
+        ELSE 'Low'
+    END,
+    e.is_high_risk = shipments > $high_risk_shipments,
+    e.risk_profiled_at = datetime()
+RETURN count(e) as profiled
+"""
+
+# Precomputed profiles of shippers, riskiest first; dashboards read these instead of aggregating
+RISK_PROFILES_QUERY = """
+MATCH (e:LegalEntity {generation: $generation})
+WHERE e.risk_level IN $risk_levels AND e.shipment_count > 0
+RETURN e.name as entity,
+       e.shipment_count as total_shipments,
+       e.unique_destinations as unique_destinations,
+       e.embargo_lanes as embargo_lanes,
+       e.embargo_shipments as embargo_shipments,
+       e.hs_codes as hs_codes,
+       e.first_seen as first_seen,
+       e.last_seen as last_seen,
+       e.risk_level as risk_level,
+       e.is_high_risk as is_high_risk
+ORDER BY embargo_shipments DESC, total_shipments DESC, entity
+LIMIT $limit
+"""
+
+
+class RiskProfileWriter:
+    """
+    Maintains each shipper's risk profile as properties of its LegalEntity node:
+    shipment and destination counts, lanes touching an embargoed country, HS code
+    mix and first/last shipment dates, with the risk level derived from them.
+    The sync recomputes the profiles of the shippers whose documents it changed;
+    a full rebuild profiles every LegalEntity before the generation goes live.
+    """
+
+    def __init__(self, neo4j_manager: Neo4jManager, batch_size: Optional[int] = None):
+        self.neo4j_manager = neo4j_manager
+        self.batch_size = batch_size or settings.risk_profile_batch_size
+
+    def refresh(self, names: Iterable[str], generation: Optional[int] = None) -> int:
+        """Recompute the profiles of the named LegalEntities; returns how many exist"""
+        names = sorted(set(names))
+        if not names:
+            return 0
+        if generation is None:
+            generation = self.neo4j_manager.get_active_generation()
+
+        profiled = 0
+        for start in range(0, len(names), self.batch_size):
+            result = self.neo4j_manager.execute_write(PROFILE_STATEMENT, {
+                "names": names[start:start + self.batch_size],
+                "generation": generation,
+                "embargo_pattern": EMBARGO_LOCATION_PATTERN,
+                "high_risk_shipments": HIGH_RISK_SHIPMENTS,
+                "medium_risk_shipments": MEDIUM_RISK_SHIPMENTS
+            })
+            profiled += result[0]["profiled"] if result else 0
+        # Cached risk answers were read before the new profiles
+        if profiled and generation == self.neo4j_manager.get_active_generation():
+            self.neo4j_manager.bump_graph_version()
+        logger.debug(f"Refreshed {profiled} risk profiles")
+        return profiled
+
+    def refresh_all(self, generation: Optional[int] = None) -> int:
+        """Recompute the profile of every LegalEntity in a generation"""
+        if generation is None:
+            generation = self.neo4j_manager.get_active_generation()
+        query = "MATCH (e:LegalEntity {generation: $generation}) RETURN e.name as name"
+        names: List[str] = [
+            record["name"] for record in self.neo4j_manager.stream_read(query, {"generation": generation})
+        ]
+        profiled = self.refresh(names, generation)
+        logger.info(f"Refreshed {profiled} risk profiles of graph generation {generation}")
+        return profiled
+
@@ -6,6 +6,8 @@ from datetime import datetime
 class QueryRequest(BaseModel):
     question: str = Field(..., description="Natural language question about the knowledge graph")
     context: Optional[Dict[str, Any]] = Field(None, description="Additional context for the query")
+    page_size: Optional[int] = Field(None, ge=1, description="Return results a page at a time")
+    cursor: Optional[str] = Field(None, description="next_cursor of the previous page")
 
 
 class QueryResponse(BaseModel):
@@ -15,10 +17,37 @@ class QueryResponse(BaseModel):
     results: Optional[List[Dict[str, Any]]] = None
     execution_time_ms: Optional[float] = None
     confidence: Optional[float] = Field(None, ge=0.0, le=1.0)
+    cached: bool = False
+    next_cursor: Optional[str] = None
+    estimated_rows: Optional[float] = None
+    estimated_rows_first_seen: bool = Field(False, description="estimated_rows was planned for an earlier question of the same shape")
+
+
+class BatchQueryRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1, description="Natural language questions answered together")
+
+
+class BatchQueryAnswer(QueryResponse):
+    translation_time_ms: Optional[float] = None
+    error: Optional[str] = None
+
+
+class BatchQueryResponse(BaseModel):
+    answers: List[BatchQueryAnswer]
+    distinct_queries: int
+    execution_time_ms: float
+
+
+class EntityMention(BaseModel):
+    label: str
+    name: str
+    start: int
+    end: int
 
 
 class EntityExtraction(BaseModel):
     entities: List[str] = Field(default_factory=list)
+    mentions: List[EntityMention] = Field(default_factory=list)
     relationships: List[str] = Field(default_factory=list)
     constraints: List[str] = Field(default_factory=list)
 
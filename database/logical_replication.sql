@@ -0,0 +1,15 @@
+-- Logical Replication CDC Source
+-- Apply when running realtime_sync.py with CDC_SOURCE=logical_replication.
+-- Requires wal_level = logical (see docker-compose.yml) and a user with the
+-- REPLICATION attribute. The listener creates its test_decoding slot itself.
+-- Idempotent: safe to re-apply
+
+-- Deletes of document_fields must carry document_id to know which document to re-sync
+ALTER TABLE document_fields REPLICA IDENTITY FULL;
+
+-- The slot replaces the trigger-fed outbox, so stop writing outbox events
+DROP TRIGGER IF EXISTS trigger_hitl_finished ON document_fields;
+DROP TRIGGER IF EXISTS trigger_document_created ON documents;
+
+-- To go back to the outbox source, recreate the triggers from schema.sql and drop the slot:
+-- SELECT pg_drop_replication_slot('knowledge_graph_sync');
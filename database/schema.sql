@@ -56,24 +56,45 @@ CREATE INDEX idx_document_fields_hitl_finished_at ON document_fields(hitl_finish
 CREATE INDEX idx_field_definitions_name ON field_definitions(name);
 
 -- CDC (Change Data Capture) Setup
--- pg_notify is built-in function, no extension needed
+-- Triggers write change events to a transactional outbox, so events raised
+-- while the real-time sync service is down are delivered once it is back.
+-- pg_notify on 'cdc_outbox' only wakes consumers up; they poll as well.
+CREATE TABLE IF NOT EXISTS cdc_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    event_type VARCHAR(50) NOT NULL, -- 'hitl_finished', 'document_created'
+    document_id INTEGER NOT NULL,
+    payload JSONB,
+    attempts INTEGER DEFAULT 0,
+    last_error TEXT,
+    claimed_by VARCHAR(100),
+    claimed_until TIMESTAMP, -- claimable again after this (lease expiry or retry delay); 'infinity' once dead-lettered
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_cdc_outbox_claimed_until ON cdc_outbox(claimed_until, id);
+
+-- Events that failed CDC_OUTBOX_MAX_ATTEMPTS syncs are dead-lettered; after fixing the cause, retry them with
+-- UPDATE cdc_outbox SET claimed_until = NULL, attempts = 0 WHERE claimed_until = 'infinity';
 
--- Function to trigger notification when hitl_finished_at is updated
+-- Function to record an outbox event when hitl_finished_at is updated
 CREATE OR REPLACE FUNCTION notify_hitl_finished()
 RETURNS TRIGGER AS $$
 BEGIN
     -- Only notify if hitl_finished_at was actually set/updated
     IF NEW.hitl_finished_at IS NOT NULL AND (OLD.hitl_finished_at IS NULL OR NEW.hitl_finished_at != OLD.hitl_finished_at) THEN
-        PERFORM pg_notify(
+        INSERT INTO cdc_outbox (event_type, document_id, payload)
+        VALUES (
             'hitl_finished',
+            NEW.document_id,
             json_build_object(
-                'document_id', NEW.document_id,
                 'field_id', NEW.id,
                 'field_name', (SELECT name FROM field_definitions WHERE id = NEW.field_definition_id),
                 'hitl_value', NEW.hitl_value,
                 'finished_at', NEW.hitl_finished_at
-            )::text
+            )
         );
+        -- Identical notifications are folded into one per transaction
+        PERFORM pg_notify('cdc_outbox', '');
     END IF;
     RETURN NEW;
 END;
@@ -85,20 +106,22 @@ CREATE TRIGGER trigger_hitl_finished
     FOR EACH ROW
     EXECUTE FUNCTION notify_hitl_finished();
 
--- Function to trigger notification when new documents are created
+-- Function to record an outbox event when new documents are created
 CREATE OR REPLACE FUNCTION notify_document_created()
 RETURNS TRIGGER AS $$
 BEGIN
-    PERFORM pg_notify(
+    INSERT INTO cdc_outbox (event_type, document_id, payload)
+    VALUES (
         'document_created',
+        NEW.id,
         json_build_object(
-            'document_id', NEW.id,
             'customer_id', NEW.customer_id,
             'document_type', NEW.document_type,
             'document_number', NEW.document_number,
             'created_at', NEW.created_at
-        )::text
+        )
     );
+    PERFORM pg_notify('cdc_outbox', '');
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
@@ -0,0 +1,204 @@
+-- Knowledge Graph Sync Bookkeeping
+-- Idempotent: safe to apply on top of schema.sql on existing databases
+
+-- Keep updated_at current so incremental sync can find changed rows
+CREATE OR REPLACE FUNCTION set_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_customers_updated_at ON customers;
+CREATE TRIGGER trigger_customers_updated_at
+    BEFORE UPDATE ON customers
+    FOR EACH ROW
+    EXECUTE FUNCTION set_updated_at();
+
+DROP TRIGGER IF EXISTS trigger_documents_updated_at ON documents;
+CREATE TRIGGER trigger_documents_updated_at
+    BEFORE UPDATE ON documents
+    FOR EACH ROW
+    EXECUTE FUNCTION set_updated_at();
+
+DROP TRIGGER IF EXISTS trigger_document_fields_updated_at ON document_fields;
+CREATE TRIGGER trigger_document_fields_updated_at
+    BEFORE UPDATE ON document_fields
+    FOR EACH ROW
+    EXECUTE FUNCTION set_updated_at();
+
+-- Indexes for (updated_at, id) watermark scans
+CREATE INDEX IF NOT EXISTS idx_customers_updated_at_id ON customers(updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_documents_updated_at_id ON documents(updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_document_fields_updated_at_id ON document_fields(updated_at, id);
+
+-- High-water marks of the last successful sync, one row per sync stream
+CREATE TABLE IF NOT EXISTS graph_sync_state (
+    sync_name VARCHAR(100) PRIMARY KEY,
+    customers_updated_at TIMESTAMP,
+    customers_last_id INTEGER DEFAULT 0,
+    documents_updated_at TIMESTAMP,
+    documents_last_id INTEGER DEFAULT 0,
+    fields_updated_at TIMESTAMP,
+    fields_last_id INTEGER DEFAULT 0,
+    deletes_updated_at TIMESTAMP,
+    deletes_last_id BIGINT DEFAULT 0,
+    last_sync_at TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE graph_sync_state ADD COLUMN IF NOT EXISTS deletes_updated_at TIMESTAMP;
+ALTER TABLE graph_sync_state ADD COLUMN IF NOT EXISTS deletes_last_id BIGINT DEFAULT 0;
+
+-- Tombstones of deleted rows, since incremental sync only sees rows whose updated_at moved.
+-- A deleted document field re-syncs its document; incremental sync prunes tombstones it has read.
+CREATE TABLE IF NOT EXISTS graph_sync_deletes (
+    id BIGSERIAL PRIMARY KEY,
+    entity VARCHAR(20) NOT NULL, -- 'customer', 'document'
+    entity_id INTEGER NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_graph_sync_deletes_updated_at_id ON graph_sync_deletes(updated_at, id);
+
+CREATE OR REPLACE FUNCTION record_graph_sync_delete()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'customers' THEN
+        INSERT INTO graph_sync_deletes (entity, entity_id) VALUES ('customer', OLD.id);
+    ELSIF TG_TABLE_NAME = 'documents' THEN
+        INSERT INTO graph_sync_deletes (entity, entity_id) VALUES ('document', OLD.id);
+    ELSE
+        INSERT INTO graph_sync_deletes (entity, entity_id) VALUES ('document', OLD.document_id);
+    END IF;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_customers_graph_sync_delete ON customers;
+CREATE TRIGGER trigger_customers_graph_sync_delete
+    AFTER DELETE ON customers
+    FOR EACH ROW
+    EXECUTE FUNCTION record_graph_sync_delete();
+
+DROP TRIGGER IF EXISTS trigger_documents_graph_sync_delete ON documents;
+CREATE TRIGGER trigger_documents_graph_sync_delete
+    AFTER DELETE ON documents
+    FOR EACH ROW
+    EXECUTE FUNCTION record_graph_sync_delete();
+
+DROP TRIGGER IF EXISTS trigger_document_fields_graph_sync_delete ON document_fields;
+CREATE TRIGGER trigger_document_fields_graph_sync_delete
+    AFTER DELETE ON document_fields
+    FOR EACH ROW
+    EXECUTE FUNCTION record_graph_sync_delete();
+
+-- Full rebuild runs; an unfinished run is resumed into the same shadow generation
+CREATE TABLE IF NOT EXISTS graph_sync_runs (
+    run_id VARCHAR(100) PRIMARY KEY,
+    generation INTEGER NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'running', -- 'running', 'interrupted', 'completed', 'failed'
+    expected_customers INTEGER,
+    expected_documents INTEGER,
+    entities_synced BOOLEAN DEFAULT FALSE,
+    documents_at_resume INTEGER DEFAULT 0, -- documents already done when this attempt started
+    resumed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    error_message TEXT,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    completed_at TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Last committed batch of every document id partition of a run
+CREATE TABLE IF NOT EXISTS graph_sync_checkpoints (
+    run_id VARCHAR(100) NOT NULL REFERENCES graph_sync_runs(run_id) ON DELETE CASCADE,
+    partition_index INTEGER NOT NULL,
+    low_id INTEGER NOT NULL,
+    high_id INTEGER NOT NULL,
+    last_document_id INTEGER, -- every document up to this id has been written
+    documents_done INTEGER DEFAULT 0,
+    total_documents INTEGER DEFAULT 0,
+    status VARCHAR(20) DEFAULT 'pending', -- 'pending', 'running', 'completed', 'failed'
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (run_id, partition_index)
+);
+
+CREATE INDEX IF NOT EXISTS idx_graph_sync_runs_status ON graph_sync_runs(status, started_at);
+
+-- Best value of every document field, maintained by trigger so sync reads
+-- are index scans instead of get_best_field_value() per row over a 4-way join.
+-- id is the document_fields id; updated_at only moves when the best value,
+-- field name or target label actually changes.
+CREATE TABLE IF NOT EXISTS document_field_best_values (
+    id INTEGER PRIMARY KEY REFERENCES document_fields(id) ON DELETE CASCADE,
+    document_id INTEGER NOT NULL,
+    field_name VARCHAR(100) NOT NULL,
+    target_graph_label VARCHAR(100),
+    best_value TEXT,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_document_field_best_values_document_id
+    ON document_field_best_values(document_id, field_name) INCLUDE (id, best_value, target_graph_label);
+CREATE INDEX IF NOT EXISTS idx_document_field_best_values_updated_at_id
+    ON document_field_best_values(updated_at, id) INCLUDE (document_id);
+CREATE INDEX IF NOT EXISTS idx_document_field_best_values_field_value
+    ON document_field_best_values(field_name, best_value);
+
+CREATE OR REPLACE FUNCTION refresh_document_field_best_value()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO document_field_best_values (id, document_id, field_name, target_graph_label, best_value)
+    SELECT NEW.id, NEW.document_id, fd.name, fd.target_graph_label,
+           get_best_field_value(NEW.raw_value, NEW.normalized_value, NEW.hitl_value)
+    FROM field_definitions fd
+    WHERE fd.id = NEW.field_definition_id
+    ON CONFLICT (id) DO UPDATE SET
+        document_id = EXCLUDED.document_id,
+        field_name = EXCLUDED.field_name,
+        target_graph_label = EXCLUDED.target_graph_label,
+        best_value = EXCLUDED.best_value,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE (document_field_best_values.document_id, document_field_best_values.field_name,
+           document_field_best_values.target_graph_label, document_field_best_values.best_value)
+        IS DISTINCT FROM
+          (EXCLUDED.document_id, EXCLUDED.field_name, EXCLUDED.target_graph_label, EXCLUDED.best_value);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_document_field_best_value ON document_fields;
+CREATE TRIGGER trigger_document_field_best_value
+    AFTER INSERT OR UPDATE ON document_fields
+    FOR EACH ROW
+    EXECUTE FUNCTION refresh_document_field_best_value();
+
+-- Renamed or relabelled field definitions change every field that uses them
+CREATE OR REPLACE FUNCTION refresh_field_definition_best_values()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE document_field_best_values bv SET
+        field_name = NEW.name,
+        target_graph_label = NEW.target_graph_label,
+        updated_at = CURRENT_TIMESTAMP
+    FROM document_fields df
+    WHERE df.id = bv.id AND df.field_definition_id = NEW.id;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_field_definition_best_values ON field_definitions;
+CREATE TRIGGER trigger_field_definition_best_values
+    AFTER UPDATE OF name, target_graph_label ON field_definitions
+    FOR EACH ROW
+    WHEN (OLD.name IS DISTINCT FROM NEW.name OR OLD.target_graph_label IS DISTINCT FROM NEW.target_graph_label)
+    EXECUTE FUNCTION refresh_field_definition_best_values();
+
+-- Backfill fields that existed before the trigger
+INSERT INTO document_field_best_values (id, document_id, field_name, target_graph_label, best_value)
+SELECT df.id, df.document_id, fd.name, fd.target_graph_label,
+       get_best_field_value(df.raw_value, df.normalized_value, df.hitl_value)
+FROM document_fields df
+JOIN field_definitions fd ON df.field_definition_id = fd.id
+ON CONFLICT (id) DO NOTHING;
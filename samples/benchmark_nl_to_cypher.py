@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for NLToCypherTranslator.translate
+Measures translations per second over a corpus of realistic questions.
+No database is needed.
+
+Compare against another version of the translator with --baseline, e.g.:
+    git show HEAD~1:backend/nl_to_cypher.py > /tmp/nl_to_cypher_before.py
+    python samples/benchmark_nl_to_cypher.py --baseline /tmp/nl_to_cypher_before.py
+Both translators are timed in alternating passes in one process, so machine
+noise affects them alike. --gazetteer resolves the corpus' entity names through
+an EntityGazetteer, as the API does.
+"""
+
+import sys
+import os
+import time
+import argparse
+import importlib.util
+from itertools import product
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.append(BACKEND_DIR)
+
+SHIPPERS = ["ABC Trading Co", "XYZ Import Export", "Global Logistics Inc", "Caspian Freight LLC", "Black Sea Shipping"]
+PRODUCTS = ["Automobile parts", "Electronics", "Wheat", "Steel pipes", "Textiles"]
+PORTS = ["Shanghai Port", "Poti", "Batumi", "Rotterdam", "Port of Baku"]
+
+TEMPLATES = [
+    'Has "{shipper}" ever sent "{product}" to "{port}"?',
+    'Is "{shipper}" high risk?',
+    'What products did {shipper} send?',
+    'What products did shipper "{shipper}" send?',
+    'Find documents for "{shipper}"',
+    'Which shippers sent {product} to {port}?',
+    'Show me shipments destined for {port}',
+]
+
+STATIC_QUESTIONS = [
+    "How many documents are in the system?",
+    "How many shippers are there?",
+    "How many products do we track?",
+    "List all shippers",
+    "List all products",
+    "Which customers process the most documents?",
+    "Give me an overview of the graph",
+]
+
+
+def build_corpus():
+    """Every template filled with every entity combination, plus the fixed questions"""
+    corpus = list(STATIC_QUESTIONS)
+    for template in TEMPLATES:
+        for shipper, product_name, port in product(SHIPPERS, PRODUCTS, PORTS):
+            corpus.append(template.format(shipper=shipper, product=product_name, port=port))
+    return corpus
+
+
+def build_gazetteer():
+    """Gazetteer knowing every entity name used by the corpus"""
+    from gazetteer import EntityGazetteer
+    gazetteer = EntityGazetteer()
+    for label, names in (('LegalEntity', SHIPPERS), ('Product', PRODUCTS), ('Location', PORTS)):
+        for name in names:
+            gazetteer.add(label, name)
+    return gazetteer
+
+
+def load_translator(module_path=None, gazetteer=None):
+    """NLToCypherTranslator from backend/ or from another copy of nl_to_cypher.py"""
+    kwargs = {"gazetteer": gazetteer} if gazetteer is not None else {}
+    if module_path is None:
+        from nl_to_cypher import NLToCypherTranslator
+        return NLToCypherTranslator(**kwargs)
+    spec = importlib.util.spec_from_file_location("nl_to_cypher_under_test", module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.NLToCypherTranslator(**kwargs)
+
+
+def time_pass(translator, corpus):
+    """Translations per second of one pass over the corpus"""
+    start = time.perf_counter()
+    for question in corpus:
+        translator.translate(question)
+    return len(corpus) / (time.perf_counter() - start)
+
+
+def run(translators, corpus, iterations):
+    """Best translations per second of each translator, timed in alternating passes"""
+    for translator in translators.values():  # warm-up
+        time_pass(translator, corpus)
+
+    best = {name: 0.0 for name in translators}
+    for _ in range(iterations):
+        for name, translator in translators.items():
+            best[name] = max(best[name], time_pass(translator, corpus))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark natural language to Cypher translation')
+    parser.add_argument('--baseline', help='Path to another nl_to_cypher.py to compare backend/ against')
+    parser.add_argument('--iterations', type=int, default=30, help='Timed passes over the corpus')
+    parser.add_argument('--gazetteer', action='store_true', help='Resolve entity names through a gazetteer')
+    args = parser.parse_args()
+
+    from loguru import logger
+    logger.remove()
+
+    corpus = build_corpus()
+    gazetteer = build_gazetteer() if args.gazetteer else None
+    translators = {}
+    if args.baseline:
+        translators['baseline'] = load_translator(args.baseline, gazetteer)
+    translators['current'] = load_translator(gazetteer=gazetteer)
+    rates = run(translators, corpus, args.iterations)
+
+    print(f"Corpus: {len(corpus)} questions, best of {args.iterations} passes")
+    for name, rate in rates.items():
+        print(f"{name:>8}: {rate:>9,.0f} translations/second ({1e6 / rate:.1f} µs per question)")
+    if args.baseline:
+        print(f" speedup: {rates['current'] / rates['baseline']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,7 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
 
 from compliance_engine import ComplianceEngine, ComplianceStatus, ComplianceSeverity
-from neo4j_manager import Neo4jManager
+from neo4j_manager import AsyncNeo4jManager
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -25,7 +25,7 @@ class ComplianceEngineTest:
     
     def __init__(self):
         self.engine = ComplianceEngine()
-        self.neo4j_manager = Neo4jManager()
+        self.neo4j_manager = AsyncNeo4jManager()
         self.test_results = []
     
     async def run_all_tests(self):
@@ -396,7 +396,7 @@ class ComplianceEngineTest:
         
         try:
             # Test Neo4j connection
-            stats = self.neo4j_manager.get_graph_statistics()
+            stats = await self.neo4j_manager.get_graph_statistics()
             
             if stats:
                 print("   ✅ Neo4j connection successful")
@@ -62,6 +62,45 @@ def test_nl_to_cypher():
         print(f"❌ NL to Cypher test failed: {e}")
         return False
 
+def test_paged_queries_aliased():
+    """Test that translated queries can be paged, i.e. wrapped in a CALL subquery"""
+    print("\n📄 Testing Paged Query Columns...")
+    try:
+        import re
+        from nl_to_cypher import NLToCypherTranslator
+        from gazetteer import EntityGazetteer
+        
+        gazetteer = EntityGazetteer()
+        gazetteer.add('LegalEntity', 'ABC Trading Co')
+        translator = NLToCypherTranslator(gazetteer=gazetteer)
+        
+        # Exact entity, full-text search and unknown-entity variants
+        questions = [
+            "Find documents for ABC Trading Co",
+            'Find documents for "ABC Trad"',
+            'Find documents for "DOC-1001"',
+            "List all shippers",
+            "What products did ABC Trading Co send?"
+        ]
+        
+        ok = True
+        for question in questions:
+            cypher, _ = translator.translate(question)
+            # Last RETURN of the query, up to ORDER BY / SKIP / LIMIT
+            clause = re.split(r"\bRETURN\s+(?:DISTINCT\s+)?", cypher)[-1]
+            clause = re.split(r"\b(?:ORDER BY|SKIP|LIMIT)\b", clause)[0]
+            items = [item.strip() for item in re.split(r",(?![^(\[]*[)\]])", clause) if item.strip()]
+            unaliased = [item for item in items if not re.fullmatch(r"\w+|.+\s+as\s+\w+", item, re.IGNORECASE | re.DOTALL)]
+            if unaliased:
+                ok = False
+                print(f"   ❌ {question}: columns without an alias {unaliased}")
+            else:
+                print(f"   ✅ {question}: {len(items)} aliased columns")
+        return ok
+    except Exception as e:
+        print(f"❌ Paged query test failed: {e}")
+        return False
+
 def test_schemas():
     """Test Pydantic schemas"""
     print("\n📋 Testing Schemas...")
@@ -128,6 +167,7 @@ def main():
     tests = [
         ("Configuration", test_config),
         ("NL to Cypher", test_nl_to_cypher),
+        ("Paged Queries", test_paged_queries_aliased),
         ("Schemas", test_schemas),
         ("Answer Formatting", test_answer_formatting)
     ]
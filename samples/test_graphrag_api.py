@@ -94,6 +94,36 @@ class GraphRAGTester:
             print(f"❌ Query error: {e}")
             return {"success": False, "error": str(e), "execution_time": execution_time}
     
+    async def test_paged_query(self, question: str, page_size: int = 2) -> Dict[str, Any]:
+        """Test a question read a page at a time; paged queries run inside a CALL subquery"""
+        print(f"\n📄 Paged question: {question}")
+        print("-" * 50)
+        
+        start_time = time.time()
+        payload = {"question": question, "page_size": page_size}
+        pages = 0
+        
+        try:
+            # The first page and the one its cursor points to
+            while pages < 2:
+                async with self.session.post(f"{self.base_url}/query", json=payload) as response:
+                    data = await response.json()
+                    if response.status != 200:
+                        print(f"❌ Page {pages + 1} failed: {response.status}")
+                        print(f"Error: {data}")
+                        return {"success": False, "error": data, "execution_time": (time.time() - start_time) * 1000}
+                pages += 1
+                print(f"✅ Page {pages}: {len(data.get('results') or [])} records")
+                if not data.get('next_cursor'):
+                    break
+                payload = {"question": question, "page_size": page_size, "cursor": data['next_cursor']}
+            
+            return {"success": True, "data": data, "execution_time": (time.time() - start_time) * 1000}
+        
+        except Exception as e:
+            print(f"❌ Paged query error: {e}")
+            return {"success": False, "error": str(e), "execution_time": (time.time() - start_time) * 1000}
+    
     async def test_stats(self):
         """Test statistics endpoint"""
         print("\n📊 Testing Statistics Endpoint")
@@ -211,6 +241,10 @@ class GraphRAGTester:
             # Small delay between queries
             await asyncio.sleep(0.5)
         
+        # Paged reads wrap the query in CALL { }, which needs every returned column aliased
+        for question in ['Find documents for "ABC Trading Co"', 'Find documents for "ABC Trad"']:
+            results.append(await self.test_paged_query(question))
+        
         # Summary
         print("\n📋 Test Summary")
         print("=" * 60)
@@ -323,6 +323,7 @@ sleep 30
 # Apply database schema
 echo "  📊 Applying database schema..."
 gcloud sql connect knowledge-graph-db --user=postgres --quiet < database/schema.sql
+gcloud sql connect knowledge-graph-db --user=postgres --quiet < database/sync_schema.sql
 gcloud sql connect knowledge-graph-db --user=postgres --quiet < database/compliance_schema.sql
 gcloud sql connect knowledge-graph-db --user=postgres --quiet < database/ocr_integration_schema.sql
 